@@ -0,0 +1,372 @@
+import json
+import os
+import re
+import shutil
+from collections import Counter
+
+import numpy as np
+
+from src.interval_index import IntervalIndex
+from src.quantile_sketch import KllSketch
+
+# Durations outside (0, MAX_DURATION_MINUTES) are treated as invalid, as in JobsAnalyzer
+MAX_DURATION_MINUTES = 1440
+LONGEST_JOBS = 20
+# Percentiles reported for durations and schedule-to-start wait times
+PERCENTILES = (0.5, 0.95, 0.99)
+ERROR_PATTERN = re.compile('error', re.IGNORECASE)
+# Folder of the multiple-day processor's store under the output root, and its manifest
+AGGREGATES_FOLDER = 'aggregates'
+MANIFEST_NAME = 'manifest'
+
+
+def concurrency_sweep(starts, ends):
+    """Running-run counts after every start and end, in time order.
+
+    starts and ends are datetime64 arrays, one entry per run (RunID); NaT marks a missing
+    time. Each start adds +1 and each end that is not before its start adds -1. Returns
+    (event positions into the interleaved start/end array, counts, closing ends mask).
+    """
+    has_start = ~np.isnat(starts)
+    has_end = ~np.isnat(ends)
+    # An end only closes a run that started no later than it ended
+    closes = has_start & has_end & (ends >= starts)
+
+    # Interleaved as start, end per run so the stable sort keeps run order on ties
+    times = np.column_stack([starts, ends]).ravel()
+    deltas = np.column_stack([has_start, -closes.astype(np.int8)]).ravel().astype(np.int64)
+    event_positions = np.flatnonzero(np.column_stack([has_start, has_end]).ravel())
+    event_positions = event_positions[np.argsort(times[event_positions], kind='stable')]
+    return event_positions, np.cumsum(deltas[event_positions]), closes
+
+
+def count_error_events(events, error_counts):
+    """Pass (timestamp, event, message code) tuples through, counting error events by code."""
+    search = ERROR_PATTERN.search
+    for event in events:
+        if search(event[1]):
+            error_counts[event[2]] += 1
+        yield event
+
+
+def _time(value):
+    return None if value is None else value.isoformat(sep=' ')
+
+
+class JobSketches:
+    """Duration and wait time sketches, overall and per job name, fed one run at a time.
+
+    Passed to ParseState, the parser feeds a run's wait time when it starts and its
+    duration when it ends, so Aggregates.from_parse does not go over the jobs again for
+    them. A run is fed with the times known when its first start or end line is read.
+    """
+
+    def __init__(self):
+        self.duration_sketch = KllSketch()
+        self.wait_sketch = KllSketch()
+        # Job name -> [duration sketch, wait time sketch]
+        self.job_sketches = {}
+
+    def _for_job(self, name):
+        sketches = self.job_sketches.get(name)
+        if sketches is None:
+            sketches = self.job_sketches[name] = [KllSketch(), KllSketch()]
+        return sketches
+
+    def job_started(self, job):
+        scheduled_time = job.scheduled_time
+        if scheduled_time is not None and job.start_time >= scheduled_time:
+            wait = (job.start_time - scheduled_time).total_seconds() / 60
+            self.wait_sketch.update(wait)
+            self._for_job(job.name)[1].update(wait)
+
+    def job_ended(self, job):
+        start_time = job.start_time
+        if start_time is not None:
+            duration = (job.end_time - start_time).total_seconds() / 60
+            if 0 < duration < MAX_DURATION_MINUTES:
+                self.duration_sketch.update(duration)
+                self._for_job(job.name)[0].update(duration)
+
+
+class Aggregates:
+    """Mergeable partial results for one ingested log (or several merged ones).
+
+    Everything the analyzer reports is kept as counts, sums, min/max, histograms, a
+    bounded top list or quantile sketches, so partials fold together without the raw rows. Concurrency is
+    kept as counts relative to the runs still open at the end, which merge exactly
+    when partials are folded in time order and do not overlap in time.
+    """
+
+    def __init__(self, data=None):
+        self.data = data or {
+            'first_event': None,
+            'total_jobs': 0,
+            'completed_jobs': 0,
+            'succeeded_jobs': 0,
+            'duration_count': 0,
+            'duration_sum': 0.0,
+            'duration_max': None,
+            'first_start': None,
+            'last_end': None,
+            'job_names': {},
+            'longest_jobs': [],
+            'hourly': {},
+            'daily': {},
+            'errors': {},
+            'concurrency_events': 0,
+            'concurrency_sum': 0,
+            'concurrency_max': None,
+            'open_runs': 0,
+            # KllSketch objects: all runs, and [duration, wait time] per job name
+            'duration_sketch': KllSketch(),
+            'wait_sketch': KllSketch(),
+            'job_sketches': {},
+        }
+
+    def to_json(self):
+        data = dict(self.data)
+        data['duration_sketch'] = data['duration_sketch'].to_dict()
+        data['wait_sketch'] = data['wait_sketch'].to_dict()
+        data['job_sketches'] = {name: [sketch.to_dict() for sketch in sketches]
+                                for name, sketches in data['job_sketches'].items()}
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        data['duration_sketch'] = KllSketch.from_dict(data['duration_sketch'])
+        data['wait_sketch'] = KllSketch.from_dict(data['wait_sketch'])
+        data['job_sketches'] = {name: [KllSketch.from_dict(sketch) for sketch in sketches]
+                                for name, sketches in data['job_sketches'].items()}
+        return cls(data)
+
+    def _job_sketches(self, name):
+        sketches = self.data['job_sketches'].get(name)
+        if sketches is None:
+            sketches = self.data['job_sketches'][name] = [KllSketch(), KllSketch()]
+        return sketches
+
+    @classmethod
+    def from_parse(cls, jobs, error_counts=None, first_event=None, sketches=None):
+        """Aggregate one parse: jobs as RunID -> JobRecord, error counts by message code.
+
+        sketches is the JobSketches the parser fed while parsing; without it they are
+        fed from the jobs here.
+        """
+        aggregates = cls()
+        data = aggregates.data
+        fed = sketches is not None
+        if not fed:
+            sketches = JobSketches()
+        data['first_event'] = _time(first_event)
+        data['total_jobs'] = len(jobs)
+        data['errors'] = dict(error_counts or {})
+
+        names = Counter()
+        hourly = Counter()
+        daily = Counter()
+        durations = []
+        starts = []
+        ends = []
+        for run_id, job in jobs.items():
+            start_time = job.get('start_time')
+            end_time = job.get('end_time')
+            return_code = job.get('return_code')
+            if job.get('name') is not None:
+                names[job.name] += 1
+            if end_time is not None:
+                data['completed_jobs'] += 1
+            if return_code is not None and int(return_code) == 0:
+                data['succeeded_jobs'] += 1
+            if start_time is not None:
+                hourly[str(start_time.hour)] += 1
+                daily[start_time.date().isoformat()] += 1
+                if data['first_start'] is None or start_time < data['first_start']:
+                    data['first_start'] = start_time
+            if end_time is not None and (data['last_end'] is None or end_time > data['last_end']):
+                data['last_end'] = end_time
+            if start_time is not None and end_time is not None:
+                duration = (end_time - start_time).total_seconds() / 60
+                if 0 < duration < MAX_DURATION_MINUTES:
+                    durations.append((duration, run_id, job))
+                if not fed:
+                    sketches.job_ended(job)
+            if not fed and start_time is not None:
+                sketches.job_started(job)
+            starts.append(start_time)
+            ends.append(end_time)
+
+        data['duration_sketch'] = sketches.duration_sketch
+        data['wait_sketch'] = sketches.wait_sketch
+        data['job_sketches'] = sketches.job_sketches
+        data['first_start'] = _time(data['first_start'])
+        data['last_end'] = _time(data['last_end'])
+        data['job_names'] = dict(names)
+        data['hourly'] = dict(hourly)
+        data['daily'] = dict(daily)
+        data['duration_count'] = len(durations)
+        data['duration_sum'] = sum(duration for duration, _, _ in durations)
+        data['duration_max'] = max((duration for duration, _, _ in durations), default=None)
+        # Stable sort, so ties keep parse order like DataFrame.nlargest
+        durations.sort(key=lambda item: -item[0])
+        data['longest_jobs'] = [
+            [job.name, run_id, duration, _time(job.start_time), _time(job.end_time), job.get('return_code')]
+            for duration, run_id, job in durations[:LONGEST_JOBS]
+        ]
+
+        starts = np.array([np.datetime64(value, 'ns') if value else np.datetime64('NaT', 'ns')
+                           for value in starts], dtype='datetime64[ns]')
+        ends = np.array([np.datetime64(value, 'ns') if value else np.datetime64('NaT', 'ns')
+                         for value in ends], dtype='datetime64[ns]')
+        _, counts, _ = concurrency_sweep(starts, ends)
+        data['concurrency_events'] = len(counts)
+        data['concurrency_sum'] = int(counts.sum())
+        data['concurrency_max'] = int(counts.max()) if len(counts) else None
+        data['open_runs'] = int(counts[-1]) if len(counts) else 0
+        return aggregates
+
+    def merge(self, other):
+        """Fold a later partial into this one."""
+        data = self.data
+        other_data = other.data
+        data['first_event'] = _min(data['first_event'], other_data['first_event'])
+        for key in ('total_jobs', 'completed_jobs', 'succeeded_jobs', 'duration_count', 'duration_sum'):
+            data[key] += other_data[key]
+        data['duration_max'] = _max(data['duration_max'], other_data['duration_max'])
+        data['first_start'] = _min(data['first_start'], other_data['first_start'])
+        data['last_end'] = _max(data['last_end'], other_data['last_end'])
+        for key in ('job_names', 'hourly', 'daily', 'errors'):
+            counts = data[key]
+            for value, count in other_data[key].items():
+                counts[value] = counts.get(value, 0) + count
+        longest_jobs = data['longest_jobs'] + other_data['longest_jobs']
+        longest_jobs.sort(key=lambda row: -row[2])
+        data['longest_jobs'] = longest_jobs[:LONGEST_JOBS]
+
+        # The other partial's counts are relative to the runs this one left open
+        open_runs = data['open_runs']
+        data['concurrency_sum'] += other_data['concurrency_sum'] + open_runs * other_data['concurrency_events']
+        data['concurrency_events'] += other_data['concurrency_events']
+        if other_data['concurrency_max'] is not None:
+            data['concurrency_max'] = _max(data['concurrency_max'], other_data['concurrency_max'] + open_runs)
+        data['open_runs'] += other_data['open_runs']
+
+        data['duration_sketch'].merge(other_data['duration_sketch'])
+        data['wait_sketch'].merge(other_data['wait_sketch'])
+        for name, (duration_sketch, wait_sketch) in other_data['job_sketches'].items():
+            sketches = self._job_sketches(name)
+            sketches[0].merge(duration_sketch)
+            sketches[1].merge(wait_sketch)
+        return self
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+class AggregateStore:
+    """One JSON file of Aggregates, and the IntervalIndex of its runs, per ingested log.
+
+    The multiple-day processor keeps its store under the output backend's root, next to
+    the combined outputs the partials describe, and records those outputs' sizes and
+    mtimes in a manifest so readers can tell whether the partials still match them.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def path(self, source):
+        return os.path.join(self.root, source + '.json')
+
+    def intervals_path(self, source):
+        return os.path.join(self.root, source + '.npz')
+
+    def save(self, source, aggregates, interval_index=None):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = self.path(source) + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(aggregates.to_json(), file)
+        os.replace(temp_path, self.path(source))
+        if interval_index is not None:
+            interval_index.save(self.intervals_path(source))
+
+    def remove(self, source):
+        for path in (self.path(source), self.intervals_path(source)):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def clear(self):
+        for source in self.sources():
+            self.remove(source)
+        if os.path.isfile(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def sources(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(filename[:-5] for filename in os.listdir(self.root) if filename.endswith('.json'))
+
+    def copy_from(self, other, source):
+        """Copy one source's partial from another store, e.g. a parse cache entry."""
+        for path, other_path in ((self.path(source), other.path(source)),
+                                 (self.intervals_path(source), other.intervals_path(source))):
+            if os.path.isfile(other_path):
+                os.makedirs(self.root, exist_ok=True)
+                shutil.copyfile(other_path, path)
+
+    def load(self, source):
+        with open(self.path(source), encoding='utf-8') as file:
+            return Aggregates.from_json(json.load(file))
+
+    def combined(self):
+        """All stored partials folded in time order, or None if nothing was ingested."""
+        partials = [self.load(source) for source in self.sources()]
+        if not partials:
+            return None
+        partials.sort(key=lambda partial: partial.data['first_event'] or '')
+        combined = Aggregates()
+        for partial in partials:
+            combined.merge(partial)
+        return combined
+
+    def combined_intervals(self, sources):
+        """One IntervalIndex over the given sources' runs, in source order, as built from
+        their combined jobs rows; sources without a stored index are left out."""
+        indexes = [IntervalIndex.load(self.intervals_path(source)) for source in sources
+                   if os.path.isfile(self.intervals_path(source))]
+        return IntervalIndex.concatenate(indexes)
+
+    def save_manifest(self, paths):
+        """Record the outputs the stored partials were built alongside."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as file:
+            json.dump({'sources': self.sources(), 'outputs': output_signature(paths)}, file)
+
+    def matches(self, paths):
+        """Whether the stored partials describe the outputs at paths as they are now."""
+        if not os.path.isfile(self.manifest_path):
+            return False
+        with open(self.manifest_path, encoding='utf-8') as file:
+            manifest = json.load(file)
+        return manifest == {'sources': self.sources(), 'outputs': output_signature(paths)}
+
+
+def output_signature(paths):
+    """Size and mtime of each output file, or of each file in an output directory."""
+    signature = {}
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, filename) for filename in os.listdir(path))
+        else:
+            files = [path]
+        for file_path in files:
+            if os.path.isfile(file_path):
+                file_stat = os.stat(file_path)
+                relative_path = os.path.relpath(file_path, os.path.dirname(path))
+                signature[relative_path] = [file_stat.st_size, file_stat.st_mtime_ns]
+    return signature
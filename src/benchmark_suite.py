@@ -0,0 +1,256 @@
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from src.log_generator import generate_log
+from src.utils import (
+    PROJECT_ROOT, JOB_HEADERS, REPORT_HEADERS, COMPRESSION_SUFFIXES, DECOMPRESS_BLOCK_SIZE, EventTemplates,
+    read_log_file, extract_time_range, log_time_range, parse_sap_log, stream_log, save_to_csv, save_events_to_csv,
+    zstd_available
+)
+
+BENCHMARK_HISTORY = os.path.join(PROJECT_ROOT, 'benchmarks', 'benchmark_history.jsonl')
+# Generated workloads are deterministic, so they are kept and reused between runs
+WORKLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'benchmarks', '.workloads')
+# Scratch outputs under csv/; the analyzer reads them with this folder as its project root
+BENCH_FOLDER = '.bench'
+DEFAULT_WORKLOAD_SIZE = 20 * 1024 * 1024
+# A stage fails when its throughput drops more than this below the baseline
+DEFAULT_THRESHOLD = 0.2
+# Baseline is the median throughput of this many earlier runs on the same workload and machine
+BASELINE_RUNS = 5
+# Interpreter arguments timed from a fresh process: the CLI itself and the imports behind each command
+STARTUP_COMMANDS = {
+    'cli_help': ['-m', 'src.cli', '--help'],
+    'import_single': ['-c', 'import src.single_day_log_processcor'],
+    'import_multi': ['-c', 'import src.multiple_day_log_processor'],
+    'import_live': ['-c', 'import src.live_log_processor'],
+    'import_analyze': ['-c', 'import src.jobs_analyzer'],
+    'import_charts': ['-c', 'import src.charts'],
+}
+
+
+def workload_path(size, seed):
+    path = os.path.join(WORKLOAD_FOLDER, f'synthetic_{size}_{seed}.LOG.txt')
+    if not os.path.isfile(path):
+        print(f"Generating {size / 1024 / 1024:.0f} MB workload {path}")
+        generate_log(path, size=size, seed=seed)
+    return path
+
+
+def open_compressed_writer(path, suffix):
+    if suffix == '.gz':
+        return gzip.open(path, 'wb')
+    if suffix == '.bz2':
+        return bz2.open(path, 'wb')
+    if suffix == '.xz':
+        return lzma.open(path, 'wb')
+    import zstandard
+
+    return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+
+
+def compressed_workloads(log_file_path):
+    """Compressed copies of the workload by suffix, made once and kept next to it."""
+    paths = {}
+    for suffix in COMPRESSION_SUFFIXES:
+        if suffix == '.zst' and not zstd_available():
+            continue
+        path = paths[suffix] = log_file_path + suffix
+        if not os.path.isfile(path):
+            print(f"Compressing workload to {path}")
+            with open(log_file_path, 'rb') as source, open_compressed_writer(path, suffix) as target:
+                shutil.copyfileobj(source, target, DECOMPRESS_BLOCK_SIZE)
+    return paths
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_stage(function, repeats, setup=None):
+    """Best wall-clock time of repeated calls; the stage's own console output is dropped."""
+    timings = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def measure_startup(repeats):
+    """Best wall-clock seconds of each startup command, each run in a new interpreter."""
+    timings = {}
+    for name, arguments in STARTUP_COMMANDS.items():
+        best = None
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            subprocess.run([sys.executable, *arguments], cwd=os.path.dirname(PROJECT_ROOT),
+                           stdout=subprocess.DEVNULL, check=True)
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return timings
+
+
+def benchmark_stages(log_file_path, repeats):
+    """Seconds per stage, from reading the log through every JobsAnalyzer stage.
+
+    stream_log is also timed on each compressed copy of the log (stream_log_gz, ...);
+    all stages count throughput in bytes of the plain log, so they compare directly.
+    """
+    from src.jobs_analyzer import JobsAnalyzer
+
+    bench_root = os.path.join(PROJECT_ROOT, 'csv', BENCH_FOLDER)
+    content = read_log_file(log_file_path)
+    jobs, reports, events = parse_sap_log(content)
+    analyzer = JobsAnalyzer(project_root=bench_root)
+
+    def reset_analyzer():
+        # Every repeat of an analyzer stage starts without the results cached by the last one
+        analyzer._concurrency = None
+        analyzer._error_events = None
+        analyzer._interval_index = None
+
+    def write_outputs():
+        save_to_csv(jobs, os.path.join(BENCH_FOLDER, 'csv', 'combined_jobs.csv'), JOB_HEADERS)
+        save_to_csv(reports, os.path.join(BENCH_FOLDER, 'csv', 'combined_reports.csv'), REPORT_HEADERS)
+
+    def parse_stream(path):
+        return lambda: stream_log(path, None, save_events=lambda events, *args, **kwargs: sum(1 for _ in events))
+
+    stages = [
+        ('read_log_file', lambda: read_log_file(log_file_path), None),
+        ('extract_time_range', lambda: extract_time_range(content), None),
+        ('log_time_range', lambda: log_time_range(log_file_path), None),
+        ('parse_sap_log', lambda: parse_sap_log(content), None),
+        ('parse_sap_log_templated', lambda: parse_sap_log(content, EventTemplates()), None),
+        ('stream_log', parse_stream(log_file_path), None),
+        *((f'stream_log_{suffix[1:]}', parse_stream(path), None)
+          for suffix, path in compressed_workloads(log_file_path).items()),
+        ('save_to_csv', write_outputs, None),
+        ('save_events_to_csv',
+         lambda: save_events_to_csv(events, os.path.join(BENCH_FOLDER, 'csv', 'combined_events.csv')), None),
+        ('load_data', analyzer.load_data, reset_analyzer),
+        ('analyze_jobs', analyzer.analyze_jobs, reset_analyzer),
+        ('analyze_patterns', analyzer.analyze_patterns, reset_analyzer),
+        ('analyze_system_load', analyzer.analyze_system_load, reset_analyzer),
+        ('generate_visualizations', analyzer.generate_visualizations, reset_analyzer),
+    ]
+    try:
+        return {name: time_stage(function, repeats, setup) for name, function, setup in stages}
+    finally:
+        shutil.rmtree(bench_root, ignore_errors=True)
+
+
+def load_history(history_path=BENCHMARK_HISTORY):
+    if not os.path.isfile(history_path):
+        return []
+    with open(history_path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def earlier_runs(run, history):
+    return [entry for entry in history
+            if entry['workload'] == run['workload'] and entry['machine'] == run['machine']][-BASELINE_RUNS:]
+
+
+def find_regressions(run, history, threshold=DEFAULT_THRESHOLD):
+    """(stage, throughput, baseline) for stages slower than the baseline by more than threshold."""
+    earlier = earlier_runs(run, history)
+    regressions = []
+    for stage, result in run['stages'].items():
+        throughputs = [entry['stages'][stage]['mb_per_second'] for entry in earlier if stage in entry['stages']]
+        if not throughputs:
+            continue
+        baseline = statistics.median(throughputs)
+        if result['mb_per_second'] < baseline * (1 - threshold):
+            regressions.append((stage, result['mb_per_second'], baseline))
+    return regressions
+
+
+def find_startup_regressions(run, history, threshold=DEFAULT_THRESHOLD):
+    """(command, seconds, baseline) for startup commands slower than the baseline by more than threshold."""
+    earlier = earlier_runs(run, history)
+    regressions = []
+    for command, seconds in run['startup'].items():
+        timings = [entry['startup'][command] for entry in earlier if command in entry.get('startup', {})]
+        if not timings:
+            continue
+        baseline = statistics.median(timings)
+        if seconds > baseline * (1 + threshold):
+            regressions.append((command, seconds, baseline))
+    return regressions
+
+
+def run_benchmarks(size=DEFAULT_WORKLOAD_SIZE, seed=0, repeats=3, threshold=DEFAULT_THRESHOLD,
+                   history_path=BENCHMARK_HISTORY):
+    """Benchmark every stage on a synthetic workload and the startup commands, append the
+    run to the history and return what regressed against earlier runs."""
+    log_file_path = workload_path(size, seed)
+    file_size = os.path.getsize(log_file_path)
+    with open(log_file_path, 'rb') as file:
+        line_count = sum(1 for _ in file)
+
+    timings = benchmark_stages(log_file_path, repeats)
+    startup = measure_startup(repeats)
+    run = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': f"{platform.node()} {platform.machine()} {os.cpu_count()} cpus",
+        'workload': {'size': size, 'seed': seed, 'bytes': file_size, 'lines': line_count},
+        'repeats': repeats,
+        'stages': {
+            stage: {'seconds': seconds,
+                    'mb_per_second': file_size / 1024 / 1024 / seconds,
+                    'lines_per_second': line_count / seconds}
+            for stage, seconds in timings.items()
+        },
+        'startup': startup,
+    }
+
+    history = load_history(history_path)
+    regressions = find_regressions(run, history, threshold)
+    startup_regressions = find_startup_regressions(run, history, threshold)
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    with open(history_path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(run) + '\n')
+
+    print(f"\n{'Stage':<26}{'Seconds':>10}{'MB/s':>10}{'Lines/s':>14}")
+    for stage, result in run['stages'].items():
+        print(f"{stage:<26}{result['seconds']:>10.3f}{result['mb_per_second']:>10.1f}"
+              f"{result['lines_per_second']:>14,.0f}")
+    print(f"\n{'Startup':<26}{'Seconds':>10}")
+    for command, seconds in startup.items():
+        print(f"{command:<26}{seconds:>10.3f}")
+    for stage, throughput, baseline in regressions:
+        print(f"Regression: {stage} at {throughput:.1f} MB/s, baseline {baseline:.1f} MB/s")
+    for command, seconds, baseline in startup_regressions:
+        print(f"Regression: {command} starts in {seconds:.3f} s, baseline {baseline:.3f} s")
+    print(f"Benchmark run has been appended to {history_path}")
+    return regressions + startup_regressions
+
+
+if __name__ == "__main__":
+    from src.cli import main as cli_main
+
+    sys.exit(cli_main(['benchmark', *sys.argv[1:]]))
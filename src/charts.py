@@ -0,0 +1,145 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Charts are only ever written to files, so no GUI backend is needed (nor wanted in workers)
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src import tracing  # noqa: E402
+
+CHART_FIGSIZE = (12, 6)
+CONCURRENCY_FIGSIZE = (15, 12)
+CONCURRENCY_DPI = 300
+
+
+def downsample_minmax(x, y, buckets):
+    """Positions of a shape-preserving subset of a time series for plotting.
+
+    x (sorted numbers or datetimes) is cut into buckets of equal width, one per pixel
+    column, and the first, lowest, highest and last point of each is kept, in order,
+    so peaks and dips survive exactly and sparse stretches keep every point. Series
+    with no more than 4 points per bucket are returned whole.
+    """
+    count = len(y)
+    if count <= 4 * buckets:
+        return np.arange(count)
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view(np.int64)
+    y = np.asarray(y)
+    x_range = float(x[-1] - x[0]) or 1.0
+    bucket = np.minimum(((x - x[0]) / x_range * buckets).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, count)))
+    positions = [starts, np.append(starts[1:], count) - 1]
+    for extremes in (np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)):
+        matches = np.flatnonzero(y == extremes[group])
+        # First match per bucket; groups are in order, so np.unique finds it
+        positions.append(matches[np.unique(group[matches], return_index=True)[1]])
+    return np.unique(np.concatenate(positions))
+
+
+def pixel_width(figsize, dpi):
+    return int(figsize[0] * dpi)
+
+
+def plot_bar(series, path, title, xlabel, ylabel, rotation=None):
+    plt.figure(figsize=CHART_FIGSIZE)
+    series.plot(kind='bar')
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if rotation is not None:
+        plt.xticks(rotation=rotation)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_histogram(edges, counts, path, title, xlabel, ylabel):
+    plt.figure(figsize=CHART_FIGSIZE)
+    plt.stairs(counts, edges, fill=True)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_line(series, path, title, xlabel, ylabel):
+    plt.figure(figsize=CHART_FIGSIZE)
+    series.plot()
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_concurrency(times, counts, peak_times, peak_count, daily_average, hourly_average, path):
+    """Concurrent jobs over time with peaks and daily average, above an hourly heatmap.
+
+    times and counts are expected to be downsampled already (downsample_minmax);
+    the peaks, averages and heatmap come from the full series.
+    """
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=CONCURRENCY_FIGSIZE, height_ratios=[2, 1])
+
+    # Plot concurrent jobs over time
+    ax1.plot(times, counts, linewidth=2, color='blue', label='Concurrent Jobs')
+
+    # Add peak markers
+    ax1.scatter(peak_times, np.full(len(peak_times), peak_count),
+                color='red', s=100, zorder=5, label='Peak Concurrency')
+
+    # Customize the main plot
+    ax1.set_title('Concurrent Jobs Over Time', fontsize=14, pad=20)
+    ax1.set_xlabel('Time')
+    ax1.set_ylabel('Number of Concurrent Jobs')
+    ax1.grid(True, linestyle='--', alpha=0.7)
+    ax1.legend()
+
+    # Add daily average line
+    ax1.plot(daily_average.index, daily_average.values,
+             color='green', linestyle='--', label='Daily Average')
+
+    # Add heatmap showing intensity of job concurrency per hour
+    hours = range(len(hourly_average))
+    heatmap = ax2.pcolormesh([hours], [0], [hourly_average], cmap='YlOrRd')
+    ax2.set_title('Job Concurrency Heatmap', fontsize=12)
+    ax2.set_xlabel('Hours from Start')
+    ax2.set_yticks([])
+
+    # Add colorbar
+    plt.colorbar(heatmap, ax=ax2, orientation='horizontal', label='Average Concurrent Jobs')
+
+    # Adjust layout and save
+    plt.tight_layout()
+    plt.savefig(path, dpi=CONCURRENCY_DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def _render(name, function, args):
+    with tracing.span('render_chart', chart=name):
+        function(*args)
+
+
+def render_charts(charts, workers=None):
+    """Render (name, plot function, arguments) charts, in worker processes when workers > 1.
+
+    The arguments are the prepared, already downsampled plot data, so what is sent to
+    the workers stays small. workers defaults to one per chart, up to the CPU count.
+    """
+    workers = workers or min(len(charts), os.cpu_count() or 1)
+    if workers <= 1 or len(charts) <= 1:
+        for name, function, args in charts:
+            _render(name, function, args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [tracing.submit(executor, _render, name, function, args) for name, function, args in charts]
+        for future in futures:
+            future.result()
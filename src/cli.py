@@ -0,0 +1,162 @@
+"""Command line entry point: python -m src.cli {single,multi,live,analyze,benchmark} ...
+
+Only argparse and the light output modules are imported up front; each command
+imports its processor (and pandas, matplotlib, watchdog or psutil with it) when it runs.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from src.output_backends import DEFAULT_EVENT_ENCODING, DEFAULT_OUTPUT_FORMAT, EVENT_ENCODINGS, OUTPUT_FORMATS
+from src.output_writer import FSYNC_POLICIES
+from src.utils import PROJECT_ROOT
+
+
+def _given(**options):
+    """The options that were given on the command line; the processors' own defaults apply to the rest."""
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def _window_start(value):
+    return datetime.fromisoformat(value)
+
+
+def _window_end(value):
+    bound = datetime.fromisoformat(value)
+    # A date on its own includes the whole day
+    if len(value) == len('YYYY-MM-DD'):
+        bound = bound.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return bound
+
+
+def _output_writer(args):
+    from src.output_writer import OutputWriter
+
+    return OutputWriter(fsync=args.fsync, background=args.background_writer)
+
+
+def run_single(args):
+    from src.single_day_log_processcor import process_log_to_csv
+
+    process_log_to_csv(os.path.abspath(args.log_file), output_format=args.format,
+                       event_encoding=args.event_encoding, resource_series=args.resource_series,
+                       writer=_output_writer(args), **_given(workers=args.workers))
+
+
+def run_multi(args):
+    from src.multiple_day_log_processor import process_logs_to_csv
+
+    process_logs_to_csv(os.path.abspath(args.logs_folder), output_format=args.format,
+                        event_encoding=args.event_encoding, use_cache=args.cache,
+                        use_job_store=args.job_store, resource_series=args.resource_series,
+                        writer=_output_writer(args), start_time=args.start, end_time=args.end,
+                        **_given(workers=args.workers))
+
+
+def run_live(args):
+    from src.live_log_processor import watch_folder
+
+    if not os.path.exists(args.folder):
+        os.makedirs(args.folder)
+        print(f"Created logs folder at {args.folder}")
+    watch_folder(args.folder, output_format=args.format, event_encoding=args.event_encoding,
+                 resource_series=args.resource_series, executor=args.executor, overflow=args.overflow,
+                 writer=_output_writer(args),
+                 **_given(workers=args.workers, max_queued=args.max_queued, quiet_period=args.quiet_period,
+                          max_delay=args.max_delay))
+
+
+def run_analyze(args):
+    from src.jobs_analyzer import main as analyze
+
+    analyze(output_format=args.format, charts=not args.no_charts, chart_workers=args.chart_workers,
+            concurrent_jobs=args.concurrent_jobs)
+
+
+def run_benchmark(args):
+    from src.benchmark_suite import run_benchmarks
+
+    regressions = run_benchmarks(**_given(size=args.size and int(args.size * 1024 * 1024), seed=args.seed,
+                                          repeats=args.repeats, threshold=args.threshold))
+    return 1 if regressions else 0
+
+
+def _add_output_arguments(parser, writer=True):
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT,
+                        help='output format (default: %(default)s)')
+    if not writer:
+        return
+    parser.add_argument('--event-encoding', choices=EVENT_ENCODINGS, default=DEFAULT_EVENT_ENCODING,
+                        help='how events are stored (default: %(default)s)')
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default='never',
+                        help='when CSV output is fsynced (default: %(default)s)')
+    parser.add_argument('--background-writer', action='store_true',
+                        help='write CSV output on a background thread')
+    parser.add_argument('--resource-series', action='store_true',
+                        help='save the resource sample series to benchmarks/resource_series/')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description='AE log processing and analysis.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    single = commands.add_parser('single', help='process one log file')
+    single.add_argument('log_file')
+    single.add_argument('--workers', type=int,
+                        help='processes parsing chunks of a large log (default: 1, parse serially)')
+    _add_output_arguments(single)
+    single.set_defaults(handler=run_single)
+
+    multi = commands.add_parser('multi', help='process a folder of daily logs into combined outputs')
+    multi.add_argument('logs_folder', nargs='?', default=os.path.join(PROJECT_ROOT, 'logs'))
+    multi.add_argument('--workers', type=int, help='processes parsing files (default: 1, parse serially)')
+    multi.add_argument('--cache', action='store_true',
+                       help='keep parses in the parse cache and only reparse new or changed logs')
+    multi.add_argument('--job-store', action='store_true', help='upsert jobs and reports into the SQLite job store')
+    multi.add_argument('--start', type=_window_start,
+                       help='only logs that end at or after this date or ISO timestamp')
+    multi.add_argument('--end', type=_window_end,
+                       help='only logs that start at or before this date (the whole day) or ISO timestamp')
+    _add_output_arguments(multi)
+    multi.set_defaults(handler=run_multi)
+
+    live = commands.add_parser('live', help='watch a folder and process logs as they grow')
+    live.add_argument('folder', nargs='?', default=os.path.join(PROJECT_ROOT, 'live_logs'))
+    live.add_argument('--workers', type=int, help='threads serving the work queue')
+    live.add_argument('--executor', choices=('thread', 'process'), default='thread',
+                      help='where increments are parsed (default: %(default)s)')
+    live.add_argument('--max-queued', type=int, help='bound of the work queue')
+    live.add_argument('--overflow', choices=('block', 'drop'), default='block',
+                      help='what a full queue does (default: %(default)s)')
+    live.add_argument('--quiet-period', type=float, help='seconds a file must be unchanged before it is processed')
+    live.add_argument('--max-delay', type=float, help='longest a file that keeps growing waits, in seconds')
+    _add_output_arguments(live)
+    live.set_defaults(handler=run_live)
+
+    analyze = commands.add_parser('analyze', help='analyze the combined outputs and draw the charts')
+    _add_output_arguments(analyze, writer=False)
+    analyze.add_argument('--no-charts', action='store_true', help='skip the charts (matplotlib is not loaded)')
+    analyze.add_argument('--concurrent-jobs', action='store_true',
+                         help='also write results/concurrent_jobs.csv when reporting from aggregates '
+                              '(reads the raw job rows)')
+    analyze.add_argument('--chart-workers', type=int, default=None,
+                         help='processes rendering charts (default: one per chart, up to the CPU count)')
+    analyze.set_defaults(handler=run_analyze)
+
+    benchmark = commands.add_parser('benchmark', help='run the benchmark suite on a synthetic workload')
+    benchmark.add_argument('--size', type=float, help='workload size in MB')
+    benchmark.add_argument('--seed', type=int, help='workload seed')
+    benchmark.add_argument('--repeats', type=int, help='timed runs per stage, the best is kept')
+    benchmark.add_argument('--threshold', type=float, help='throughput drop reported as a regression, e.g. 0.2')
+    benchmark.set_defaults(handler=run_benchmark)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
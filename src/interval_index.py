@@ -0,0 +1,128 @@
+import os
+from bisect import bisect_right
+
+import numpy as np
+
+# End used for runs that are still open, or whose end comes before their start
+OPEN_END = np.iinfo(np.int64).max
+# Where the multiple-day processor saves the index of all runs, under the output root
+INTERVAL_INDEX_PATH = os.path.join('indexes', 'job_intervals.npz')
+
+
+class IntervalIndex:
+    """Job run intervals sorted by start, with a max-end segment tree on top.
+
+    Answers "which runs were running at T" and "which runs overlapped [start, end]"
+    in O(log n + k) tree steps for k results, without scanning every run. As in the
+    concurrency sweep, a run is running from its start up to (not including) its end,
+    and runs without a usable end stay open.
+    """
+
+    def __init__(self, ids, names, starts, ends):
+        order = np.argsort(starts, kind='stable')
+        self.ids = np.asarray(ids, dtype=str)[order]
+        self.names = np.asarray(names, dtype=str)[order]
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self._build_tree()
+
+    def _build_tree(self):
+        size = 1
+        while size < len(self.ends):
+            size *= 2
+        tree = np.full(2 * size, np.iinfo(np.int64).min, dtype=np.int64)
+        tree[size:size + len(self.ends)] = self.ends
+        level = size
+        while level > 1:
+            tree[level // 2:level] = np.maximum(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+            level //= 2
+        self._size = size
+        self._tree = tree
+        self._starts = self.starts.tolist()
+
+    @classmethod
+    def from_frame(cls, jobs_df):
+        """Build from a JobsAnalyzer jobs frame; runs without a start time are left out."""
+        jobs_df = jobs_df[jobs_df['start_time'].notna()]
+        starts = jobs_df['start_time'].to_numpy('datetime64[ns]')
+        ends = jobs_df['end_time'].to_numpy('datetime64[ns]')
+        closes = ~np.isnat(ends) & (ends >= starts)
+        return cls(jobs_df['id'].astype(str), jobs_df['name'].astype(str), starts.astype(np.int64),
+                   np.where(closes, ends.astype(np.int64), OPEN_END))
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """Build straight from parser output: a dict of RunID -> JobRecord."""
+        ids, names, starts, ends = [], [], [], []
+        for run_id, job in jobs.items():
+            start_time = job.get('start_time')
+            if start_time is None:
+                continue
+            end_time = job.get('end_time')
+            ids.append(run_id)
+            names.append(job.get('name') or '')
+            starts.append(np.datetime64(start_time, 'ns').astype(np.int64))
+            ends.append(np.datetime64(end_time, 'ns').astype(np.int64)
+                        if end_time is not None and end_time >= start_time else OPEN_END)
+        return cls(ids, names, np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+    @classmethod
+    def concatenate(cls, indexes):
+        """One index over the runs of several, e.g. one per ingested log.
+
+        Each index is already in start order, so with the stable sort the result is the
+        index from_frame builds over their jobs rows taken in the same order.
+        """
+        indexes = list(indexes)
+        return cls(np.concatenate([index.ids for index in indexes] or [np.array([], dtype=str)]),
+                   np.concatenate([index.names for index in indexes] or [np.array([], dtype=str)]),
+                   np.concatenate([index.starts for index in indexes] or [np.array([], dtype=np.int64)]),
+                   np.concatenate([index.ends for index in indexes] or [np.array([], dtype=np.int64)]))
+
+    @staticmethod
+    def _to_ns(timestamp):
+        return int(np.datetime64(timestamp, 'ns').astype(np.int64))
+
+    def _overlapping_positions(self, start, end):
+        # Candidates are the runs starting no later than end; of those, the tree only
+        # descends into subtrees holding a run that ends after start
+        limit = bisect_right(self._starts, end)
+        tree = self._tree
+        size = self._size
+        positions = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= limit or tree[node] <= start:
+                continue
+            if node >= size:
+                positions.append(node - size)
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+        return np.array(positions, dtype=np.int64)
+
+    def overlapping(self, start, end):
+        """Runs that were running at some moment in [start, end], as (id, name, start, end) arrays."""
+        positions = self._overlapping_positions(self._to_ns(start), self._to_ns(end))
+        ends = self.ends[positions].astype('datetime64[ns]')
+        ends[self.ends[positions] == OPEN_END] = np.datetime64('NaT')
+        return (self.ids[positions], self.names[positions],
+                self.starts[positions].astype('datetime64[ns]'), ends)
+
+    def running_at(self, timestamp):
+        """Runs that were running at the given moment."""
+        return self.overlapping(timestamp, timestamp)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, ids=self.ids, names=self.names, starts=self.starts, ends=self.ends)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays['ids'], arrays['names'], arrays['starts'], arrays['ends'])
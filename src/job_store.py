@@ -0,0 +1,169 @@
+import os
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+from src.utils import PROJECT_ROOT, EVENT_BATCH_SIZE, JOB_HEADERS, REPORT_HEADERS
+
+JOB_STORE_PATH = os.path.join(PROJECT_ROOT, 'db', 'jobs.sqlite')
+
+TIME_COLUMNS = ('scheduled_time', 'start_time', 'end_time')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    scheduled_time TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    return_code INTEGER,
+    scheduled_message_code TEXT,
+    start_message_code TEXT,
+    end_message_code TEXT,
+    remove_message_code TEXT
+);
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    file_name TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    start_message_code TEXT,
+    end_message_code TEXT
+);
+-- Parse results (e.g. parse cache entries) whose rows are already in the tables
+CREATE TABLE IF NOT EXISTS sources (key TEXT PRIMARY KEY);
+CREATE INDEX IF NOT EXISTS jobs_name ON jobs (name);
+CREATE INDEX IF NOT EXISTS jobs_start_time ON jobs (start_time);
+CREATE INDEX IF NOT EXISTS jobs_return_code ON jobs (return_code);
+"""
+
+
+def _upsert_sql(table, headers):
+    # A row only fills in what it knows: a job split across two daily logs has its
+    # start in one row and its end in the other, and both end up on the same RunID
+    updates = ', '.join(f"{column} = COALESCE(excluded.{column}, {table}.{column})" for column in headers[1:])
+    return (f"INSERT INTO {table} ({', '.join(headers)}) VALUES ({', '.join('?' for _ in headers)}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}")
+
+
+def _time_text(value):
+    # Fixed-width text, so times sort and compare correctly inside SQLite
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat(sep=' ', timespec='milliseconds')
+
+
+def _normalize(row, headers):
+    values = []
+    for column, value in zip(headers, row):
+        if value == '':
+            value = None
+        elif column in TIME_COLUMNS:
+            value = _time_text(value)
+        elif column == 'return_code' and value is not None:
+            value = int(value)
+        elif column == 'id':
+            value = str(value)
+        values.append(value)
+    return values
+
+
+class JobStore:
+    """Embedded SQLite store of jobs and reports, upserted by RunID and report id."""
+
+    def __init__(self, path=JOB_STORE_PATH, batch_size=EVENT_BATCH_SIZE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def _upsert(self, table, headers, rows):
+        sql = _upsert_sql(table, headers)
+        rows = iter(rows)
+        # One transaction per bounded batch
+        while True:
+            batch = [_normalize(row, headers) for row in islice(rows, self.batch_size)]
+            if not batch:
+                break
+            with self.connection:
+                self.connection.executemany(sql, batch)
+
+    def upsert_jobs(self, rows):
+        """Upsert rows in JOB_HEADERS order; use utils.record_rows for parser output."""
+        self._upsert('jobs', JOB_HEADERS, rows)
+
+    def upsert_reports(self, rows):
+        """Upsert rows in REPORT_HEADERS order; use utils.record_rows for parser output."""
+        self._upsert('reports', REPORT_HEADERS, rows)
+
+    def clear(self):
+        with self.connection:
+            for table in ('jobs', 'reports', 'sources'):
+                self.connection.execute(f"DELETE FROM {table}")
+
+    def loaded_sources(self):
+        return {key for key, in self.connection.execute("SELECT key FROM sources")}
+
+    def sync(self, sources, output):
+        """Make the store hold exactly the given sources, loading only the missing ones.
+
+        sources is an ordered list of (key, jobs dataset, reports dataset) in the given
+        output backend. If a loaded source is no longer wanted (its log changed or went
+        away) the store is rebuilt, since its rows may be merged into others.
+        """
+        loaded = self.loaded_sources()
+        if not loaded <= {key for key, _, _ in sources}:
+            self.clear()
+            loaded = set()
+        for key, jobs_dataset, reports_dataset in sources:
+            if key in loaded:
+                continue
+            if output.exists(jobs_dataset):
+                self.upsert_jobs(output.read_rows(jobs_dataset))
+            if output.exists(reports_dataset):
+                self.upsert_reports(output.read_rows(reports_dataset))
+            with self.connection:
+                self.connection.execute("INSERT OR IGNORE INTO sources (key) VALUES (?)", (key,))
+
+    def select_jobs(self, columns=JOB_HEADERS, name=None, name_like=None, start=None, end=None,
+                    return_code=None):
+        """SQL and parameters selecting jobs; every filter becomes a WHERE clause on an indexed column.
+
+        start and end bound start_time (start inclusive, end exclusive); name_like is an
+        SQL LIKE pattern.
+        """
+        conditions = []
+        params = []
+        if name is not None:
+            conditions.append("name = ?")
+            params.append(name)
+        if name_like is not None:
+            conditions.append("name LIKE ?")
+            params.append(name_like)
+        if start is not None:
+            conditions.append("start_time >= ?")
+            params.append(_time_text(start))
+        if end is not None:
+            conditions.append("start_time < ?")
+            params.append(_time_text(end))
+        if return_code is not None:
+            conditions.append("return_code = ?")
+            params.append(int(return_code))
+        sql = f"SELECT {', '.join(columns)} FROM jobs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql, params
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
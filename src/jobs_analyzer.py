@@ -1,43 +1,165 @@
 import os
+import sys
+from itertools import islice
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import seaborn as sns
+
+from src import tracing
+from src.aggregates import AGGREGATES_FOLDER, PERCENTILES, AggregateStore, concurrency_sweep
+from src.interval_index import INTERVAL_INDEX_PATH, IntervalIndex
+from src.job_store import JobStore
+from src.utils import TEMPLATE_HEADERS, render_event
+
+
+# Columns each analysis actually reads; load_data does not load anything else
+ANALYSIS_COLUMNS = {
+    'jobs': ['id', 'name', 'scheduled_time', 'start_time', 'end_time', 'return_code'],
+    'reports': ['id', 'file_name', 'start_time', 'end_time'],
+    # Text-encoded events have an Event column, templated ones a Template ID and Params
+    'events': ['Event', 'Template ID', 'Params', 'Message Code'],
+}
 
 
 class JobsAnalyzer:
-    def __init__(self, project_root=None):
+    def __init__(self, project_root=None, output_format='csv'):
         """Initialize the Ultimate Analyzer with project directory configuration."""
         self.project_root = project_root or os.path.dirname(os.path.abspath(__file__))
+        self.output_format = output_format
         self.jobs_df = None
         self.reports_df = None
         self.events_df = None
-
+        # Template ID -> template, when events were written template-encoded
+        self.event_templates = None
+        # (jobs frame, concurrency series, sorted event positions, closing ends)
+        self._concurrency = None
+        # (events frame, its error events), shared by the pattern analysis and the charts
+        self._error_events = None
+        # (jobs frame, IntervalIndex built from or loaded for it)
+        self._interval_index = None
+        # Aggregates folded from every ingested log, when the processors stored them
+        self.aggregates = None
+
+    def _dataset_path(self, dataset):
+        if self.output_format == 'parquet':
+            return os.path.join(self.project_root, 'parquet', dataset)
+        return os.path.join(self.project_root, 'csv', f'{dataset}.csv')
+
+    def _read_dataset(self, dataset, columns, keep_text=False):
+        """Read whichever of the given columns a combined dataset written by the processors has.
+
+        keep_text reads CSV values such as 'NA' or 'null' as text instead of missing.
+        """
+        if self.output_format == 'parquet':
+            import pyarrow.parquet as pq
+
+            # Typed columns: timestamps are already datetimes and codes are categoricals
+            path = self._dataset_path(dataset)
+            available = pq.ParquetDataset(path).schema.names
+            return pd.read_parquet(path, columns=[column for column in columns if column in available])
+        return pd.read_csv(self._dataset_path(dataset), usecols=lambda column: column in columns,
+                           keep_default_na=not keep_text)
+
+    @tracing.traced()
     def load_data(self):
-        """Load data from CSV files and convert time columns to datetime."""
+        """Load the combined data and convert time columns to datetime."""
         print("Loading data files...")
 
         # Load DataFrames
-        self.jobs_df = pd.read_csv(os.path.join(self.project_root, 'csv', 'combined_jobs.csv'))
-        self.reports_df = pd.read_csv(os.path.join(self.project_root, 'csv', 'combined_reports.csv'))
-        self.events_df = pd.read_csv(os.path.join(self.project_root, 'csv', 'combined_events.csv'))
-
-        # Convert time columns to datetime
-        time_columns = ['scheduled_time', 'start_time', 'end_time']
-        for col in time_columns:
-            if col in self.jobs_df.columns:
-                self.jobs_df[col] = pd.to_datetime(self.jobs_df[col], format='%Y-%m-%d %H:%M:%S', errors='coerce')
-
-        for col in ['start_time', 'end_time']:
-            if col in self.reports_df.columns:
-                self.reports_df[col] = pd.to_datetime(self.reports_df[col], format='%Y-%m-%d %H:%M:%S', errors='coerce')
-
-        if 'Timestamp' in self.events_df.columns:
-            self.events_df['Timestamp'] = pd.to_datetime(self.events_df['Timestamp'], format='%Y-%m-%d %H:%M:%S',
-                                                         errors='coerce')
+        self.jobs_df = self._read_dataset('combined_jobs', ANALYSIS_COLUMNS['jobs'])
+        self.reports_df = self._read_dataset('combined_reports', ANALYSIS_COLUMNS['reports'])
+        self.events_df = self._read_dataset('combined_events', ANALYSIS_COLUMNS['events'], keep_text=True)
+        if 'Template ID' in self.events_df.columns:
+            templates = self._read_dataset('combined_events_templates', TEMPLATE_HEADERS, keep_text=True)
+            self.event_templates = templates.set_index('Template ID')['Template']
+        self._convert_time_columns()
 
         print("Data loading complete.")
 
+    def load_parse_state(self, state, events=(), templates=None):
+        """Load jobs and reports straight from a ParseState's records instead of from disk.
+
+        Events are streamed to the output while parsing, so any the caller kept can be
+        passed as (timestamp, event, message code) tuples, or as (timestamp, template id,
+        params, message code) tuples together with the EventTemplates that encoded them.
+        """
+        self.jobs_df = self._records_frame(state.jobs, ANALYSIS_COLUMNS['jobs'])
+        self.reports_df = self._records_frame(state.reports, ANALYSIS_COLUMNS['reports'])
+        if templates is None:
+            self.events_df = pd.DataFrame([event[1:] for event in events], columns=['Event', 'Message Code'])
+            self.event_templates = None
+        else:
+            self.events_df = pd.DataFrame([event[1:] for event in events],
+                                          columns=['Template ID', 'Params', 'Message Code'])
+            self.event_templates = pd.Series({template_id: template
+                                              for template, template_id in templates.ids.items()},
+                                             dtype=object)
+        self._convert_time_columns()
+
+    @tracing.traced()
+    def load_jobs_from_store(self, name=None, name_like=None, start=None, end=None, return_code=None):
+        """Load only the matching jobs from the SQLite job store written by the multi-day processor.
+
+        The filters run in SQL on the store's indexes: name, name_like (an SQL LIKE
+        pattern), start_time in [start, end) and return_code. Reports and events are
+        left as they are.
+        """
+        with JobStore(os.path.join(self.project_root, 'db', 'jobs.sqlite')) as store:
+            sql, params = store.select_jobs(ANALYSIS_COLUMNS['jobs'], name=name, name_like=name_like,
+                                            start=start, end=end, return_code=return_code)
+            self.jobs_df = pd.read_sql_query(sql, store.connection, params=params)
+        self._convert_time_columns()
+        return self.jobs_df
+
+    def event_texts(self, events=None):
+        """Full event text for the given events (all by default), rehydrating templated events."""
+        events = self.events_df if events is None else events
+        if 'Event' in events.columns:
+            return events['Event']
+        templates = events['Template ID'].map(self.event_templates)
+        return pd.Series([render_event(template, params, message_code)
+                          for template, params, message_code
+                          in zip(templates, events['Params'], events['Message Code'].astype(str))],
+                         index=events.index, dtype=object)
+
+    def error_events(self):
+        """Events whose text mentions 'error'.
+
+        Templated events are not rehydrated: an event matches when its template, scanned
+        once per distinct template, or its parameters do. Computed once per events frame.
+        """
+        events = self.events_df
+        if self._error_events is not None and self._error_events[0] is events:
+            return self._error_events[1]
+        if 'Event' in events.columns:
+            is_error = events['Event'].str.contains('error', case=False, na=False)
+        else:
+            templates = self.event_templates
+            error_template_ids = templates.index[templates.str.contains('error', case=False, na=False)]
+            is_error = (events['Template ID'].isin(error_template_ids)
+                        | events['Params'].str.contains('error', case=False, na=False))
+        self._error_events = (events, events[is_error])
+        return self._error_events[1]
+
+    @staticmethod
+    def _records_frame(records, columns):
+        """Build a DataFrame from id -> JobRecord/ReportRecord; unset fields become missing."""
+        return pd.DataFrame([(record_id, *(record[column] for column in columns[1:]))
+                             for record_id, record in records.items()], columns=columns)
+
+    def _convert_time_columns(self):
+        # The processors write str(datetime), which only includes microseconds when they
+        # are non-zero, so parse as ISO 8601 rather than a fixed format that would
+        # silently turn fractional seconds into NaT
+        for df, time_columns in ((self.jobs_df, ['scheduled_time', 'start_time', 'end_time']),
+                                 (self.reports_df, ['start_time', 'end_time'])):
+            if df is None:
+                continue
+            for col in time_columns:
+                if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce')
+
+    @tracing.traced()
     def analyze_jobs(self):
         """Perform comprehensive job analysis."""
         print("\nAnalyzing jobs...")
@@ -45,8 +167,8 @@ class JobsAnalyzer:
         # Calculate basic job metrics
         total_jobs = len(self.jobs_df)
         completed_jobs = self.jobs_df['end_time'].notna().sum()
-        success_rate = (self.jobs_df[
-                            'return_code'] == '0').mean() * 100 if 'return_code' in self.jobs_df.columns else None
+        success_rate = (pd.to_numeric(self.jobs_df['return_code'], errors='coerce') == 0).mean() * 100 \
+            if 'return_code' in self.jobs_df.columns else None
 
         # Calculate job durations for jobs with valid start and end times
         mask = self.jobs_df['start_time'].notna() & self.jobs_df['end_time'].notna()
@@ -63,7 +185,8 @@ class JobsAnalyzer:
         max_duration = valid_jobs['duration'].max()
 
         # Get most common jobs
-        top_jobs = self.jobs_df['name'].value_counts().head()
+        top_jobs = self.jobs_df['name'].value_counts()
+        top_jobs = top_jobs[top_jobs > 0].head()  # categorical columns also count unused names
 
         # Get longest running jobs with complete information
         longest_jobs = valid_jobs.nlargest(20, 'duration')[
@@ -75,6 +198,18 @@ class JobsAnalyzer:
             lambda x: f"{int(x // 60)}h {int(x % 60)}m"
         )
 
+        # Duration and schedule-to-start wait time percentiles, overall and per job name
+        waits = (self.jobs_df['start_time'] - self.jobs_df['scheduled_time']).dt.total_seconds() / 60
+        waits = pd.DataFrame({'name': self.jobs_df['name'], 'wait': waits})[waits >= 0]
+        percentiles = list(PERCENTILES)
+        job_percentiles = pd.concat([
+            valid_jobs.groupby('name', observed=True)['duration'].size().rename('runs'),
+            valid_jobs.groupby('name', observed=True)['duration'].quantile(percentiles).unstack()
+            .rename(columns=lambda fraction: f'duration_{self._percentile_label(fraction)}'),
+            waits.groupby('name', observed=True)['wait'].quantile(percentiles).unstack()
+            .rename(columns=lambda fraction: f'wait_{self._percentile_label(fraction)}'),
+        ], axis=1)
+
         # Save results
         results = {
             'total_jobs': total_jobs,
@@ -83,12 +218,16 @@ class JobsAnalyzer:
             'avg_duration': avg_duration,
             'max_duration': max_duration,
             'top_jobs': top_jobs,
-            'longest_jobs': longest_jobs
+            'longest_jobs': longest_jobs,
+            'duration_percentiles': valid_jobs['duration'].quantile(percentiles).tolist(),
+            'wait_percentiles': waits['wait'].quantile(percentiles).tolist(),
+            'job_percentiles': job_percentiles
         }
 
         self._save_job_analysis(results)
         return results
 
+    @tracing.traced()
     def analyze_patterns(self):
         """Analyze various patterns in the data."""
         print("\nAnalyzing patterns...")
@@ -102,8 +241,9 @@ class JobsAnalyzer:
         daily_patterns = self.jobs_df.groupby('date').size()
 
         # Analyze error patterns
-        error_events = self.events_df[self.events_df['Event'].str.contains('error', case=False, na=False)]
+        error_events = self.error_events()
         error_patterns = error_events['Message Code'].value_counts()
+        error_patterns = error_patterns[error_patterns > 0]
 
         patterns = {
             'hourly': hourly_patterns,
@@ -114,6 +254,7 @@ class JobsAnalyzer:
         self._save_pattern_analysis(patterns)
         return patterns
 
+    @tracing.traced()
     def analyze_system_load(self):
         """Analyze system load and performance metrics."""
         print("\nAnalyzing system load...")
@@ -122,147 +263,247 @@ class JobsAnalyzer:
         concurrent_df = self.get_concurrent_jobs_data()
 
         # Calculate system metrics
+        hours = (self.jobs_df['end_time'].max() - self.jobs_df['start_time'].min()).total_seconds() / 3600
         system_metrics = {
             'peak_concurrent_jobs': concurrent_df['concurrent_jobs'].max(),
             'avg_concurrent_jobs': concurrent_df['concurrent_jobs'].mean(),
-            'total_execution_time': (self.jobs_df['end_time'].max() - self.jobs_df[
-                'start_time'].min()).total_seconds() / 3600,
-            'jobs_per_hour': len(self.jobs_df) / (
-                    (self.jobs_df['end_time'].max() - self.jobs_df['start_time'].min()).total_seconds() / 3600)
+            'total_execution_time': hours,
+            'jobs_per_hour': len(self.jobs_df) / hours if hours else float('nan')
         }
 
         self._save_system_analysis(system_metrics, concurrent_df)
         return system_metrics, concurrent_df
 
+    @tracing.traced()
     def get_concurrent_jobs_data(self):
-        """Calculate concurrent jobs data with detailed time series."""
-        events = []
-
-        # Create events for job starts and ends
-        for _, row in self.jobs_df.iterrows():
-            if pd.notnull(row['start_time']):
-                events.append((row['start_time'], 1, row['name']))
-            if pd.notnull(row['end_time']):
-                events.append((row['end_time'], -1, row['name']))
-
-        # Sort events by timestamp
-        events.sort(key=lambda x: x[0])
-
-        # Calculate concurrent jobs over time
-        concurrent_jobs = []
-        active_jobs = set()
-
-        for time, change, job_name in events:
-            if change == 1:
-                active_jobs.add(job_name)
+        """Calculate the number of running jobs after every job start and end.
+
+        Vectorized sweep: each run (one jobs row per RunID) adds +1 at its start and -1 at
+        its end, and the deltas are summed in time order. The result is computed once per
+        jobs frame and shared by every caller; use active_job_labels for job names.
+        """
+        if self._concurrency is not None and self._concurrency[0] is self.jobs_df:
+            return self._concurrency[1]
+
+        starts = self.jobs_df['start_time'].to_numpy('datetime64[ns]')
+        ends = self.jobs_df['end_time'].to_numpy('datetime64[ns]')
+        event_positions, counts, closes = concurrency_sweep(starts, ends)
+        # Positions index the start/end pairs interleaved per run
+        times = np.column_stack([starts, ends]).ravel()
+        concurrent_df = pd.DataFrame({
+            'timestamp': times[event_positions],
+            'concurrent_jobs': counts,
+        })
+        self._concurrency = (self.jobs_df, concurrent_df, event_positions, closes)
+        return concurrent_df
+
+    def active_job_labels(self, rows=None):
+        """Name up to three running jobs at the given rows of get_concurrent_jobs_data.
+
+        Labels are only built for the rows asked for (all rows by default), replaying the
+        starts and ends in order up to the last of them.
+        """
+        concurrent_df = self.get_concurrent_jobs_data()
+        _, _, event_positions, closes = self._concurrency
+        rows = range(len(concurrent_df)) if rows is None else list(rows)
+        wanted = set(rows)
+        names = self.jobs_df['name'].to_numpy(object)
+
+        labels = {}
+        active = {}
+        for row, position in enumerate(event_positions[:max(wanted, default=-1) + 1]):
+            job, is_end = divmod(int(position), 2)
+            if not is_end:
+                active[job] = str(names[job])
+            elif closes[job]:
+                active.pop(job, None)
+            if row in wanted:
+                labels[row] = ', '.join(islice(active.values(), 3)) + (
+                    f' (+{len(active) - 3} more)' if len(active) > 3 else '')
+        return pd.Series([labels[row] for row in rows], index=rows, name='active_jobs', dtype=object)
+
+    def interval_index(self):
+        """Interval index over the loaded jobs' runs, built once per jobs frame; with no
+        jobs loaded, the index the multiple-day processor saved."""
+        if self._interval_index is None or self._interval_index[0] is not self.jobs_df:
+            if self.jobs_df is None:
+                self.load_interval_index()
             else:
-                active_jobs.discard(job_name)
+                self._interval_index = (self.jobs_df, IntervalIndex.from_frame(self.jobs_df))
+        return self._interval_index[1]
+
+    def interval_index_path(self):
+        return os.path.join(self.project_root, self.output_format, INTERVAL_INDEX_PATH)
+
+    @tracing.traced()
+    def save_interval_index(self):
+        self.interval_index().save(self.interval_index_path())
+
+    def load_interval_index(self):
+        """Use the saved interval index, so queries work without loading the jobs first."""
+        self._interval_index = (self.jobs_df, IntervalIndex.load(self.interval_index_path()))
+
+    def jobs_running_during(self, start, end):
+        """Job runs that were running at some moment between start and end, by start time."""
+        ids, names, start_times, end_times = self.interval_index().overlapping(start, end)
+        return pd.DataFrame({'id': ids, 'name': names, 'start_time': start_times, 'end_time': end_times})
+
+    def jobs_running_at(self, timestamp):
+        """Job runs that were running at the given moment, by start time."""
+        return self.jobs_running_during(timestamp, timestamp)
+
+    @tracing.traced()
+    def load_aggregates(self):
+        """Fold the per-log aggregates stored by the multiple-day processor.
+
+        False if there are none, or if the combined outputs changed since they were
+        stored (e.g. an interrupted run), in which case the raw rows have to be read.
+        """
+        store = AggregateStore(os.path.join(self.project_root, self.output_format, AGGREGATES_FOLDER))
+        if not store.matches([self._dataset_path(dataset)
+                              for dataset in ('combined_jobs', 'combined_reports', 'combined_events')]):
+            return False
+        self.aggregates = store.combined()
+        return self.aggregates is not None
+
+    @tracing.traced()
+    def save_aggregate_results(self):
+        """Write the job, pattern and system results from the loaded aggregates, without raw rows."""
+        print("\nSaving results from stored aggregates...")
+        data = self.aggregates.data
+
+        top_jobs = pd.Series(data['job_names'], dtype='int64').rename_axis('name')
+        longest_jobs = pd.DataFrame(data['longest_jobs'], columns=[
+            'name', 'id', 'duration', 'start_time', 'end_time', 'return_code'])
+        for col in ('start_time', 'end_time'):
+            longest_jobs[col] = pd.to_datetime(longest_jobs[col])
+        # Float, as in the raw rows, where runs without an end leave the column with NaN
+        longest_jobs['return_code'] = longest_jobs['return_code'].astype('float64')
+        longest_jobs['duration_formatted'] = longest_jobs['duration'].apply(
+            lambda x: f"{int(x // 60)}h {int(x % 60)}m"
+        )
+        duration_count = data['duration_count']
+        results = {
+            'total_jobs': data['total_jobs'],
+            'completed_jobs': data['completed_jobs'],
+            'success_rate': data['succeeded_jobs'] / data['total_jobs'] * 100 if data['total_jobs'] else None,
+            'avg_duration': data['duration_sum'] / duration_count if duration_count else float('nan'),
+            'max_duration': data['duration_max'] if duration_count else float('nan'),
+            'top_jobs': top_jobs.sort_values(ascending=False, kind='stable').head(),
+            'longest_jobs': longest_jobs,
+            'duration_percentiles': data['duration_sketch'].quantiles(PERCENTILES),
+            'wait_percentiles': data['wait_sketch'].quantiles(PERCENTILES),
+            'job_percentiles': pd.DataFrame.from_dict({
+                name: [duration_sketch.count,
+                       *duration_sketch.quantiles(PERCENTILES), *wait_sketch.quantiles(PERCENTILES)]
+                for name, (duration_sketch, wait_sketch) in data['job_sketches'].items()
+            }, orient='index', columns=[
+                'runs', *(f'duration_{self._percentile_label(fraction)}' for fraction in PERCENTILES),
+                *(f'wait_{self._percentile_label(fraction)}' for fraction in PERCENTILES)
+            ]).rename_axis('name')
+        }
+        self._save_job_analysis(results)
 
-            concurrent_jobs.append({
-                'timestamp': time,
-                'concurrent_jobs': len(active_jobs),
-                'active_jobs': ', '.join(list(active_jobs)[:3]) + (
-                    f' (+{len(active_jobs) - 3} more)' if len(active_jobs) > 3 else '')
-            })
+        # Float hours, as start_time.dt.hour gives for jobs frames with runs that never started
+        hourly = pd.Series({float(hour): count for hour, count in data['hourly'].items()}, dtype='int64')
+        errors = pd.Series(data['errors'], dtype='int64').rename_axis('Message Code')
+        patterns = {
+            'hourly': hourly.sort_index().rename_axis('hour'),
+            'daily': pd.Series(data['daily'], dtype='int64').sort_index().rename_axis('date'),
+            'errors': errors.sort_values(ascending=False, kind='stable')
+        }
+        self._save_pattern_analysis(patterns)
 
-        return pd.DataFrame(concurrent_jobs)
+        hours = float('nan')
+        if data['first_start'] and data['last_end']:
+            hours = (pd.Timestamp(data['last_end']) - pd.Timestamp(data['first_start'])).total_seconds() / 3600
+        system_metrics = {
+            'peak_concurrent_jobs': data['concurrency_max'],
+            'avg_concurrent_jobs': data['concurrency_sum'] / data['concurrency_events']
+            if data['concurrency_events'] else float('nan'),
+            'total_execution_time': hours,
+            'jobs_per_hour': data['total_jobs'] / hours if hours else float('nan')
+        }
+        # The concurrency time series itself needs the raw rows (get_concurrent_jobs_data)
+        self._save_system_analysis(system_metrics, None)
+        return results, patterns, system_metrics
+
+    def _add_derived_columns(self):
+        """Add the duration, hour and date columns the charts use, if the analyze_* steps did not."""
+        if 'duration' not in self.jobs_df.columns:
+            self.jobs_df['duration'] = (self.jobs_df['end_time'] - self.jobs_df['start_time']).dt.total_seconds() / 60
+        if 'hour' not in self.jobs_df.columns:
+            self.jobs_df['hour'] = self.jobs_df['start_time'].dt.hour
+        if 'date' not in self.jobs_df.columns:
+            self.jobs_df['date'] = self.jobs_df['start_time'].dt.date
+
+    @tracing.traced()
+    def generate_visualizations(self, workers=None):
+        """Generate comprehensive visualizations.
+
+        The plot data is prepared here, with the concurrency series downsampled to the
+        figure's pixel width, and the figures are rendered in worker processes
+        (charts.render_charts; workers=1 renders them here, one after another).
+        """
+        # matplotlib is only loaded by runs that draw charts
+        from src.charts import (
+            CONCURRENCY_DPI, CONCURRENCY_FIGSIZE, downsample_minmax, pixel_width, plot_bar, plot_concurrency,
+            plot_histogram, plot_line, render_charts
+        )
 
-    def generate_visualizations(self):
-        """Generate comprehensive visualizations."""
         print("\nGenerating visualizations...")
+        self._add_derived_columns()
 
         # Create graphs directory if it doesn't exist
         graphs_dir = os.path.join(self.project_root, 'graphs')
         os.makedirs(graphs_dir, exist_ok=True)
+        charts = []
 
         # 1. Job Distribution by Hour
-        plt.figure(figsize=(12, 6))
-        self.jobs_df['hour'].value_counts().sort_index().plot(kind='bar')
-        plt.title('Job Distribution by Hour of Day')
-        plt.xlabel('Hour')
-        plt.ylabel('Number of Jobs')
-        plt.tight_layout()
-        plt.savefig(os.path.join(graphs_dir, 'job_distribution_by_hour.png'))
-        plt.close()
+        charts.append(('job_distribution_by_hour', plot_bar, (
+            self.jobs_df['hour'].value_counts().sort_index(), os.path.join(graphs_dir, 'job_distribution_by_hour.png'),
+            'Job Distribution by Hour of Day', 'Hour', 'Number of Jobs')))
 
         # 2. Job Duration Distribution
-        plt.figure(figsize=(12, 6))
-        sns.histplot(data=self.jobs_df, x='duration', bins=50)
-        plt.title('Distribution of Job Durations')
-        plt.xlabel('Duration (minutes)')
-        plt.ylabel('Frequency')
-        plt.tight_layout()
-        plt.savefig(os.path.join(graphs_dir, 'job_duration_distribution.png'))
-        plt.close()
+        if self.aggregates is not None:
+            # Bounded memory: the histogram is estimated from the duration sketch
+            edges, counts = self.aggregates.data['duration_sketch'].histogram(50)
+        else:
+            counts, edges = np.histogram(self.jobs_df['duration'].dropna(), bins=50)
+        charts.append(('job_duration_distribution', plot_histogram, (
+            edges, counts, os.path.join(graphs_dir, 'job_duration_distribution.png'),
+            'Distribution of Job Durations', 'Duration (minutes)', 'Frequency')))
 
         # 3. System Load Over Time
-        plt.figure(figsize=(12, 6))
-        self.jobs_df.groupby('date').size().plot()
-        plt.title('System Load Over Time')
-        plt.xlabel('Date')
-        plt.ylabel('Number of Jobs')
-        plt.tight_layout()
-        plt.savefig(os.path.join(graphs_dir, 'system_load_over_time.png'))
-        plt.close()
+        charts.append(('system_load_over_time', plot_line, (
+            self.jobs_df.groupby('date').size(), os.path.join(graphs_dir, 'system_load_over_time.png'),
+            'System Load Over Time', 'Date', 'Number of Jobs')))
 
         # 4. Error Distribution
-        error_events = self.events_df[self.events_df['Event'].str.contains('error', case=False, na=False)]
-        plt.figure(figsize=(12, 6))
-        error_events['Message Code'].value_counts().head(10).plot(kind='bar')
-        plt.title('Top 10 Error Message Codes')
-        plt.xlabel('Message Code')
-        plt.ylabel('Frequency')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(graphs_dir, 'error_distribution.png'))
-        plt.close()
-
-        # 5. Concurrent Jobs Visualization
-        concurrent_df = self.get_concurrent_jobs_data()
-
-        # Create figure with two subplots
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 12), height_ratios=[2, 1])
-
-        # Plot concurrent jobs over time
-        ax1.plot(concurrent_df['timestamp'], concurrent_df['concurrent_jobs'],
-                 linewidth=2, color='blue', label='Concurrent Jobs')
-
-        # Add peak markers
-        peak_mask = concurrent_df['concurrent_jobs'] == concurrent_df['concurrent_jobs'].max()
-        ax1.scatter(concurrent_df[peak_mask]['timestamp'],
-                    concurrent_df[peak_mask]['concurrent_jobs'],
-                    color='red', s=100, zorder=5, label='Peak Concurrency')
-
-        # Customize the main plot
-        ax1.set_title('Concurrent Jobs Over Time', fontsize=14, pad=20)
-        ax1.set_xlabel('Time')
-        ax1.set_ylabel('Number of Concurrent Jobs')
-        ax1.grid(True, linestyle='--', alpha=0.7)
-        ax1.legend()
-
-        # Add daily average line using 'D' frequency
-        daily_avg = concurrent_df.set_index('timestamp').resample('D')['concurrent_jobs'].mean()
-        ax1.plot(daily_avg.index, daily_avg.values,
-                 color='green', linestyle='--', label='Daily Average')
-
-        # Add heatmap showing intensity of job concurrency using 'h' frequency
-        daily_hours = concurrent_df.set_index('timestamp').resample('h')['concurrent_jobs'].mean().values
-        hours = range(len(daily_hours))
-        heatmap = ax2.pcolormesh([hours], [0], [daily_hours], cmap='YlOrRd')
-        ax2.set_title('Job Concurrency Heatmap', fontsize=12)
-        ax2.set_xlabel('Hours from Start')
-        ax2.set_yticks([])
-
-        # Add colorbar
-        plt.colorbar(heatmap, ax=ax2, orientation='horizontal', label='Average Concurrent Jobs')
-
-        # Adjust layout and save
-        plt.tight_layout()
-        plt.savefig(os.path.join(graphs_dir, 'concurrent_jobs_analysis.png'), dpi=300, bbox_inches='tight')
-        plt.close()
+        error_counts = self.error_events()['Message Code'].value_counts()
+        charts.append(('error_distribution', plot_bar, (
+            error_counts[error_counts > 0].head(10), os.path.join(graphs_dir, 'error_distribution.png'),
+            'Top 10 Error Message Codes', 'Message Code', 'Frequency', 45)))
 
+        # 5. Concurrent Jobs Visualization: the line is downsampled, while the peaks
+        # and the daily and hourly averages come from every point
+        concurrent_df = self.get_concurrent_jobs_data()
+        times = concurrent_df['timestamp'].to_numpy()
+        counts = concurrent_df['concurrent_jobs'].to_numpy()
+        kept = downsample_minmax(times, counts, pixel_width(CONCURRENCY_FIGSIZE, CONCURRENCY_DPI))
+        peak = counts.max() if len(counts) else 0
+        by_time = concurrent_df.set_index('timestamp')['concurrent_jobs']
+        charts.append(('concurrent_jobs_analysis', plot_concurrency, (
+            times[kept], counts[kept], times[counts == peak], peak, by_time.resample('D').mean(),
+            by_time.resample('h').mean().values, os.path.join(graphs_dir, 'concurrent_jobs_analysis.png'))))
+
+        render_charts(charts, workers)
         print("Visualizations saved in the 'graphs' directory.")
 
+    @staticmethod
+    def _percentile_label(fraction):
+        return f'p{round(fraction * 100)}'
+
     def _save_job_analysis(self, results):
         """Save job analysis results to CSV."""
         results_dir = os.path.join(self.project_root, 'results')
@@ -276,7 +517,18 @@ class JobsAnalyzer:
                       f"{results['avg_duration']:.2f} minutes",
                       f"{results['max_duration']:.2f} minutes"]
         })
-        summary.to_csv(os.path.join(results_dir, 'job_summary.csv'), index=False)
+
+        # Percentile section: duration and schedule-to-start wait time
+        percentile_rows = pd.DataFrame({
+            'Metric': [f'{metric} {self._percentile_label(fraction)}'
+                       for metric in ('Duration', 'Wait Time') for fraction in PERCENTILES],
+            'Value': [f"{value:.2f} minutes" if value is not None and pd.notna(value) else 'N/A'
+                      for key in ('duration_percentiles', 'wait_percentiles') for value in results[key]]
+        })
+        pd.concat([summary, percentile_rows]).to_csv(os.path.join(results_dir, 'job_summary.csv'), index=False)
+
+        # Save per job name percentiles
+        results['job_percentiles'].sort_index().to_csv(os.path.join(results_dir, 'job_percentiles.csv'))
 
         # Save top jobs
         results['top_jobs'].to_frame('count').to_csv(os.path.join(results_dir, 'top_jobs.csv'))
@@ -304,28 +556,51 @@ class JobsAnalyzer:
             'Value': list(metrics.values())
         }).to_csv(os.path.join(results_dir, 'system_metrics.csv'), index=False)
 
-        # Save concurrent jobs data
-        concurrent_df.to_csv(os.path.join(results_dir, 'concurrent_jobs.csv'), index=False)
+        if concurrent_df is not None:
+            self.save_concurrent_jobs(concurrent_df)
 
+    def save_concurrent_jobs(self, concurrent_df=None):
+        """Save the concurrent jobs data, naming the running jobs at each point."""
+        results_dir = os.path.join(self.project_root, 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        if concurrent_df is None:
+            concurrent_df = self.get_concurrent_jobs_data()
+        concurrent_df.assign(active_jobs=self.active_job_labels().to_numpy()).to_csv(
+            os.path.join(results_dir, 'concurrent_jobs.csv'), index=False)
 
-def main():
-    analyzer = JobsAnalyzer()
 
-    try:
-        # Load data
-        analyzer.load_data()
+def main(output_format='csv', charts=True, chart_workers=None, concurrent_jobs=False):
+    """Write the analysis results, and the charts unless charts is False.
+
+    Results come from the multiple-day processor's aggregates when they match the
+    combined outputs; the raw rows are then only read for the charts, or to write
+    concurrent_jobs.csv when concurrent_jobs is set. Without usable aggregates
+    everything, concurrent_jobs.csv included, is computed from the raw rows.
+    """
+    analyzer = JobsAnalyzer(output_format=output_format)
 
-        # Perform analysis
-        job_results = analyzer.analyze_jobs()
-        pattern_results = analyzer.analyze_patterns()
-        system_results, concurrent_jobs = analyzer.analyze_system_load()
+    try:
+        if analyzer.load_aggregates():
+            analyzer.save_aggregate_results()
+            if charts or concurrent_jobs:
+                analyzer.load_data()
+            if concurrent_jobs:
+                analyzer.save_concurrent_jobs()
+        else:
+            analyzer.load_data()
+            job_results = analyzer.analyze_jobs()
+            pattern_results = analyzer.analyze_patterns()
+            system_results, concurrent_df = analyzer.analyze_system_load()
 
         # Generate visualizations
-        analyzer.generate_visualizations()
+        if charts:
+            analyzer.generate_visualizations(chart_workers)
 
+        tracing.export('analysis')
         print("\nAnalysis complete!")
         print("Results have been saved in the 'results' directory.")
-        print("Visualizations have been saved in the 'graphs' directory.")
+        if charts:
+            print("Visualizations have been saved in the 'graphs' directory.")
 
     except Exception as e:
         print(f"\nError during analysis: {str(e)}")
@@ -333,4 +608,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    from src.cli import main as cli_main
+
+    sys.exit(cli_main(['analyze', *sys.argv[1:]]))
\ No newline at end of file
@@ -1,149 +1,571 @@
+import csv
+import mmap
 import os
+import queue
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from src.output_backends import DEFAULT_OUTPUT_FORMAT, DEFAULT_EVENT_ENCODING, get_output_backend
+from src import tracing
+from src.resource_sampler import ResourceSampler, summarize_usage
 from src.utils import (
-    PROJECT_ROOT, extract_time_range, parse_sap_log, save_to_csv,
-    save_events_to_csv, monitor_resources, save_benchmarks, read_log_file
+    PROJECT_ROOT, SEGMENTS_FOLDER, JOB_HEADERS, REPORT_HEADERS, DECOMPRESS_BLOCK_SIZE, ParseState, save_benchmarks,
+    compression_suffix, detect_encoding, is_log_file, open_log, skip_bytes, stream_log
 )
 
+DEFAULT_LIVE_WORKERS = 2
+# Files waiting for a worker; what happens when it is full depends on the overflow policy
+LIVE_QUEUE_SIZE = 64
+QUEUE_OVERFLOW_POLICIES = ('block', 'drop')
+# A file is ready once its size and mtime have not changed for this long...
+DEFAULT_QUIET_PERIOD = 1.0
+# ...or once this marker appears next to it (e.g. 20240101.LOG.txt.done)...
+COMPLETION_MARKER_SUFFIX = '.done'
+# ...and a file that keeps growing is still processed at least this often
+DEFAULT_MAX_DELAY = 10.0
+DEBOUNCE_POLL_INTERVAL = 0.1
+# realtime_benchmarks.csv, the queue metrics and the traces are rewritten at most this often
+BENCHMARK_SAVE_INTERVAL = 5.0
+
+
+class FileTail:
+    """Read position and open job/report state for one followed log file.
+
+    For a compressed log the offset counts decompressed bytes, and disk_size is its
+    compressed size when it was last read. open_jobs and open_reports hold the ids
+    already written to the live outputs as open rows (no end time yet).
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.compressed = compression_suffix(file_path) is not None
+        self.inode = None
+        self.offset = 0
+        self.disk_size = 0
+        self.encoding = None
+        self.state = ParseState()
+        self.open_jobs = set()
+        self.open_reports = set()
+
+    def reset(self, inode):
+        # Called for a new, rotated or truncated file: start again from the first byte.
+        # Runs still open are carried over, so an end in the new content completes them
+        self.inode = inode
+        self.offset = 0
+        self.disk_size = 0
+        self.encoding = None
+        jobs, reports = self.state.jobs, self.state.reports
+        self.state = ParseState()
+        self.state.jobs.update(jobs)
+        self.state.reports.update(reports)
+
+    def shrunk(self, file_size):
+        return file_size < (self.disk_size if self.compressed else self.offset)
+
+    def complete_lines_end(self, file_size):
+        """Offset just past the last newline, so a partially written line is left for later."""
+        if self.compressed:
+            return self._compressed_lines_end()
+        if file_size <= self.offset:
+            return self.offset
+        with open(self.file_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped.rfind(b'\n', self.offset, file_size) + 1 or self.offset
+
+    def _compressed_lines_end(self):
+        # Only the part after the offset is decompressed, but it is decompressed twice:
+        # once here and once by the parser
+        end = position = self.offset
+        try:
+            with open_log(self.file_path) as file:
+                skip_bytes(file, self.offset)
+                for block in iter(lambda: file.read(DECOMPRESS_BLOCK_SIZE), b''):
+                    newline = block.rfind(b'\n')
+                    if newline >= 0:
+                        end = position + newline + 1
+                    position += len(block)
+        except EOFError:
+            # The compressed stream is still being written; wait until it is complete
+            return self.offset
+        return end
+
+    def pop_completed(self):
+        """Remove and return jobs and reports that have ended; open ones stay in memory."""
+        jobs = self.state.jobs
+        reports = self.state.reports
+        completed_jobs = {run_id: job for run_id, job in jobs.items() if job.get('end_time')}
+        completed_reports = {report_id: report for report_id, report in reports.items()
+                             if report.get('end_time')}
+        for run_id in completed_jobs:
+            del jobs[run_id]
+        for report_id in completed_reports:
+            del reports[report_id]
+        # Ends for reports started before we began following the file will never match
+        self.state.unmatched_report_ends.clear()
+        return completed_jobs, completed_reports
+
+
+class Debouncer:
+    """Merges watchdog events per path and releases a path once the file is ready.
+
+    A path is ready when its size and mtime have stayed the same for quiet_period, when
+    its completion marker has appeared, or when it has been waiting for max_delay (so a
+    log that is appended to without pause is still followed). A ready path whose size
+    and mtime are those of its last release is skipped, so a burst of events for one
+    change triggers at most one parse. Deleted paths are released on the next poll.
+    """
+
+    def __init__(self, release, quiet_period=DEFAULT_QUIET_PERIOD, max_delay=DEFAULT_MAX_DELAY,
+                 poll_interval=DEBOUNCE_POLL_INTERVAL):
+        self.release = release
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        # path -> [first event, last size/mtime change, (size, mtime), marker seen]
+        self.pending = {}
+        # path -> (size, mtime) when it was last released
+        self.released = {}
+        # Deleted paths still to be released
+        self.deleted = set()
+        self.counters = {'events': 0, 'merged_events': 0, 'released': 0, 'unchanged': 0, 'deleted': 0}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='live-debouncer', daemon=True)
+        self._thread.start()
+
+    def touch(self, path, complete=False):
+        """Record a created/modified event; complete means its completion marker appeared."""
+        now = time.monotonic()
+        with self.lock:
+            self.counters['events'] += 1
+            entry = self.pending.get(path)
+            if entry is None:
+                self.pending[path] = [now, now, None, complete]
+            else:
+                self.counters['merged_events'] += 1
+                entry[3] = entry[3] or complete
+
+    def forget(self, path):
+        with self.lock:
+            self.pending.pop(path, None)
+            self.released.pop(path, None)
+
+    def delete(self, path):
+        """Record a delete event: the path is forgotten and released once more."""
+        with self.lock:
+            self.counters['deleted'] += 1
+            self.pending.pop(path, None)
+            self.released.pop(path, None)
+            self.deleted.add(path)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            file_stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+    def _ready_paths(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            ready = list(self.deleted)
+            self.deleted.clear()
+            for path, entry in list(self.pending.items()):
+                first_event, last_change, signature, complete = entry
+                current = self._signature(path)
+                if current is None:
+                    # Gone again; the delete event takes care of it
+                    del self.pending[path]
+                    continue
+                if current != signature:
+                    entry[1] = last_change = now
+                    entry[2] = current
+                if (force or complete or now - last_change >= self.quiet_period
+                        or now - first_event >= self.max_delay):
+                    del self.pending[path]
+                    if self.released.get(path) == current:
+                        self.counters['unchanged'] += 1
+                        continue
+                    self.released[path] = current
+                    self.counters['released'] += 1
+                    ready.append(path)
+        return ready
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            for path in self._ready_paths():
+                self.release(path)
+
+    def flush(self):
+        """Release every pending path now, ready or not."""
+        for path in self._ready_paths(force=True):
+            self.release(path)
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics['pending'] = len(self.pending)
+        return metrics
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+
+
+class WorkQueue:
+    """Bounded queue of per-file work served by a pool of worker threads.
+
+    Work is keyed by file path. A path that is already queued is not queued again,
+    and a path that is being processed is marked to run once more when its worker
+    finishes, so every file is processed by at most one worker at a time and no
+    change is missed. When the queue is full, submit either blocks the caller
+    (overflow='block') or drops the work (overflow='drop'); a dropped file is caught
+    up on its next event, since its read offset is kept. Files, deleted ones included,
+    are submitted by the Debouncer's thread, so blocking holds back further releases
+    while the watchdog thread keeps merging events into the debouncer.
+    """
+
+    def __init__(self, process, workers=DEFAULT_LIVE_WORKERS, max_queued=LIVE_QUEUE_SIZE, overflow='block'):
+        if overflow not in QUEUE_OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {QUEUE_OVERFLOW_POLICIES}")
+        self.process = process
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.lock = threading.Lock()
+        self.queued = set()
+        self.running = set()
+        self.rerun = set()
+        self.counters = {'submitted': 0, 'coalesced': 0, 'dropped': 0, 'processed': 0, 'failed': 0,
+                         'max_depth': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                         'processing_seconds': 0.0, 'max_processing_seconds': 0.0}
+        self.threads = [threading.Thread(target=self._work, name=f'live-worker-{index}', daemon=True)
+                        for index in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, path):
+        with self.lock:
+            self.counters['submitted'] += 1
+            if path in self.queued:
+                self.counters['coalesced'] += 1
+                return
+            if path in self.running:
+                self.counters['coalesced'] += 1
+                self.rerun.add(path)
+                return
+            self.queued.add(path)
+        try:
+            self.queue.put((path, time.monotonic()), block=self.overflow == 'block')
+        except queue.Full:
+            with self.lock:
+                self.queued.discard(path)
+                self.counters['dropped'] += 1
+            return
+        with self.lock:
+            self.counters['max_depth'] = max(self.counters['max_depth'], self.queue.qsize())
+
+    def _work(self):
+        while True:
+            path, queued_at = self.queue.get()
+            if path is None:
+                break
+            with self.lock:
+                self.queued.discard(path)
+                self.running.add(path)
+                wait = time.monotonic() - queued_at
+                self.counters['wait_seconds'] += wait
+                self.counters['max_wait_seconds'] = max(self.counters['max_wait_seconds'], wait)
+            while True:
+                start_time = time.monotonic()
+                try:
+                    self.process(path)
+                    failed = False
+                except Exception as e:
+                    print(f"[{datetime.now()}] Error processing {os.path.basename(path)}: {str(e)}")
+                    failed = True
+                elapsed = time.monotonic() - start_time
+                with self.lock:
+                    self.counters['failed' if failed else 'processed'] += 1
+                    self.counters['processing_seconds'] += elapsed
+                    self.counters['max_processing_seconds'] = max(self.counters['max_processing_seconds'], elapsed)
+                    # Changes that arrived while the file was being processed
+                    if path not in self.rerun:
+                        self.running.discard(path)
+                        break
+                    self.rerun.discard(path)
+
+    def metrics(self):
+        """Queue depth, coalesced/dropped counts and wait and processing latency."""
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics['depth'] = self.queue.qsize()
+            metrics['running'] = len(self.running)
+        handled = metrics['processed'] + metrics['failed']
+        metrics['avg_wait_seconds'] = metrics['wait_seconds'] / handled if handled else 0
+        metrics['avg_processing_seconds'] = metrics['processing_seconds'] / handled if handled else 0
+        return metrics
+
+    def join(self):
+        """Wait until everything queued so far has been processed."""
+        while True:
+            with self.lock:
+                if not self.queued and not self.running:
+                    return
+            time.sleep(0.05)
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put((None, None))
+        for thread in self.threads:
+            thread.join()
+
+
+def parse_increment(file_path, encoding, byte_range, state, output, events_segment):
+    """Parse one byte range of a followed file into its own events segment.
+
+    Runs in a worker thread or process; the returned state replaces the file's state.
+    """
+    state = stream_log(file_path, events_segment, state=state, encoding=encoding, byte_range=byte_range,
+                       save_events=output.save_events)
+    output.commit(events_segment)
+    return state
+
 
 class LogFileHandler(FileSystemEventHandler):
-    def __init__(self):
+    """Watchdog handler that only queues work; parsing and writing happen in a WorkQueue.
+
+    Each increment is parsed into a per-file events segment, in a worker thread or,
+    with executor='process', in a process pool. Segments and records are merged into
+    the live outputs under one lock, so workers never interleave their writes.
+    """
+
+    def __init__(self, output_format=DEFAULT_OUTPUT_FORMAT, event_encoding=DEFAULT_EVENT_ENCODING,
+                 resource_series=False, workers=DEFAULT_LIVE_WORKERS, executor='thread',
+                 max_queued=LIVE_QUEUE_SIZE, overflow='block', quiet_period=DEFAULT_QUIET_PERIOD,
+                 max_delay=DEFAULT_MAX_DELAY, writer=None):
+        self.output = get_output_backend(output_format, event_encoding, writer)
         self.processing_times = []
+        # ResourceUsage per processed increment, optionally with its sample series saved
         self.resource_usage = []
-        self.peak_cpu = 0
-        self.peak_ram = 0
-        # Add a set to track processed files
-        self.processed_files = set()
-        # Add a lock for thread safety
-        self.processing_lock = {}
+        self.resource_series = resource_series
+        # Guards the benchmark lists above, and the live outputs, which all workers write to
+        self.stats_lock = threading.Lock()
+        self.last_benchmark_save = 0.0
+        self.output_lock = threading.Lock()
+        # Followed files by path: byte offset, inode and open job/report state. A file is
+        # only ever handled by one worker, so its FileTail needs no lock of its own
+        self.tails = {}
+        self.process_pool = ProcessPoolExecutor(max_workers=workers) if executor == 'process' else None
 
         # Initialize CSV files if they don't exist
         self.initialize_csv_files()
+        self.work_queue = WorkQueue(self.process_file, workers, max_queued, overflow)
+        # Events go through the debouncer first; only files that are ready reach the queue
+        self.debouncer = Debouncer(self.work_queue.submit, quiet_period, max_delay)
 
     def initialize_csv_files(self):
         # Define headers
-        self.job_headers = ['id', 'name', 'scheduled_time', 'start_time', 'end_time', 'return_code',
-                            'scheduled_message_code', 'start_message_code', 'end_message_code', 'remove_message_code']
-        self.report_headers = ['id', 'file_name', 'start_time', 'end_time', 'start_message_code', 'end_message_code']
-
-        # Create fresh CSV files if they don't exist
-        save_to_csv({}, 'combined_jobs.csv', self.job_headers, mode='w')
-        save_to_csv({}, 'combined_reports.csv', self.report_headers, mode='w')
-        save_events_to_csv([], 'combined_events.csv', mode='w')
+        self.job_headers = JOB_HEADERS
+        self.report_headers = REPORT_HEADERS
+
+        # Start the live outputs fresh: followed files are read again from their first byte
+        self.output.save_records({}, 'live_combined_jobs', self.job_headers, mode='w')
+        self.output.save_records({}, 'live_combined_reports', self.report_headers, mode='w')
+        self.output.save_events([], 'live_combined_events', mode='w')
+        self.output.commit()
+
+    def file_changed(self, file_path):
+        if file_path.endswith(COMPLETION_MARKER_SUFFIX):
+            log_file_path = file_path[:-len(COMPLETION_MARKER_SUFFIX)]
+            if is_log_file(log_file_path):
+                self.debouncer.touch(log_file_path, complete=True)
+        elif is_log_file(file_path):
+            self.debouncer.touch(file_path)
 
     def process_file(self, file_path):
         filename = os.path.basename(file_path)
-        if not filename.endswith('.LOG.txt'):
-            return
-
-        # Check if file is already being processed
-        if filename in self.processing_lock:
-            return
-
-        # Check if file has been processed recently
-        current_time = time.time()
-        if filename in self.processed_files:
-            # Skip if file was processed in the last 2 seconds
+        if not os.path.exists(file_path):
+            tail = self.tails.pop(file_path, None)
+            if tail is not None:
+                # Keep whatever was still open when the file went away
+                self.save_records(tail.state.jobs, tail.state.reports, tail)
             return
 
-        self.processing_lock[filename] = current_time
-        print(f"\n[{datetime.now()}] Processing new file: {filename}")
-
+        # Resources are sampled in the background while this increment is processed
+        sampler = ResourceSampler().start()
         try:
             file_start_time = time.time()
 
-            # Read and process the log file
-            log_content = read_log_file(file_path)
-            if not log_content:
-                print(f"[{datetime.now()}] Error: Could not read file {filename}")
+            tail = self.tails.get(file_path)
+            if tail is None:
+                tail = self.tails[file_path] = FileTail(file_path)
+
+            file_stat = os.stat(file_path)
+            if tail.inode != file_stat.st_ino or tail.shrunk(file_stat.st_size):
+                if tail.inode is not None:
+                    print(f"[{datetime.now()}] {filename} was rotated or truncated, reading from the start")
+                    # Runs still open are written now with an empty end time; if they end
+                    # in the new content, their rows are replaced
+                    self.save_records(tail.state.jobs, tail.state.reports, tail, still_open=True)
+                tail.reset(file_stat.st_ino)
+
+            # Only complete lines appended since the last increment are parsed
+            end_offset = tail.complete_lines_end(file_stat.st_size)
+            if end_offset <= tail.offset:
                 return
+            if tail.encoding is None:
+                tail.encoding = detect_encoding(file_path)
+
+            print(f"\n[{datetime.now()}] Processing {end_offset - tail.offset} new bytes of {filename}")
+            segment = os.path.join(SEGMENTS_FOLDER, f"live.{filename}.events")
+            arguments = (file_path, tail.encoding, (tail.offset, end_offset), tail.state, self.output, segment)
+            with tracing.span('live_increment', file=filename) as span:
+                line_count = tail.state.line_count
+                if self.process_pool is None:
+                    tail.state = parse_increment(*arguments)
+                else:
+                    tail.state = tracing.submit(self.process_pool, parse_increment, *arguments).result()
+                span.add(lines=tail.state.line_count - line_count, bytes=end_offset - tail.offset)
+            with self.output_lock:
+                self.output.append_segment(segment, 'live_combined_events')
+                self.output.commit('live_combined_events')
+            tail.offset = end_offset
+            tail.disk_size = file_stat.st_size
 
             # Extract time range
-            start_time, end_time = extract_time_range(log_content)
+            start_time, end_time = tail.state.time_range()
             if start_time and end_time:
                 print(f"[{datetime.now()}] Log period: {start_time} to {end_time}")
             else:
                 print(f"[{datetime.now()}] Warning: Unable to extract time range from {filename}")
 
-            # Parse log content
-            jobs, reports, events = parse_sap_log(log_content)
-
-            # Save to CSV files
-            save_to_csv(jobs, 'live_combined_jobs.csv', self.job_headers, mode='a')
-            save_to_csv(reports, 'live_combined_reports.csv', self.report_headers, mode='a')
-            save_events_to_csv(events, 'live_combined_events.csv', mode='a')
+            # Jobs and reports are written once, when they end
+            self.save_records(*tail.pop_completed(), tail)
 
             # Calculate processing metrics
             file_end_time = time.time()
             file_processing_time = file_end_time - file_start_time
-            cpu_usage, ram_usage = monitor_resources()
+            usage = sampler.stop()
+            if self.resource_series:
+                sampler.save_series(f"{filename}.{len(self.processing_times)}")
 
-            # Update statistics
-            self.processing_times.append((filename, file_processing_time))
-            self.resource_usage.append((filename, cpu_usage, ram_usage))
-            self.peak_cpu = max(self.peak_cpu, cpu_usage)
-            self.peak_ram = max(self.peak_ram, ram_usage)
-
-            # Save updated benchmarks
-            self.save_current_benchmarks()
+            # Update statistics; the benchmark files are rewritten every few seconds, not per increment
+            with self.stats_lock:
+                self.processing_times.append((filename, file_processing_time))
+                self.resource_usage.append(usage)
+                if time.monotonic() - self.last_benchmark_save >= BENCHMARK_SAVE_INTERVAL:
+                    self.save_current_benchmarks()
 
             print(f"[{datetime.now()}] Successfully processed {filename}")
             print(f"Processing time: {file_processing_time:.2f} seconds")
-            print(f"CPU usage: {cpu_usage:.2f}%, RAM usage: {ram_usage:.2f} MB")
-
-            # Add file to processed set with timestamp
-            self.processed_files.add(filename)
-
-        except Exception as e:
-            print(f"[{datetime.now()}] Error processing {filename}: {str(e)}")
+            print(f"CPU usage: {usage.avg_cpu:.2f}% avg, {usage.peak_cpu:.2f}% peak; "
+                  f"RAM usage: {usage.avg_ram:.2f} MB avg, {usage.peak_ram:.2f} MB peak")
         finally:
-            # Remove the processing lock
-            self.processing_lock.pop(filename, None)
+            if sampler.usage is None:
+                sampler.stop()
+
+    def save_records(self, jobs, reports, tail=None, still_open=False):
+        """Append jobs and reports to the live outputs.
+
+        Rows the tail wrote earlier as open runs are replaced instead of duplicated;
+        with still_open the records are open runs and are remembered as such.
+        """
+        with self.output_lock, tracing.span('save_records') as span:
+            for records, dataset, headers, written in (
+                    (jobs, 'live_combined_jobs', self.job_headers, tail and tail.open_jobs),
+                    (reports, 'live_combined_reports', self.report_headers, tail and tail.open_reports)):
+                replaced = written & records.keys() if written else set()
+                if replaced:
+                    self.remove_rows(dataset, headers, replaced)
+                    written -= replaced
+                self.output.save_records(records, dataset, headers, mode='a')
+                if still_open:
+                    written.update(records)
+                self.output.commit(dataset)
+            span.add(lines=len(jobs) + len(reports))
+
+    def remove_rows(self, dataset, headers, ids):
+        # Only runs that were open across a rotation get here, so a rewrite is rare
+        rows = [row for row in self.output.read_rows(dataset) if row[0] not in ids]
+        self.output.write_rows(rows, dataset, headers, mode='w')
 
     def save_current_benchmarks(self):
         if not self.processing_times:
             return
+        self.last_benchmark_save = time.monotonic()
 
         total_time = sum(time for _, time in self.processing_times)
         avg_time = total_time / len(self.processing_times)
-        avg_cpu = sum(cpu for _, cpu, _ in self.resource_usage) / len(self.resource_usage)
-        avg_ram = sum(ram for _, _, ram in self.resource_usage) / len(self.resource_usage)
+        average_usage, peak_usage = summarize_usage(self.resource_usage)
 
         benchmarks = [
-            (filename, process_time, cpu_usage, ram_usage)
-            for (filename, process_time), (_, cpu_usage, ram_usage)
-            in zip(self.processing_times, self.resource_usage)
+            (filename, process_time, *usage)
+            for (filename, process_time), usage in zip(self.processing_times, self.resource_usage)
         ]
-        benchmarks.append(('Total', total_time, '', ''))
-        benchmarks.append(('Average', avg_time, avg_cpu, avg_ram))
-        benchmarks.append(('Peak', '', self.peak_cpu, self.peak_ram))
+        benchmarks.append(('Total', total_time))
+        benchmarks.append(('Average', avg_time, *average_usage))
+        benchmarks.append(('Peak', '', *peak_usage))
 
         save_benchmarks(benchmarks, 'realtime_benchmarks.csv')
+        self.save_queue_metrics()
+        tracing.export('live')
+
+    def save_queue_metrics(self):
+        filepath = os.path.join(PROJECT_ROOT, 'benchmarks', 'live_queue_metrics.csv')
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Metric', 'Value'])
+            writer.writerows(self.work_queue.metrics().items())
+            writer.writerows((f'debounce_{name}', value) for name, value in self.debouncer.metrics().items())
+
+    def close(self):
+        """Release pending files, finish queued work, write the runs still open and stop the workers."""
+        self.debouncer.close()
+        self.work_queue.join()
+        self.work_queue.close()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+        # Runs that have not ended (still running, or crashed without an end line) are
+        # written with an empty end time rather than dropped
+        for tail in self.tails.values():
+            self.save_records(tail.state.jobs, tail.state.reports, tail)
+        self.output.close()
+        with self.stats_lock:
+            self.save_current_benchmarks()
 
     def on_created(self, event):
         if event.is_directory:
             return
-        self.process_file(event.src_path)
+        self.file_changed(event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory or not is_log_file(event.src_path):
+            return
+        # Released by the debouncer's thread, so a full queue never blocks the observer,
+        # and handled by the queue so it never races a worker on the file
+        self.debouncer.delete(event.src_path)
 
     def on_modified(self, event):
         if event.is_directory:
             return
-        # Only process modifications for files we haven't seen recently
-        filename = os.path.basename(event.src_path)
-        if filename not in self.processed_files:
-            # Wait a short time to ensure file is completely written
-            time.sleep(1)
-            self.process_file(event.src_path)
+        self.file_changed(event.src_path)
 
 
-def watch_folder(path):
+def watch_folder(path, output_format=DEFAULT_OUTPUT_FORMAT, event_encoding=DEFAULT_EVENT_ENCODING,
+                 resource_series=False, workers=DEFAULT_LIVE_WORKERS, executor='thread',
+                 max_queued=LIVE_QUEUE_SIZE, overflow='block', quiet_period=DEFAULT_QUIET_PERIOD,
+                 max_delay=DEFAULT_MAX_DELAY, writer=None):
     # Create an observer and handler
-    event_handler = LogFileHandler()
+    event_handler = LogFileHandler(output_format, event_encoding, resource_series, workers, executor,
+                                   max_queued, overflow, quiet_period, max_delay, writer)
     observer = Observer()
 
     # Schedule the observer
@@ -157,24 +579,17 @@ def watch_folder(path):
     try:
         while True:
             time.sleep(1)
-            # Clean up processed files list periodically (files older than 5 seconds)
-            current_time = time.time()
-            event_handler.processed_files.clear()
     except KeyboardInterrupt:
         print(f"\n[{datetime.now()}] Stopping folder watch...")
         observer.stop()
         observer.join()
+        event_handler.close()
         print(f"[{datetime.now()}] Folder watch stopped")
 
 
 if __name__ == "__main__":
-    # Get the logs folder path
-    logs_folder = os.path.join(PROJECT_ROOT, 'live_logs')
+    import sys
 
-    # Create the logs folder if it doesn't exist
-    if not os.path.exists(logs_folder):
-        os.makedirs(logs_folder)
-        print(f"Created logs folder at {logs_folder}")
+    from src.cli import main as cli_main
 
-    # Start watching the folder
-    watch_folder(logs_folder)
\ No newline at end of file
+    sys.exit(cli_main(['live', *sys.argv[1:]]))
\ No newline at end of file
@@ -0,0 +1,176 @@
+import heapq
+import os
+import random
+from datetime import datetime, timedelta
+
+from src.utils import PROJECT_ROOT
+
+# Message codes used by the SAP job scheduler logs
+JOB_SCHEDULED_CODE = 'U00003400'
+JOB_STARTED_CODE = 'U00003401'
+JOB_ENDED_CODE = 'U00003402'
+JOB_REMOVED_CODE = 'U00003403'
+REPORT_STARTED_CODE = 'U00003450'
+REPORT_ENDED_CODE = 'U00003451'
+
+# Job names include a few non-ASCII ones, so encodings other than utf-8 are exercised
+JOB_NAMES = ([f'JOBS.DAILY.{number}' for number in range(400)]
+             + [f'JOBS.HOURLY.{number}' for number in range(40)]
+             + ['LOHN.ÄNDERUNG', 'GRÖSSE.PRÜFUNG', 'STRASSE.ÜBERTRAG', 'CAFÉ.BESTELLUNG'])
+RETURN_CODES = (0, 0, 0, 0, 0, 0, 0, 1, 4, 8)
+# Relative frequency of what happens next: a job is scheduled, a report starts, or a
+# line that is not a job or report event
+EVENT_WEIGHTS = (('job', 30), ('report', 10), ('system', 50), ('error', 5), ('continuation', 5))
+SYSTEM_MESSAGES = (
+    "Server process 'WP{}' is running.",
+    "Work process 'DIA{}' restarted.",
+    "Spool request '{}' created.",
+    "Queue '{}' processed {{0}} entries.",
+)
+ERROR_MESSAGES = (
+    "Connection error on host 'HOST{}'.",
+    "Database error in table 'T{}'.",
+)
+
+
+class SyntheticLogGenerator:
+    """Deterministic stream of realistic SAP scheduler log lines.
+
+    Jobs go through the full lifecycle (scheduled, started, ended with a return code,
+    removed) and reports start and end, with waits and durations that let runs overlap
+    and cross midnight; the remaining lines are system messages, errors and lines
+    without a timestamp. The same seed always gives byte-identical logs. Pending events
+    carry over between write_log calls, so consecutive daily files continue each other.
+    """
+
+    def __init__(self, seed=0, start=datetime(2024, 1, 1), mean_gap_ms=250):
+        self._random = random.Random(seed)
+        self.start = start
+        self.mean_gap_ms = mean_gap_ms
+        self.clock_ms = 0
+        self.next_run_id = 100000
+        self.next_report_id = 500000
+        self._sequence = 0
+        # (time in ms, sequence, code, message) of events still to come
+        self._pending = []
+        self._kinds = [kind for kind, _ in EVENT_WEIGHTS]
+        self._weights = [weight for _, weight in EVENT_WEIGHTS]
+        self._dates = {}
+
+    def _timestamp(self, time_ms):
+        day, time_ms = divmod(time_ms, 86400000)
+        date = self._dates.get(day)
+        if date is None:
+            date = self._dates[day] = (self.start + timedelta(days=day)).strftime('%Y%m%d')
+        seconds, milliseconds = divmod(time_ms, 1000)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return f'{date}/{hours:02d}{minutes:02d}{seconds:02d}.{milliseconds:03d}'
+
+    def _schedule(self, time_ms, code, message):
+        self._sequence += 1
+        heapq.heappush(self._pending, (time_ms, self._sequence, code, message))
+
+    def _new_event(self):
+        rand = self._random
+        kind = rand.choices(self._kinds, self._weights)[0]
+        now = self.clock_ms
+        if kind == 'job':
+            self.next_run_id += 1
+            name = rand.choice(JOB_NAMES)
+            run_id = self.next_run_id
+            started = now + int(rand.expovariate(1 / 60000))
+            ended = started + int(rand.lognormvariate(11, 1.5))
+            self._schedule(started, JOB_STARTED_CODE, f"Job '{name}' started with RunID '{run_id}'.")
+            self._schedule(ended, JOB_ENDED_CODE, f"Job '{name}' with RunID '{run_id}' ended with return code "
+                                                  f"'{rand.choice(RETURN_CODES)}'.")
+            self._schedule(ended + rand.randint(1, 5000), JOB_REMOVED_CODE,
+                           f"Job '{name}' with RunID '{run_id}' has been removed from the job table.")
+            return JOB_SCHEDULED_CODE, f"Job '{name}' with RunID '{run_id}' is to be started."
+        if kind == 'report':
+            self.next_report_id += 1
+            report_id = self.next_report_id
+            self._schedule(now + int(rand.expovariate(1 / 30000)), REPORT_ENDED_CODE,
+                           f"Report '{report_id}' ended normally.")
+            return REPORT_STARTED_CODE, f"Report '{report_id}' for file 'FILE{report_id}.txt' has been started."
+        if kind == 'continuation':
+            return None, f'    detail {rand.randint(1, 99999)}: see previous message'
+        messages = ERROR_MESSAGES if kind == 'error' else SYSTEM_MESSAGES
+        return f'U{rand.randint(10000, 99999):08d}', rand.choice(messages).format(rand.randint(1, 50))
+
+    def lines(self, until_ms=None):
+        """Yield log lines in time order, stopping before until_ms when given."""
+        rand = self._random
+        while True:
+            self.clock_ms += int(rand.expovariate(1 / self.mean_gap_ms))
+            if until_ms is not None and self.clock_ms >= until_ms:
+                self.clock_ms = until_ms
+                break
+            pending = self._pending
+            while pending and pending[0][0] <= self.clock_ms:
+                time_ms, _, code, message = heapq.heappop(pending)
+                yield f'{self._timestamp(time_ms)} - {code} {message}'
+            code, message = self._new_event()
+            if code is None:
+                yield message
+            else:
+                yield f'{self._timestamp(self.clock_ms)} - {code} {message}'
+        # Events due before the cut-off still belong to this stretch
+        while self._pending and self._pending[0][0] < until_ms:
+            time_ms, _, code, message = heapq.heappop(self._pending)
+            yield f'{self._timestamp(time_ms)} - {code} {message}'
+
+    def write_log(self, path, size=None, line_count=None, until_ms=None, encoding='utf-8', newline='\n'):
+        """Write lines to path until it holds size bytes, line_count lines or reaches until_ms.
+
+        Returns (lines written, bytes written).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        written_lines = 0
+        written_bytes = 0
+        buffer = ['Log File Start']
+        with open(path, 'wb') as file:
+            for line in self.lines(until_ms):
+                buffer.append(line)
+                if len(buffer) >= 10000:
+                    data = (newline.join(buffer) + newline).encode(encoding)
+                    file.write(data)
+                    written_lines += len(buffer)
+                    written_bytes += len(data)
+                    buffer = []
+                    if ((size is not None and written_bytes >= size)
+                            or (line_count is not None and written_lines >= line_count)):
+                        break
+                if line_count is not None and written_lines + len(buffer) >= line_count:
+                    break
+            data = (newline.join(buffer) + newline).encode(encoding) if buffer else b''
+            file.write(data)
+        return written_lines + len(buffer), written_bytes + len(data)
+
+
+def generate_log(path, size=None, line_count=None, seed=0, encoding='utf-8', newline='\n'):
+    """Write one synthetic log of about size bytes or exactly line_count lines."""
+    if size is None and line_count is None:
+        raise ValueError("Either size or line_count is required")
+    return SyntheticLogGenerator(seed).write_log(path, size=size, line_count=line_count,
+                                                  encoding=encoding, newline=newline)
+
+
+def generate_daily_logs(folder, days, seed=0, start=datetime(2024, 1, 1), mean_gap_ms=250,
+                        encodings=('utf-8', 'windows-1252'), newlines=('\n', '\r\n')):
+    """Write one YYYYMMDD.LOG.txt per day, cycling through encodings and line endings.
+
+    Jobs still running at midnight end in the next day's file, as in production logs.
+    """
+    generator = SyntheticLogGenerator(seed, start, mean_gap_ms)
+    paths = []
+    for day in range(days):
+        path = os.path.join(folder, f"{(start + timedelta(days=day)):%Y%m%d}.LOG.txt")
+        generator.write_log(path, until_ms=(day + 1) * 86400000, encoding=encodings[day % len(encodings)],
+                            newline=newlines[day % len(newlines)])
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    generate_daily_logs(os.path.join(PROJECT_ROOT, 'synthetic_logs'), days=3)
@@ -1,97 +1,312 @@
 import os
+import shutil
 import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from src.aggregates import AGGREGATES_FOLDER, AggregateStore, Aggregates, JobSketches, count_error_events
+from src.interval_index import INTERVAL_INDEX_PATH, IntervalIndex
+from src.job_store import JobStore
+from src.parse_cache import PARSE_CACHE_FOLDER, ParseCache
+from src.output_backends import DEFAULT_OUTPUT_FORMAT, DEFAULT_EVENT_ENCODING, get_output_backend
+from src import tracing
+from src.resource_sampler import ResourceSampler, summarize_usage
+from src.time_index import TimeIndex
 from src.utils import (
-    PROJECT_ROOT, extract_time_range, parse_sap_log, save_to_csv,
-    save_events_to_csv, monitor_resources, save_benchmarks, read_log_file
+    PROJECT_ROOT, SEGMENTS_FOLDER, JOB_HEADERS, REPORT_HEADERS, ParseState, find_log_files, save_benchmarks,
+    stream_log, parse_timestamp
 )
 
-def process_log_file(log_file_path, filename):
+COMBINED_OUTPUTS = ('combined_jobs', 'combined_reports', 'combined_events')
+
+
+def process_log_file(log_file_path, filename, output, outputs=COMBINED_OUTPUTS, mode='a',
+                     aggregate_store=None, resource_series=False):
+    # Resources are sampled in the background for as long as the file is being processed
+    with ResourceSampler() as sampler, tracing.span('process_log_file', file=filename):
+        file_processing_time = _process_log_file(log_file_path, filename, output, outputs, mode, aggregate_store)
+        # Each file's rows become visible together, once the file is done
+        output.commit()
+    usage = sampler.usage
+    if resource_series:
+        sampler.save_series(filename)
+
+    print(f"Processed {filename} in {file_processing_time:.2f} seconds")
+    print(f"CPU usage: {usage.avg_cpu:.2f}% avg, {usage.peak_cpu:.2f}% peak; "
+          f"RAM usage: {usage.avg_ram:.2f} MB avg, {usage.peak_ram:.2f} MB peak")
+    return file_processing_time, usage
+
+
+def _process_log_file(log_file_path, filename, output, outputs, mode, aggregate_store):
     file_start_time = time.time()
+    jobs_output, reports_output, events_output = outputs
+    error_counts = Counter()
+
+    def save_events(events, dataset, mode='w'):
+        output.save_events(count_error_events(events, error_counts), dataset, mode=mode)
 
-    log_content = read_log_file(log_file_path)
-    if not log_content:
-        return 0, 0, 0
+    # Events are written while the file is streamed through the parser, which also feeds
+    # the duration and wait time sketches as jobs start and end
+    state = ParseState(JobSketches() if aggregate_store is not None else None)
+    state = stream_log(log_file_path, events_output, mode=mode, state=state, save_events=save_events)
+    if state is None or not state.line_count:
+        return 0
 
-    start_time, end_time = extract_time_range(log_content)
+    start_time, end_time = state.time_range()
     if start_time and end_time:
         print(f"Log period: {start_time} to {end_time}")
     else:
         print("Unable to extract time range from the log file.")
         print(f"File size: {os.path.getsize(log_file_path)} bytes")
-        print(f"First 100 characters: {log_content[:100]}")
 
-    jobs, reports, events = parse_sap_log(log_content)
+    # Append results to the output files
+    with tracing.span('save_records', file=filename) as span:
+        output.save_records(state.jobs, jobs_output, JOB_HEADERS, mode=mode)
+        output.save_records(state.reports, reports_output, REPORT_HEADERS, mode=mode)
+        span.add(lines=len(state.jobs) + len(state.reports))
 
-    # Append results to CSV files
-    job_headers = ['id', 'name', 'scheduled_time', 'start_time', 'end_time', 'return_code',
-                   'scheduled_message_code', 'start_message_code', 'end_message_code', 'remove_message_code']
-    save_to_csv(jobs, 'combined_jobs.csv', job_headers, mode='a')
+    # Fold the file into the aggregates the analyzer reports from, and index its runs
+    # for the analyzer's incident queries
+    if aggregate_store is not None:
+        with tracing.span('aggregate', file=filename) as span:
+            first_event = state.first_timestamp and parse_timestamp(state.first_timestamp)
+            aggregates = Aggregates.from_parse(state.jobs, error_counts, first_event, state.sketches)
+            aggregate_store.save(filename, aggregates, IntervalIndex.from_jobs(state.jobs))
+            span.add(lines=len(state.jobs))
 
-    report_headers = ['id', 'file_name', 'start_time', 'end_time', 'start_message_code', 'end_message_code']
-    save_to_csv(reports, 'combined_reports.csv', report_headers, mode='a')
+    # Calculate processing time
+    return time.time() - file_start_time
 
-    save_events_to_csv(events, 'combined_events.csv', mode='a')
 
-    # Calculate processing time and monitor resource usage
-    file_end_time = time.time()
-    file_processing_time = file_end_time - file_start_time
-    cpu_usage, ram_usage = monitor_resources()
+def segment_outputs(filename):
+    return tuple(os.path.join(SEGMENTS_FOLDER, f"{filename}.{output}") for output in COMBINED_OUTPUTS)
 
-    print(f"Processed {filename} in {file_processing_time:.2f} seconds")
-    print(f"CPU usage: {cpu_usage:.2f}%, RAM usage: {ram_usage:.2f} MB")
 
-    return file_processing_time, cpu_usage, ram_usage
+def cache_outputs(entry):
+    return tuple(os.path.join(PARSE_CACHE_FOLDER, entry['key'], output) for output in COMBINED_OUTPUTS)
+
+
+def process_log_file_segment(log_file_path, filename, output, aggregate_store=None, outputs=None,
+                             resource_series=False):
+    """Worker entry point: parse one file into its own segment outputs.
+
+    Timing and resource usage are measured inside the worker, so the benchmark row
+    describes the process that actually parsed the file.
+    """
+    outputs = outputs or segment_outputs(filename)
+    file_processing_time, usage = process_log_file(
+        log_file_path, filename, output, outputs, mode='w', aggregate_store=aggregate_store,
+        resource_series=resource_series)
+    output.close()
+    return file_processing_time, usage, outputs
+
+
+@tracing.traced()
+def merge_segments(outputs, output):
+    for segment, combined in zip(outputs, COMBINED_OUTPUTS):
+        if output.exists(segment):
+            output.append_segment(segment, combined)
+
+
+def iter_processed_files_parallel(logs_path, filenames, workers, output, aggregate_store=None,
+                                  resource_series=False):
+    segments_path = os.path.join(output.root, SEGMENTS_FOLDER)
+    shutil.rmtree(segments_path, ignore_errors=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            tracing.submit(executor, process_log_file_segment, os.path.join(logs_path, filename), filename,
+                           output, aggregate_store, resource_series=resource_series)
+            for filename in filenames
+        ]
+        # This process is the only writer: segments are merged in file order as each
+        # worker's result becomes available, while later files are still being parsed
+        for filename, future in zip(filenames, futures):
+            file_processing_time, usage, outputs = future.result()
+            merge_segments(outputs, output)
+            yield filename, file_processing_time, usage
+
+    shutil.rmtree(segments_path, ignore_errors=True)
+
 
-def process_logs_to_csv(logs_folder):
+def iter_processed_files(logs_path, filenames, output, aggregate_store=None, resource_series=False):
+    for filename in filenames:
+        print(f"Processing file: {filename}")
+        file_processing_time, usage = process_log_file(
+            os.path.join(logs_path, filename), filename, output, aggregate_store=aggregate_store,
+            resource_series=resource_series)
+        yield filename, file_processing_time, usage
+
+
+def iter_cached_files(logs_path, filenames, workers, output, cache, resource_series=False):
+    """Parse only new or changed files, each into its own parse cache entry."""
+    stale = []
+    for filename in filenames:
+        log_file_path = os.path.join(logs_path, filename)
+        if cache.lookup(log_file_path, output.event_encoding) is None:
+            stale.append((log_file_path, filename, cache.new_entry(log_file_path, output.event_encoding)))
+    print(f"Reusing cached parses of {len(filenames) - len(stale)} unchanged files, parsing {len(stale)}"
+          + (f" with {workers} worker processes" if workers > 1 and len(stale) > 1 else ""))
+
+    tasks = [(log_file_path, filename, output, AggregateStore(cache.entry_path(entry)), cache_outputs(entry),
+              resource_series)
+             for log_file_path, filename, entry in stale]
+    if workers > 1 and len(tasks) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = [tracing.submit(executor, process_log_file_segment, *task) for task in tasks]
+    else:
+        executor = None
+        results = tasks
+
+    try:
+        for (log_file_path, filename, entry), result in zip(stale, results):
+            if executor is None:
+                print(f"Processing file: {filename}")
+                file_processing_time, usage, _ = process_log_file_segment(*result)
+            else:
+                file_processing_time, usage, _ = result.result()
+            cache.finish_entry(log_file_path, entry)
+            yield filename, file_processing_time, usage
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+@tracing.traced()
+def rebuild_combined_outputs(logs_path, filenames, output, cache, aggregate_store):
+    """Recreate the combined outputs and aggregates from the cached per-file parses, in file order."""
+    for dataset in COMBINED_OUTPUTS:
+        output.remove(dataset)
+    aggregate_store.clear()
+    for filename in filenames:
+        entry = cache.entries.get(os.path.abspath(os.path.join(logs_path, filename)))
+        if entry is None:
+            continue
+        for segment, combined in zip(cache_outputs(entry), COMBINED_OUTPUTS):
+            if output.exists(segment):
+                output.append_segment(segment, combined, keep=True)
+        aggregate_store.copy_from(AggregateStore(cache.entry_path(entry)), filename)
+
+
+def process_logs_to_csv(logs_folder, workers=1, output_format=DEFAULT_OUTPUT_FORMAT,
+                        event_encoding=DEFAULT_EVENT_ENCODING, use_cache=False, use_job_store=False,
+                        resource_series=False, writer=None, start_time=None, end_time=None):
+    """Process the logs in a folder into the combined outputs.
+
+    start_time and end_time (datetimes, either may be None) restrict the run to the logs
+    whose time range overlaps that window, as recorded in the folder's TimeIndex.
+    use_cache keeps each log's parse under the output folder's .parse_cache/ and reuses
+    it on later runs; use_job_store upserts the jobs and reports into db/jobs.sqlite.
+    """
     processing_times = []
     resource_usage = []
-    peak_cpu = 0
-    peak_ram = 0
 
     total_start_time = time.time()
+    # The whole run, including worker processes; each file is also sampled where it is parsed
+    run_sampler = ResourceSampler(include_children=True).start()
 
     logs_path = os.path.join(PROJECT_ROOT, logs_folder)
 
-    # Clear existing CSV files
-    for csv_file in ['combined_jobs.csv', 'combined_reports.csv', 'combined_events.csv']:
-        csv_path = os.path.join(PROJECT_ROOT, 'csv', csv_file)
-        if os.path.exists(csv_path):
-            os.remove(csv_path)
+    output = get_output_backend(output_format, event_encoding, writer)
+    # Kept with the combined outputs they describe, so CSV and Parquet runs do not mix
+    aggregate_store = AggregateStore(os.path.join(output.root, AGGREGATES_FOLDER))
 
-    for filename in os.listdir(logs_path):
-        if filename.endswith('.LOG.txt'):
-            log_file_path = os.path.join(logs_path, filename)
-            print(f"Processing file: {filename}")
+    # Plain and compressed logs, sorted so the combined outputs have the same row order on
+    # every run and in both modes
+    filenames = log_files = find_log_files(logs_path)
 
-            file_processing_time, cpu_usage, ram_usage = process_log_file(log_file_path, filename)
+    if start_time is not None or end_time is not None:
+        # Only windowed runs read time ranges; the sidecar index is refreshed for new
+        # and changed logs, so the others are skipped without being opened
+        time_index = TimeIndex(logs_path)
+        with tracing.span('time_index', files=len(log_files)):
+            time_index.update(log_files)
+            filenames = time_index.in_window(log_files, start_time, end_time)
+            time_index.save()
+        print(f"{len(filenames)} of {len(log_files)} logs overlap {start_time or 'the start'} to "
+              f"{end_time or 'the end'}")
 
-            processing_times.append((filename, file_processing_time))
-            resource_usage.append((filename, cpu_usage, ram_usage))
-            peak_cpu = max(peak_cpu, cpu_usage)
-            peak_ram = max(peak_ram, ram_usage)
+    if use_cache:
+        # Only new or changed files are parsed; the combined outputs are rebuilt afterwards
+        cache = ParseCache(os.path.join(output.root, PARSE_CACHE_FOLDER))
+        processed_files = iter_cached_files(logs_path, filenames, workers, output, cache, resource_series)
+    else:
+        # Clear existing output files
+        for dataset in COMBINED_OUTPUTS:
+            output.remove(dataset)
+        aggregate_store.clear()
+
+        if workers > 1:
+            print(f"Processing {len(filenames)} files with {workers} worker processes")
+            processed_files = iter_processed_files_parallel(logs_path, filenames, workers, output, aggregate_store,
+                                                            resource_series)
+        else:
+            processed_files = iter_processed_files(logs_path, filenames, output, aggregate_store, resource_series)
+
+    for filename, file_processing_time, usage in processed_files:
+        processing_times.append((filename, file_processing_time))
+        resource_usage.append(usage)
+
+    if use_cache:
+        rebuild_combined_outputs(logs_path, filenames, output, cache, aggregate_store)
+        # Logs outside the window keep their cache entries
+        cache.prune(os.path.join(logs_path, filename) for filename in log_files)
+    output.close()
+
+    with tracing.span('interval_index', files=len(filenames)):
+        aggregate_store.combined_intervals(filenames).save(os.path.join(output.root, INTERVAL_INDEX_PATH))
+    # Lets the analyzer check that the aggregates still describe the combined outputs
+    aggregate_store.save_manifest([output.path(dataset) for dataset in COMBINED_OUTPUTS])
+
+    if use_job_store:
+        # Jobs spanning midnight are merged into one row per RunID; with the cache only
+        # files that are not in the store yet are loaded
+        if use_cache:
+            entries = (cache.entries.get(os.path.abspath(os.path.join(logs_path, filename)))
+                       for filename in filenames)
+            sources = [(entry['key'], *cache_outputs(entry)[:2]) for entry in entries if entry is not None]
+        else:
+            sources = [('combined', *COMBINED_OUTPUTS[:2])]
+        with JobStore() as job_store, tracing.span('job_store_sync'):
+            if not use_cache:
+                job_store.clear()
+            job_store.sync(sources, output)
+        print(f"Jobs and reports have been upserted into {job_store.path}")
+
+    if use_cache:
+        # Only now, as the job store loads its sources from the entries
+        cache.enforce_size_cap()
+        cache.save()
 
     # Calculate and print total processing time
     total_end_time = time.time()
     total_processing_time = total_end_time - total_start_time
+    run_usage = run_sampler.stop()
+    if resource_series:
+        run_sampler.save_series('multiple_run')
 
-    # Calculate average CPU and RAM usage
-    avg_cpu = sum(usage[1] for usage in resource_usage) / len(resource_usage) if resource_usage else 0
-    avg_ram = sum(usage[2] for usage in resource_usage) / len(resource_usage) if resource_usage else 0
+    # Average and peak resource usage over the processed files
+    average_usage, peak_usage = summarize_usage(resource_usage)
 
-    print("\nCombined data has been saved to csv/combined_jobs.csv, csv/combined_reports.csv, and csv/combined_events.csv")
+    print(f"\nCombined data has been saved to {', '.join(output.path(dataset) for dataset in COMBINED_OUTPUTS)}")
 
     # Save benchmarks
     benchmarks = [
-        (filename, process_time, cpu_usage, ram_usage)
-        for (filename, process_time), (_, cpu_usage, ram_usage) in zip(processing_times, resource_usage)
+        (filename, process_time, *usage)
+        for (filename, process_time), usage in zip(processing_times, resource_usage)
     ]
-    benchmarks.append(('Total', total_processing_time, '', ''))
-    benchmarks.append(('Average', total_processing_time / len(processing_times), avg_cpu, avg_ram))
-    benchmarks.append(('Peak', '', peak_cpu, peak_ram))
+    benchmarks.append(('Total', total_processing_time, *run_usage))
+    benchmarks.append(('Average', total_processing_time / len(processing_times) if processing_times else 0,
+                       *average_usage))
+    benchmarks.append(('Peak', '', *peak_usage))
 
     save_benchmarks(benchmarks, 'multiple_benchmarks.csv')
     print("Benchmarks have been saved to benchmarks/multiple_benchmarks.csv")
+    tracing.export('multiple')
 
 if __name__ == "__main__":
-    logs_folder = 'logs'
-    process_logs_to_csv(logs_folder)
\ No newline at end of file
+    import sys
+
+    from src.cli import main as cli_main
+
+    sys.exit(cli_main(['multi', *sys.argv[1:]]))
\ No newline at end of file
@@ -0,0 +1,242 @@
+import csv
+import os
+import shutil
+from itertools import islice
+
+from src.output_writer import OutputWriter
+from src.utils import (
+    PROJECT_ROOT, EVENT_HEADERS, TEMPLATED_EVENT_HEADERS, TEMPLATE_HEADERS, EVENT_BATCH_SIZE,
+    EventTemplates, record_rows
+)
+
+OUTPUT_FORMATS = ('csv', 'parquet')
+DEFAULT_OUTPUT_FORMAT = 'csv'
+# 'template' stores each event as a template id plus its parameters, 'text' as full text
+EVENT_ENCODINGS = ('template', 'text')
+DEFAULT_EVENT_ENCODING = 'template'
+
+
+def templates_dataset(dataset):
+    """Name of the dataset holding the templates of a templated events dataset."""
+    return dataset + '_templates'
+
+
+class OutputBackend:
+    """Event encoding shared by the backends; subclasses provide the storage."""
+
+    def __init__(self, event_encoding=DEFAULT_EVENT_ENCODING):
+        if event_encoding not in EVENT_ENCODINGS:
+            raise ValueError(f"Unknown event encoding {event_encoding!r}, expected one of {EVENT_ENCODINGS}")
+        self.event_encoding = event_encoding
+
+    def remove(self, dataset):
+        # An events dataset takes its templates with it
+        self.remove_files(dataset)
+        self.remove_files(templates_dataset(dataset))
+
+    def commit(self, dataset=None):
+        """Make what was written to a dataset (and its templates), or to every dataset, durable."""
+
+    def close(self):
+        self.commit()
+
+    def load_templates(self, dataset):
+        """EventTemplates seeded with the templates already stored for an events dataset."""
+        if not self.exists(templates_dataset(dataset)):
+            return EventTemplates()
+        return EventTemplates(self.read_rows(templates_dataset(dataset)))
+
+    def save_events(self, events, dataset, mode='w'):
+        if self.event_encoding == 'text':
+            self.write_rows(events, dataset, EVENT_HEADERS, mode)
+            return
+
+        # Appends reuse the stored templates, so only templates not seen before are added
+        templates = self.load_templates(dataset) if mode == 'a' else EventTemplates()
+        self.write_rows(templates.encode_events(events), dataset, TEMPLATED_EVENT_HEADERS, mode)
+        new_templates = templates.pop_new_templates()
+        if new_templates or mode == 'w':
+            self.write_rows(new_templates, templates_dataset(dataset), TEMPLATE_HEADERS, mode)
+
+    def append_segment(self, segment, dataset, keep=False):
+        """Append a segment to a dataset, removing the segment unless keep is set."""
+        self.append_rows(segment, dataset, keep)
+        if self.exists(templates_dataset(segment)):
+            # Template ids are derived from the template text, so merging is a union
+            known_ids = set(self.load_templates(dataset).ids.values())
+            new_templates = [row for row in self.read_rows(templates_dataset(segment))
+                             if row[0] not in known_ids]
+            if new_templates:
+                self.write_rows(new_templates, templates_dataset(dataset), TEMPLATE_HEADERS, 'a')
+            if not keep:
+                self.remove_files(templates_dataset(segment))
+
+
+class CsvOutput(OutputBackend):
+    """Untyped CSV output: one file per dataset under csv/.
+
+    Writes go through one OutputWriter for the backend's lifetime, so files stay open
+    and rows are buffered between calls; they become visible on commit() or close(),
+    and reading a dataset commits it first.
+    """
+
+    name = 'csv'
+    root = os.path.join(PROJECT_ROOT, 'csv')
+
+    def __init__(self, event_encoding=DEFAULT_EVENT_ENCODING, writer=None):
+        super().__init__(event_encoding)
+        self.writer = writer or OutputWriter()
+
+    def path(self, dataset):
+        return os.path.join(self.root, dataset + '.csv')
+
+    def exists(self, dataset):
+        self.writer.commit(self.path(dataset))
+        return os.path.isfile(self.path(dataset))
+
+    def remove_files(self, dataset):
+        self.writer.discard(self.path(dataset))
+        if os.path.isfile(self.path(dataset)):
+            os.remove(self.path(dataset))
+
+    def save_records(self, records, dataset, headers, mode='w'):
+        self.writer.write_rows(self.path(dataset), record_rows(records, headers), headers, mode)
+
+    def write_rows(self, rows, dataset, headers, mode='w'):
+        self.writer.write_rows(self.path(dataset), rows, headers, mode)
+
+    def read_rows(self, dataset):
+        self.writer.commit(self.path(dataset))
+        with open(self.path(dataset), newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)
+            return [tuple(row) for row in reader]
+
+    def append_rows(self, segment, dataset, keep=False):
+        self.writer.commit(self.path(segment))
+        self.writer.append_file(self.path(segment), self.path(dataset))
+        if not keep:
+            self.remove_files(segment)
+
+    def commit(self, dataset=None):
+        if dataset is None:
+            self.writer.commit()
+            return
+        self.writer.commit(self.path(dataset))
+        self.writer.commit(self.path(templates_dataset(dataset)))
+
+    def close(self):
+        self.writer.close()
+
+
+class ParquetOutput(OutputBackend):
+    """Typed, compressed columnar output: one Parquet dataset directory per dataset under parquet/.
+
+    Timestamps are stored as native timestamps, return codes as integers and job names
+    and message codes as dictionary-encoded columns. Every write adds a numbered part
+    file, so appending never rewrites what is already on disk.
+    """
+
+    name = 'parquet'
+    root = os.path.join(PROJECT_ROOT, 'parquet')
+    compression = 'zstd'
+
+    def __init__(self, event_encoding=DEFAULT_EVENT_ENCODING):
+        # Imported here so CSV-only runs do not need pyarrow installed
+        import pyarrow  # noqa: F401
+
+        super().__init__(event_encoding)
+
+    def path(self, dataset):
+        return os.path.join(self.root, dataset)
+
+    def exists(self, dataset):
+        return os.path.isdir(self.path(dataset))
+
+    def remove_files(self, dataset):
+        shutil.rmtree(self.path(dataset), ignore_errors=True)
+
+    def _part_numbers(self, dataset):
+        return [int(part[5:-8]) for part in os.listdir(self.path(dataset))
+                if part.startswith('part-') and part.endswith('.parquet')]
+
+    def _next_part_path(self, dataset, mode='a'):
+        if mode == 'w':
+            self.remove_files(dataset)
+        os.makedirs(self.path(dataset), exist_ok=True)
+        part_number = max(self._part_numbers(dataset), default=-1) + 1
+        return os.path.join(self.path(dataset), f"part-{part_number:06d}.parquet")
+
+    @staticmethod
+    def column_type(column):
+        import pyarrow as pa
+
+        if column.endswith('_time') or column == 'Timestamp':
+            return pa.timestamp('ms')
+        if column == 'return_code':
+            return pa.int32()
+        if column in ('name', 'Message Code', 'Template ID') or column.endswith('message_code'):
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.string()
+
+    def schema(self, headers):
+        import pyarrow as pa
+
+        return pa.schema([(column, self.column_type(column)) for column in headers])
+
+    def save_records(self, records, dataset, headers, mode='w'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = self.schema(headers)
+        columns = {column: [] for column in headers}
+        for key, record in records.items():
+            columns['id'].append(key)
+            for column in headers[1:]:
+                value = record.get(column)
+                columns[column].append(None if value == '' else value)
+        if 'return_code' in columns:
+            columns['return_code'] = [None if code is None else int(code) for code in columns['return_code']]
+
+        table = pa.table({column: pa.array(values, type=schema.field(column).type)
+                          for column, values in columns.items()}, schema=schema)
+        pq.write_table(table, self._next_part_path(dataset, mode), compression=self.compression)
+
+    def write_rows(self, rows, dataset, headers, mode='w', batch_size=EVENT_BATCH_SIZE):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Rows are written one bounded batch (row group) at a time, as with CSV
+        schema = self.schema(headers)
+        rows = iter(rows)
+        with pq.ParquetWriter(self._next_part_path(dataset, mode), schema, compression=self.compression) as writer:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                writer.write_batch(pa.record_batch([
+                    pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)
+                ], schema=schema))
+
+    def read_rows(self, dataset):
+        import pyarrow.parquet as pq
+
+        return list(zip(*pq.read_table(self.path(dataset)).to_pydict().values()))
+
+    def append_rows(self, segment, dataset, keep=False):
+        segment_path = self.path(segment)
+        move = shutil.copyfile if keep else os.replace
+        for part_number in sorted(self._part_numbers(segment)):
+            move(os.path.join(segment_path, f"part-{part_number:06d}.parquet"), self._next_part_path(dataset))
+        if not keep:
+            shutil.rmtree(segment_path, ignore_errors=True)
+
+
+def get_output_backend(output_format=DEFAULT_OUTPUT_FORMAT, event_encoding=DEFAULT_EVENT_ENCODING, writer=None):
+    """Output backend by name; writer is the OutputWriter (buffering, fsync, background
+    writing) of the CSV backend, which Parquet output does not use."""
+    if output_format == 'csv':
+        return CsvOutput(event_encoding, writer)
+    if output_format == 'parquet':
+        return ParquetOutput(event_encoding)
+    raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
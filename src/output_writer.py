@@ -0,0 +1,307 @@
+import csv
+import os
+import queue
+import threading
+import time
+from itertools import islice
+
+from src.tracing import span
+
+# Buffered rows of a sink are written to its file once there are this many...
+DEFAULT_FLUSH_ROWS = 10000
+# ...or once the oldest of them has waited this many seconds
+DEFAULT_FLUSH_INTERVAL = 1.0
+# 'never' leaves durability to the OS, 'commit' fsyncs when a sink is committed and
+# 'always' on every flush
+FSYNC_POLICIES = ('never', 'commit', 'always')
+# Batches waiting for the background thread; writers block beyond this
+BACKGROUND_QUEUE_SIZE = 16
+TEMP_SUFFIX = '.tmp'
+JOURNAL_SUFFIX = '.journal'
+
+
+def _fsync_directory(path):
+    # Makes a rename durable; directories cannot be opened for this on Windows
+    if os.name != 'posix':
+        return
+    descriptor = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def recover(path):
+    """Undo what an interrupted writer left behind: an uncommitted rewrite or append."""
+    journal_path = path + JOURNAL_SUFFIX
+    if os.path.isfile(journal_path):
+        with open(journal_path, encoding='utf-8') as journal:
+            size = int(journal.read() or 0)
+        if os.path.isfile(path):
+            os.truncate(path, size)
+        os.remove(journal_path)
+    if os.path.isfile(path + TEMP_SUFFIX):
+        os.remove(path + TEMP_SUFFIX)
+
+
+class _CsvSink:
+    """One CSV file kept open between writes.
+
+    Rows go to a temporary file that replaces the target on commit when the file is
+    (re)written, and straight to the target otherwise, with its committed size in a
+    journal until the commit, so recover() can cut an interrupted append off again.
+    """
+
+    def __init__(self, path, headers, fsync):
+        recover(path)
+        self.path = path
+        self.headers = headers
+        self.fsync = fsync
+        self.file = None
+        self.writer = None
+        self.temporary = False
+        # True between the first write after a commit and the next commit
+        self.open_transaction = False
+        self.rows = []
+        self.first_buffered = None
+
+    def begin(self, mode):
+        if mode == 'w':
+            self.rollback()
+        elif self.open_transaction:
+            return
+        if mode == 'w' or not os.path.isfile(self.path) or os.path.getsize(self.path) == 0:
+            self.close_file()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path + TEMP_SUFFIX, 'w', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.headers)
+            self.temporary = True
+        else:
+            with open(self.path + JOURNAL_SUFFIX, 'w', encoding='utf-8') as journal:
+                journal.write(str(os.path.getsize(self.path)))
+                if self.fsync != 'never':
+                    journal.flush()
+                    os.fsync(journal.fileno())
+            if self.file is None:
+                self.file = open(self.path, 'a', newline='', encoding='utf-8')
+                self.writer = csv.writer(self.file)
+        self.open_transaction = True
+
+    def add(self, rows):
+        if not self.rows:
+            self.first_buffered = time.monotonic()
+        self.rows.extend(rows)
+
+    def due(self, flush_rows, flush_interval):
+        return self.rows and (len(self.rows) >= flush_rows
+                              or time.monotonic() - self.first_buffered >= flush_interval)
+
+    def flush(self):
+        if self.rows:
+            self.writer.writerows(self.rows)
+            self.rows = []
+        if self.file is not None:
+            self.file.flush()
+            if self.fsync == 'always':
+                os.fsync(self.file.fileno())
+
+    def append_file(self, segment):
+        """Copy the rest of an open CSV file into this sink's transaction."""
+        self.flush()
+        while True:
+            data = segment.read(1024 * 1024)
+            if not data:
+                break
+            self.file.write(data)
+
+    def commit(self):
+        if not self.open_transaction:
+            return
+        self.flush()
+        if self.fsync != 'never':
+            os.fsync(self.file.fileno())
+        if self.temporary:
+            self.close_file()
+            os.replace(self.path + TEMP_SUFFIX, self.path)
+            if self.fsync != 'never':
+                _fsync_directory(self.path)
+        else:
+            os.remove(self.path + JOURNAL_SUFFIX)
+        self.open_transaction = False
+
+    def rollback(self):
+        """Drop everything written since the last commit."""
+        self.rows = []
+        if not self.open_transaction:
+            return
+        self.close_file()
+        recover(self.path)
+        self.open_transaction = False
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
+            self.temporary = False
+
+
+class OutputWriter:
+    """Long-lived CSV writer: open sinks, buffered rows and atomic commits.
+
+    Rows are buffered per file and written once flush_rows are waiting or the oldest
+    has waited flush_interval seconds. Nothing becomes visible under the target name
+    until commit(), which callers make at the end of each unit of work (a file, an
+    increment, a run); a crash in between leaves the last committed file, never a
+    half-written one. With background, formatting and writing happen on a thread of
+    its own, so the caller (the parser) does not wait on the disk. Only the settings
+    are pickled, so a copy sent to a worker process starts with no open sinks; it
+    writes in the foreground, as the worker is already off the caller's path.
+    """
+
+    def __init__(self, flush_rows=DEFAULT_FLUSH_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL, fsync='never',
+                 background=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.background = background
+        self.sinks = {}
+        self.lock = threading.RLock()
+        self._thread_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def __getstate__(self):
+        return self.flush_rows, self.flush_interval, self.fsync
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def _sink(self, path, headers):
+        sink = self.sinks.get(path)
+        if sink is None:
+            sink = self.sinks[path] = _CsvSink(path, headers, self.fsync)
+        return sink
+
+    def _write(self, path, headers, mode, rows):
+        with self.lock:
+            sink = self._sink(path, headers)
+            sink.begin(mode)
+            sink.add(rows)
+            self._flush_due()
+
+    def _flush_due(self):
+        with self.lock:
+            for sink in self.sinks.values():
+                if sink.due(self.flush_rows, self.flush_interval):
+                    sink.flush()
+
+    def _run(self):
+        while True:
+            try:
+                task = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                task = None
+            try:
+                if task is None:
+                    self._flush_due()
+                    continue
+                if task[0] is None:
+                    return
+                function, args, done = task
+                function(*args)
+            except Exception as e:
+                self._error = e
+            finally:
+                if task is not None:
+                    if task[2] is not None:
+                        task[2].set()
+                    self._queue.task_done()
+
+    def _call(self, function, *args, wait=False):
+        if not self.background:
+            function(*args)
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=BACKGROUND_QUEUE_SIZE)
+                self._thread = threading.Thread(target=self._run, name='output-writer', daemon=True)
+                self._thread.start()
+            work_queue = self._queue
+        done = threading.Event() if wait else None
+        work_queue.put((function, args, done))
+        if wait:
+            done.wait()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write_rows(self, path, rows, headers, mode='a'):
+        """Buffer rows for path; mode 'w' starts the file over, 'a' adds to it (or starts it)."""
+        rows = iter(rows)
+        with span('write_rows', file=os.path.basename(path)) as current:
+            # Always begin, so an empty 'w' write still leaves a header-only file on commit
+            batch = list(islice(rows, self.flush_rows))
+            while True:
+                self._call(self._write, path, headers, mode, batch)
+                current.add(lines=len(batch))
+                batch = list(islice(rows, self.flush_rows))
+                if not batch:
+                    break
+                mode = 'a'
+
+    def append_file(self, segment_path, path):
+        """Add the rows of another CSV to path, in the same transaction as its buffered rows."""
+        def append():
+            with self.lock, open(segment_path, newline='', encoding='utf-8') as segment:
+                headers = next(csv.reader([segment.readline()]), [])
+                sink = self._sink(path, headers)
+                sink.begin('a')
+                sink.append_file(segment)
+        self._call(append, wait=True)
+
+    def commit(self, path=None):
+        """Write out buffered rows and make them durable and visible, for one path or all."""
+        def commit():
+            with self.lock, span('output_commit'):
+                for sink_path, sink in list(self.sinks.items()):
+                    if path is None or sink_path == path:
+                        sink.commit()
+        self._call(commit, wait=True)
+
+    def discard(self, path):
+        """Forget a sink without committing it, e.g. because its file is being removed."""
+        def discard():
+            with self.lock:
+                sink = self.sinks.pop(path, None)
+                if sink is not None:
+                    sink.rollback()
+                    sink.close_file()
+        self._call(discard, wait=True)
+
+    def close(self):
+        """Commit everything, close the files and stop the background thread.
+
+        The writer can still be used afterwards; it opens what it needs again.
+        """
+        self.commit()
+        with self.lock:
+            for sink in self.sinks.values():
+                sink.close_file()
+            self.sinks = {}
+        with self._thread_lock:
+            if self._thread is not None:
+                self._queue.put((None, None, None))
+                self._thread.join()
+                self._thread = None
+                self._queue = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from src.utils import PARSER_VERSION
+
+PARSE_CACHE_FOLDER = '.parse_cache'
+# Least recently used entries are evicted once the cache grows past this
+PARSE_CACHE_MAX_BYTES = 4 * 1024 ** 3
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(file_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def folder_size(path):
+    return sum(os.path.getsize(os.path.join(folder, filename))
+               for folder, _, filenames in os.walk(path) for filename in filenames)
+
+
+class ParseCache:
+    """Per-log parse results kept on disk, with a manifest saying which log they belong to.
+
+    The manifest is keyed by log path and records size, mtime and a content hash. A log
+    whose size and mtime are unchanged is a hit without reading it; otherwise its hash
+    decides, so a touched but unchanged log is not parsed again. Entries written by
+    another PARSER_VERSION or event encoding are treated as missing.
+    """
+
+    def __init__(self, root, max_bytes=PARSE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.entries = {}
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def entry_path(self, entry):
+        return os.path.join(self.root, entry['key'])
+
+    def lookup(self, log_file_path, event_encoding):
+        """The entry for an unchanged log, or None if it has to be parsed."""
+        entry = self.entries.get(os.path.abspath(log_file_path))
+        if (entry is None or entry['parser_version'] != PARSER_VERSION
+                or entry['event_encoding'] != event_encoding or not os.path.isdir(self.entry_path(entry))):
+            return None
+        file_stat = os.stat(log_file_path)
+        if file_stat.st_size != entry['size']:
+            return None
+        if file_stat.st_mtime_ns != entry['mtime_ns']:
+            if content_hash(log_file_path) != entry['content_hash']:
+                return None
+            entry['mtime_ns'] = file_stat.st_mtime_ns
+        entry['last_used'] = time.time()
+        return entry
+
+    def new_entry(self, log_file_path, event_encoding):
+        """Start a fresh entry for a log about to be parsed, replacing any older one."""
+        self.remove(log_file_path)
+        file_stat = os.stat(log_file_path)
+        file_hash = content_hash(log_file_path)
+        entry = {
+            'size': file_stat.st_size,
+            'mtime_ns': file_stat.st_mtime_ns,
+            'content_hash': file_hash,
+            'parser_version': PARSER_VERSION,
+            'event_encoding': event_encoding,
+            'key': f"{os.path.basename(log_file_path)}.{file_hash}",
+            'last_used': time.time(),
+            'bytes': 0,
+        }
+        os.makedirs(self.entry_path(entry), exist_ok=True)
+        return entry
+
+    def finish_entry(self, log_file_path, entry):
+        """Register an entry once its parse results are complete."""
+        entry['bytes'] = folder_size(self.entry_path(entry))
+        self.entries[os.path.abspath(log_file_path)] = entry
+
+    def remove(self, log_file_path):
+        entry = self.entries.pop(os.path.abspath(log_file_path), None)
+        if entry is not None:
+            shutil.rmtree(self.entry_path(entry), ignore_errors=True)
+
+    def prune(self, log_file_paths):
+        """Drop entries for logs that are no longer among the given ones."""
+        keep = {os.path.abspath(path) for path in log_file_paths}
+        for path in [path for path in self.entries if path not in keep]:
+            self.remove(path)
+        # Entries left behind by an interrupted run are not in the manifest
+        known_keys = {entry['key'] for entry in self.entries.values()}
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if name not in known_keys and os.path.isdir(os.path.join(self.root, name)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def enforce_size_cap(self):
+        """Evict least recently used entries until the cache fits in max_bytes."""
+        total_bytes = sum(entry['bytes'] for entry in self.entries.values())
+        for path, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= entry['bytes']
+            self.remove(path)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file, indent=1)
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,142 @@
+import math
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+# Items kept by the top compactor; rank error is roughly 1.7 / DEFAULT_K of the count
+DEFAULT_K = 200
+# How much smaller each compactor is than the one above it
+CAPACITY_DECAY = 2 / 3
+
+
+class KllSketch:
+    """Mergeable streaming quantile sketch (KLL).
+
+    Values go into the bottom compactor. A full compactor sorts its items and promotes
+    every other one to the level above, where each item stands for twice as many values,
+    so memory stays around 3 * k items however many values are added. Sketches built from
+    different files or workers merge level by level. Count, min and max are exact.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.compactors = [[]]
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._size = 0
+        self._max_size = self._capacity(0)
+        # Seeded, so the same values in the same order always give the same sketch
+        self._random = random.Random(0)
+
+    def _capacity(self, level):
+        height = len(self.compactors) - level - 1
+        return int(math.ceil(CAPACITY_DECAY ** height * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            compactor = self.compactors[level]
+            if len(compactor) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self._grow()
+                compactor.sort()
+                self.compactors[level + 1].extend(compactor[self._random.getrandbits(1)::2])
+                compactor.clear()
+                self._size = sum(len(items) for items in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self._size = sum(len(items) for items in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = sorted((value, 2 ** level) for level, compactor in enumerate(self.compactors)
+                       for value in compactor)
+        return items, sum(weight for _, weight in items)
+
+    def quantiles(self, fractions):
+        """Estimated values at the given fractions (0.5 for the median); None when empty.
+
+        Interpolates linearly between ranks like pandas' quantile, so a sketch that has
+        not compacted yet gives exactly the same answers.
+        """
+        if not self.count:
+            return [None for _ in fractions]
+        items, total_weight = self._weighted_items()
+        values = [value for value, _ in items]
+        cumulative_weights = list(accumulate(weight for _, weight in items))
+
+        def value_at(rank):
+            return values[bisect_right(cumulative_weights, rank)]
+
+        results = []
+        for fraction in fractions:
+            if fraction <= 0:
+                results.append(self.min)
+            elif fraction >= 1:
+                results.append(self.max)
+            else:
+                position = fraction * (total_weight - 1)
+                lower_rank = math.floor(position)
+                lower = value_at(lower_rank)
+                upper = value_at(min(lower_rank + 1, total_weight - 1))
+                results.append(lower + (upper - lower) * (position - lower_rank))
+        return results
+
+    def quantile(self, fraction):
+        return self.quantiles([fraction])[0]
+
+    def histogram(self, bins=50):
+        """Estimated (bin edges, counts) over [min, max] in equal-width bins."""
+        if not self.count:
+            return [], []
+        low, high = self.min, self.max
+        width = (high - low) / bins or 1
+        edges = [low + width * index for index in range(bins + 1)]
+        items, total_weight = self._weighted_items()
+        counts = [0.0] * bins
+        for value, weight in items:
+            counts[min(int((value - low) / width), bins - 1)] += weight
+        # Scale the weights back to the exact number of values added
+        scale = self.count / total_weight
+        return edges, [count * scale for count in counts]
+
+    def to_dict(self):
+        return {'k': self.k, 'count': self.count, 'min': self.min, 'max': self.max,
+                'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.compactors = [list(items) for items in data['compactors']] or [[]]
+        sketch.count = data['count']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        sketch._max_size = sum(sketch._capacity(level) for level in range(len(sketch.compactors)))
+        return sketch
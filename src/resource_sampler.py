@@ -0,0 +1,151 @@
+import csv
+import os
+import threading
+import time
+from collections import namedtuple
+
+import psutil
+
+from src.utils import PROJECT_ROOT
+
+DEFAULT_SAMPLE_INTERVAL = 0.1
+RESOURCE_SERIES_FOLDER = os.path.join(PROJECT_ROOT, 'benchmarks', 'resource_series')
+
+# Benchmark columns for one processing unit; the I/O figures are in MB
+ResourceUsage = namedtuple('ResourceUsage', [
+    'peak_cpu', 'peak_ram', 'avg_cpu', 'avg_ram', 'read_mb', 'written_mb', 'context_switches'
+])
+
+
+def _io_bytes(process):
+    # io_counters is not available on every platform (e.g. macOS)
+    try:
+        counters = process.io_counters()
+    except (AttributeError, psutil.Error):
+        return 0, 0
+    return counters.read_bytes, counters.write_bytes
+
+
+def _context_switches(process):
+    switches = process.num_ctx_switches()
+    return switches.voluntary + switches.involuntary
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of this process on a background thread while a unit of work runs.
+
+    Use as a context manager around the work. CPU percentages come from a single
+    psutil.Process kept for the whole run, so each sample covers the time since the
+    previous one; a last sample is taken on stop, so even short units are measured.
+    Averages are weighted by the time each sample covers. With include_children,
+    worker processes are added to CPU and RSS (I/O and context switches stay this
+    process's own).
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, include_children=False):
+        self.interval = interval
+        self.include_children = include_children
+        self.process = psutil.Process()
+        self._children = {}
+        # (seconds since start, CPU %, RSS MB)
+        self.samples = []
+        self._stopped = threading.Event()
+        self._thread = None
+        self.usage = None
+
+    def _processes(self):
+        if not self.include_children:
+            return [self.process]
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        # Keep one Process per child so its cpu_percent covers the time since its last sample
+        alive = []
+        for child in children:
+            known = self._children.get(child.pid)
+            if known is None:
+                known = self._children[child.pid] = child
+                try:
+                    known.cpu_percent()
+                except psutil.Error:
+                    continue
+            alive.append(known)
+        return [self.process] + alive
+
+    def _sample(self):
+        cpu = 0.0
+        ram = 0.0
+        for process in self._processes():
+            try:
+                cpu += process.cpu_percent()
+                ram += process.memory_info().rss / (1024 * 1024)
+            except psutil.Error:
+                continue
+        self.samples.append((time.perf_counter() - self._start_time, cpu, ram))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        self._start_io = _io_bytes(self.process)
+        self._start_switches = _context_switches(self.process)
+        self.process.cpu_percent()
+        self._processes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and summarise the run as a ResourceUsage."""
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+
+        previous = 0.0
+        weighted_cpu = weighted_ram = 0.0
+        for elapsed, cpu, ram in self.samples:
+            weighted_cpu += cpu * (elapsed - previous)
+            weighted_ram += ram * (elapsed - previous)
+            previous = elapsed
+        read_bytes, written_bytes = _io_bytes(self.process)
+        self.usage = ResourceUsage(
+            peak_cpu=max(cpu for _, cpu, _ in self.samples),
+            peak_ram=max(ram for _, _, ram in self.samples),
+            avg_cpu=weighted_cpu / previous if previous else self.samples[-1][1],
+            avg_ram=weighted_ram / previous if previous else self.samples[-1][2],
+            read_mb=(read_bytes - self._start_io[0]) / (1024 * 1024),
+            written_mb=(written_bytes - self._start_io[1]) / (1024 * 1024),
+            context_switches=_context_switches(self.process) - self._start_switches,
+        )
+        return self.usage
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def save_series(self, name):
+        """Write the samples to benchmarks/resource_series/<name>.csv."""
+        os.makedirs(RESOURCE_SERIES_FOLDER, exist_ok=True)
+        filepath = os.path.join(RESOURCE_SERIES_FOLDER, f'{name}.csv')
+        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Elapsed (seconds)', 'CPU Usage (%)', 'RAM Usage (MB)'])
+            writer.writerows(self.samples)
+        return filepath
+
+
+def summarize_usage(usages):
+    """(average, peak) ResourceUsage over several units: means of the averages, maxima of the peaks."""
+    usages = list(usages)
+    if not usages:
+        empty = ResourceUsage(0, 0, 0, 0, 0, 0, 0)
+        return empty, empty
+    count = len(usages)
+    average = ResourceUsage(*(sum(values) / count for values in zip(*usages)))
+    peak = ResourceUsage(*(max(values) for values in zip(*usages)))
+    return average, peak
@@ -1,55 +1,113 @@
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 
+from src.output_backends import DEFAULT_OUTPUT_FORMAT, DEFAULT_EVENT_ENCODING, get_output_backend
+from src import tracing
+from src.resource_sampler import ResourceSampler
 from src.utils import (
-    PROJECT_ROOT, parse_sap_log, save_to_csv, save_events_to_csv,
-    monitor_resources, save_benchmarks, read_log_file
+    SEGMENTS_FOLDER, JOB_HEADERS, REPORT_HEADERS, ParseState, save_benchmarks, stream_log,
+    compression_suffix, detect_encoding, split_log_ranges
 )
 
+# Chunks smaller than this are not worth handing to another process
+MIN_CHUNK_SIZE = 16 * 1024 * 1024
 
-def process_log_to_csv(log_file_path):
-    start_time = time.time()
-    resource_usage = []
-    peak_cpu = peak_ram = 0
 
-    log_content = read_log_file(log_file_path)
-    if not log_content:
-        return
+def parse_log_chunk(log_file_path, encoding, byte_range, events_segment, output):
+    """Worker entry point: parse one byte range of the log into its own events segment."""
+    state = stream_log(log_file_path, events_segment, encoding=encoding, byte_range=byte_range,
+                       save_events=output.save_events)
+    output.close()
+    return state
+
+
+def parse_log_parallel(log_file_path, events_output, workers, output, min_chunk_size=MIN_CHUNK_SIZE):
+    """Parse one log in line-aligned byte ranges across worker processes.
+
+    Chunk states are merged in file order, so jobs whose scheduled, started, ended
+    and removed lines fall into different chunks come out exactly as in a serial parse.
+    """
+    chunk_count = max(1, min(workers, os.path.getsize(log_file_path) // min_chunk_size))
+    if chunk_count > 1 and compression_suffix(log_file_path) is not None:
+        # Chunks would each have to decompress everything before them, so the stream is parsed once
+        print("Compressed log, parsing it in one process")
+        chunk_count = 1
+    if chunk_count == 1:
+        return stream_log(log_file_path, events_output, save_events=output.save_events)
+
+    encoding = detect_encoding(log_file_path)
+    if encoding is None:
+        print(f"Error: Unable to decode file {log_file_path} with any of the attempted encodings.")
+        return None
 
-    jobs, reports, events = parse_sap_log(log_content)
+    byte_ranges = split_log_ranges(log_file_path, chunk_count)
+    segments = [
+        os.path.join(SEGMENTS_FOLDER, f"{events_output}.{index}") for index in range(len(byte_ranges))
+    ]
+    print(f"Parsing {len(byte_ranges)} chunks with {workers} worker processes")
+
+    output.remove(events_output)
+    state = ParseState()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            tracing.submit(executor, parse_log_chunk, log_file_path, encoding, byte_range, segment, output)
+            for byte_range, segment in zip(byte_ranges, segments)
+        ]
+        for segment, future in zip(segments, futures):
+            chunk_state = future.result()
+            with tracing.span('merge_chunk'):
+                state.merge(chunk_state)
+                output.append_segment(segment, events_output)
+    return state
 
-    cpu_usage, ram_usage = monitor_resources()
-    peak_cpu = max(peak_cpu, cpu_usage)
-    peak_ram = max(peak_ram, ram_usage)
-    resource_usage.append((cpu_usage, ram_usage))
 
-    job_headers = ['id', 'name', 'scheduled_time', 'start_time', 'end_time', 'return_code',
-                   'scheduled_message_code', 'start_message_code', 'end_message_code', 'remove_message_code']
-    save_to_csv(jobs, 'jobs.csv', job_headers)
+def process_log_to_csv(log_file_path, workers=1, output_format=DEFAULT_OUTPUT_FORMAT,
+                       event_encoding=DEFAULT_EVENT_ENCODING, resource_series=False, writer=None):
+    start_time = time.time()
+    output = get_output_backend(output_format, event_encoding, writer)
 
-    report_headers = ['id', 'file_name', 'start_time', 'end_time', 'start_message_code', 'end_message_code']
-    save_to_csv(reports, 'reports.csv', report_headers)
+    # Sampled in the background for the whole run, chunk worker processes included
+    with ResourceSampler(include_children=True) as sampler, \
+            tracing.span('process_log_to_csv', file=os.path.basename(log_file_path)):
+        # Events are written to the events output while the file is streamed through the parser
+        if workers > 1:
+            state = parse_log_parallel(log_file_path, 'events', workers, output)
+        else:
+            state = stream_log(log_file_path, 'events', save_events=output.save_events)
+        if state is None or not state.line_count:
+            output.close()
+            return
 
-    save_events_to_csv(events, 'events.csv')
+        with tracing.span('save_records') as span:
+            output.save_records(state.jobs, 'jobs', JOB_HEADERS)
+            output.save_records(state.reports, 'reports', REPORT_HEADERS)
+            span.add(lines=len(state.jobs) + len(state.reports))
+        output.close()
 
     processing_time = time.time() - start_time
-    avg_cpu = sum(usage[0] for usage in resource_usage) / len(resource_usage)
-    avg_ram = sum(usage[1] for usage in resource_usage) / len(resource_usage)
+    usage = sampler.usage
+    if resource_series:
+        sampler.save_series(os.path.basename(log_file_path))
 
-    print(f"Data has been saved to csv/jobs.csv, csv/reports.csv, and csv/events.csv")
+    print(f"Data has been saved to {', '.join(output.path(dataset) for dataset in ('jobs', 'reports', 'events'))}")
     print(f"Processing time: {processing_time:.2f} seconds")
-    print(f"Peak CPU usage: {peak_cpu:.2f}%")
-    print(f"Peak RAM usage: {peak_ram:.2f} MB")
-    print(f"Average CPU usage: {avg_cpu:.2f}%")
-    print(f"Average RAM usage: {avg_ram:.2f} MB")
+    print(f"Peak CPU usage: {usage.peak_cpu:.2f}%")
+    print(f"Peak RAM usage: {usage.peak_ram:.2f} MB")
+    print(f"Average CPU usage: {usage.avg_cpu:.2f}%")
+    print(f"Average RAM usage: {usage.avg_ram:.2f} MB")
 
     benchmarks = [
-        (os.path.basename(log_file_path), processing_time, peak_cpu, peak_ram, avg_cpu, avg_ram)
+        (os.path.basename(log_file_path), processing_time, *usage)
     ]
 
     save_benchmarks(benchmarks, 'single_benchmarks.csv')
     print("Benchmarks have been saved to benchmarks/single_benchmarks.csv")
+    tracing.export('single')
 
 if __name__ == "__main__":
-    log_file_path = os.path.join(PROJECT_ROOT, 'logs', '189229440.LOG.txt')
-    process_log_to_csv(log_file_path)
\ No newline at end of file
+    import sys
+
+    from src.cli import main as cli_main
+
+    sys.exit(cli_main(['single', *sys.argv[1:]]))
\ No newline at end of file
@@ -0,0 +1,78 @@
+import json
+import os
+from datetime import datetime
+
+from src.utils import log_time_range
+
+# Sidecar file kept in each logs folder
+TIME_INDEX_NAME = '.time_index.json'
+
+
+class TimeIndex:
+    """First and last timestamp of each log in a folder, kept in a sidecar file next to the logs.
+
+    Entries are keyed by file name and record size and mtime; a log whose size or mtime
+    changed has its range read again with log_time_range (two small reads for a plain
+    log). Window queries only look at the stored ranges, so logs outside the window are
+    never opened.
+    """
+
+    def __init__(self, logs_path):
+        self.logs_path = logs_path
+        self.path = os.path.join(logs_path, TIME_INDEX_NAME)
+        self.entries = {}
+        self.changed = False
+        if os.path.isfile(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def time_range(self, filename):
+        """(start, end) of a log, or (None, None) if it has no timestamps."""
+        file_stat = os.stat(os.path.join(self.logs_path, filename))
+        entry = self.entries.get(filename)
+        if entry is None or entry['size'] != file_stat.st_size or entry['mtime_ns'] != file_stat.st_mtime_ns:
+            start_time, end_time = log_time_range(os.path.join(self.logs_path, filename))
+            entry = self.entries[filename] = {
+                'size': file_stat.st_size,
+                'mtime_ns': file_stat.st_mtime_ns,
+                'start': start_time and start_time.isoformat(),
+                'end': end_time and end_time.isoformat(),
+            }
+            self.changed = True
+        return tuple(datetime.fromisoformat(value) if value else None for value in (entry['start'], entry['end']))
+
+    def update(self, filenames):
+        """Index the given logs and forget any others."""
+        for filename in filenames:
+            self.time_range(filename)
+        for filename in set(self.entries) - set(filenames):
+            del self.entries[filename]
+            self.changed = True
+
+    def in_window(self, filenames, start_time=None, end_time=None):
+        """The logs whose time range overlaps start_time..end_time; either bound may be None.
+
+        Logs without any timestamp never overlap.
+        """
+        selected = []
+        for filename in filenames:
+            first, last = self.time_range(filename)
+            if first is None:
+                continue
+            if (start_time is None or last >= start_time) and (end_time is None or first <= end_time):
+                selected.append(filename)
+        return selected
+
+    def save(self):
+        """Write the index next to the logs; a read-only logs folder just goes unindexed."""
+        if not self.changed:
+            return
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save the time index to {self.path}: {e}")
+            return
+        self.changed = False
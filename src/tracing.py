@@ -0,0 +1,258 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+
+# Not imported from utils, which is itself instrumented
+TRACES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces')
+# AE_TRACE=1 turns tracing on, AE_TRACE=profile also captures a cProfile per span
+TRACE_ENVIRONMENT_VARIABLE = 'AE_TRACE'
+METRIC_PREFIX = 'ae_logs_stage'
+
+
+class _State:
+    enabled = False
+    profile = False
+    # Spans not exported yet, and running totals per stage since tracing started
+    spans = []
+    totals = {}
+    lock = threading.Lock()
+    local = threading.local()
+    profile_count = 0
+
+
+_state = _State()
+
+
+def enable(profile=False):
+    """Start recording spans; with profile, each span also writes a cProfile to traces/profiles/."""
+    _state.enabled = True
+    _state.profile = profile
+
+
+def disable():
+    _state.enabled = False
+    _state.profile = False
+
+
+def is_enabled():
+    return _state.enabled
+
+
+class _NoopSpan:
+    """Returned while tracing is off, so instrumented code costs one call per stage."""
+
+    def add(self, lines=0, bytes=0):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed stage: wall-clock duration plus the lines and bytes it processed."""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.lines = 0
+        self.bytes = 0
+        self.parent = None
+        self._profiler = None
+
+    def add(self, lines=0, bytes=0):
+        self.lines += lines
+        self.bytes += bytes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = getattr(_state.local, 'stack', None)
+        if stack is None:
+            stack = _state.local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        # cProfile cannot nest, so only the outermost profiled span captures
+        if _state.profile and not any(span._profiler for span in stack[:-1]):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.start = time.time()
+        self._start_counter = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self._start_counter
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._save_profile()
+        _state.local.stack.pop()
+        record = {
+            'name': self.name,
+            'parent': self.parent,
+            'start': self.start,
+            'duration': duration,
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'lines_per_second': self.lines / duration if duration and self.lines else 0,
+            'pid': os.getpid(),
+            'attributes': self.attributes,
+        }
+        _record([record])
+        return False
+
+    def _save_profile(self):
+        folder = os.path.join(TRACES_FOLDER, 'profiles')
+        os.makedirs(folder, exist_ok=True)
+        with _state.lock:
+            _state.profile_count += 1
+            count = _state.profile_count
+        self._profiler.dump_stats(os.path.join(folder, f'{self.name}.{os.getpid()}.{count}.prof'))
+
+
+def span(name, **attributes):
+    """Context manager timing one stage; use span.add(lines=..., bytes=...) for throughput."""
+    if not _state.enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name=None):
+    """Decorator running the whole function inside a span named after it."""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return function(*args, **kwargs)
+            with Span(span_name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(records):
+    with _state.lock:
+        _state.spans.extend(records)
+        for record in records:
+            stage = _state.totals.get(record['name'])
+            if stage is None:
+                stage = _state.totals[record['name']] = {'calls': 0, 'seconds': 0.0, 'lines': 0, 'bytes': 0}
+            stage['calls'] += 1
+            stage['seconds'] += record['duration']
+            stage['lines'] += record['lines']
+            stage['bytes'] += record['bytes']
+
+
+def drain():
+    """Remove and return the spans recorded so far."""
+    with _state.lock:
+        spans = _state.spans
+        _state.spans = []
+    return spans
+
+
+def _call_traced(profile, parent, function, args, kwargs):
+    # Worker side of submit: trace like the parent, then hand the spans back with the result.
+    # A forked worker inherits the parent's span stack, which is not its own.
+    enable(profile)
+    drain()
+    _state.local.stack = []
+    try:
+        result = function(*args, **kwargs)
+        spans = drain()
+        for record in spans:
+            if record['parent'] is None:
+                record['parent'] = parent
+        return result, spans
+    finally:
+        disable()
+
+
+class _TracedFuture:
+    def __init__(self, future):
+        self.future = future
+
+    def result(self, timeout=None):
+        result, spans = self.future.result(timeout)
+        _record(spans)
+        return result
+
+
+def submit(executor, function, *args, **kwargs):
+    """executor.submit that brings spans recorded in a worker process back to this one."""
+    if not _state.enabled:
+        return executor.submit(function, *args, **kwargs)
+    stack = getattr(_state.local, 'stack', None)
+    parent = stack[-1].name if stack else None
+    return _TracedFuture(executor.submit(_call_traced, _state.profile, parent, function, args, kwargs))
+
+
+def stage_metrics():
+    """Per stage since tracing started: calls, seconds, lines, bytes and lines per second."""
+    with _state.lock:
+        metrics = {name: dict(stage) for name, stage in _state.totals.items()}
+    for stage in metrics.values():
+        stage['lines_per_second'] = stage['lines'] / stage['seconds'] if stage['seconds'] else 0
+    return metrics
+
+
+def export_jsonl(path):
+    """Append the spans recorded since the last export, one JSON line each."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    spans = drain()
+    with open(path, 'a', encoding='utf-8') as file:
+        for record in spans:
+            file.write(json.dumps(record, default=str) + '\n')
+
+
+def export_prometheus(path):
+    """Write the stage metrics in the Prometheus text exposition format."""
+    metrics = stage_metrics()
+    series = (
+        ('calls_total', 'counter', 'Times each stage ran.', 'calls'),
+        ('seconds_total', 'counter', 'Wall-clock seconds spent in each stage.', 'seconds'),
+        ('lines_total', 'counter', 'Log lines processed by each stage.', 'lines'),
+        ('bytes_total', 'counter', 'Bytes processed by each stage.', 'bytes'),
+        ('lines_per_second', 'gauge', 'Log lines processed per second by each stage.', 'lines_per_second'),
+    )
+    lines = []
+    for suffix, metric_type, description, key in series:
+        metric = f'{METRIC_PREFIX}_{suffix}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        for stage, values in sorted(metrics.items()):
+            lines.append(f'{metric}{{stage="{stage}"}} {values[key]}')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
+
+
+def export(name):
+    """Append new spans to traces/<name>.jsonl and rewrite traces/<name>.prom.
+
+    Does nothing while tracing is off.
+    """
+    if not _state.enabled:
+        return
+    export_jsonl(os.path.join(TRACES_FOLDER, f'{name}.jsonl'))
+    export_prometheus(os.path.join(TRACES_FOLDER, f'{name}.prom'))
+    print(f"Traces have been saved to traces/{name}.jsonl and traces/{name}.prom")
+
+
+if os.environ.get(TRACE_ENVIRONMENT_VARIABLE):
+    enable(profile=os.environ[TRACE_ENVIRONMENT_VARIABLE] == 'profile')
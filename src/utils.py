@@ -1,13 +1,110 @@
+import bz2
+import codecs
 import csv
+import gzip
+import hashlib
+import io
+import lzma
+import mmap
 import os
 import re
-from collections import defaultdict
 from datetime import datetime
+from sys import intern
+
+from src.output_writer import OutputWriter
+from src.tracing import span, traced
 
-import psutil
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 
+LOG_ENCODINGS = ['utf-8', 'iso-8859-1', 'windows-1252', 'ascii']
+# Bytes read from each end of a log file to detect its encoding
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+LOG_SUFFIX = '.LOG.txt'
+# Archived logs (e.g. 20240101.LOG.txt.gz) are decompressed as a stream while they are
+# parsed; .zst needs the optional zstandard package
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+# Decompressed bytes read at a time when skipping into a compressed log
+DECOMPRESS_BLOCK_SIZE = 1024 * 1024
+# Bytes read at a time from either end of a log to find its first and last timestamps
+TIME_RANGE_BLOCK_SIZE = 64 * 1024
+# Number of event rows handed to the CSV writer at a time when streaming
+EVENT_BATCH_SIZE = 10000
+# Worker outputs live in this folder until they are merged
+SEGMENTS_FOLDER = '.segments'
+# Bump whenever parsing or the parse outputs change, so cached parses are redone
+PARSER_VERSION = 2
+
+JOB_HEADERS = ['id', 'name', 'scheduled_time', 'start_time', 'end_time', 'return_code',
+               'scheduled_message_code', 'start_message_code', 'end_message_code', 'remove_message_code']
+REPORT_HEADERS = ['id', 'file_name', 'start_time', 'end_time', 'start_message_code', 'end_message_code']
+EVENT_HEADERS = ['Timestamp', 'Event', 'Message Code']
+TEMPLATED_EVENT_HEADERS = ['Timestamp', 'Template ID', 'Params', 'Message Code']
+TEMPLATE_HEADERS = ['Template ID', 'Template']
+# Joins the parameters of a templated event into a single column
+PARAMS_SEPARATOR = '\x1f'
+
+# Compiled once at import time; parse_sap_log runs these on every line of the log.
+TIMESTAMP_PATTERN = re.compile(r'(\d{8}/\d{6}\.\d{3})')
+TIMESTAMP_LENGTH = len('YYYYMMDD/HHMMSS.fff')
+MESSAGE_CODE_PATTERN = re.compile(r'(U\d{8})')
+# Quoted values (job names, RunIDs, report ids, file names) are the parameters of an event
+QUOTED_VALUE_PATTERN = re.compile(r"'([^']*)'")
+
+# Each entry is (pattern name, literal that must appear in the line, compiled pattern).
+# The literal is a cheap substring pre-check so the regex only runs on lines that can
+# possibly match, and the tuple order keeps the original first-match-wins priority.
+JOB_PATTERNS = (
+    ('job_is_to_be_started', "' is to be started.",
+     re.compile(r'Job \'(.+?)\' with RunID \'(\d+)\' is to be started\.')),
+    ('job_start', "' started with RunID '",
+     re.compile(r'Job \'(.+?)\' started with RunID \'(\d+)\'\.')),
+    ('job_end', "' ended with return code '",
+     re.compile(r'Job \'(.+?)\' with RunID \'(\d+)\' ended with return code \'(\d+)\'.')),
+    ('job_remove', "' has been removed from the job table",
+     re.compile(r'Job \'(.+?)\' with RunID \'(\d+)\' has been removed from the job table.')),
+)
+REPORT_PATTERNS = (
+    ('report_start', "' has been started",
+     re.compile(r'Report \'(\d+)\' for file \'(.+?)\' has been started.')),
+    ('report_end', "' ended normally",
+     re.compile(r'Report \'(\d+)\' ended normally.')),
+)
+
+
+def _latin1_fallback(error):
+    # Bytes the detected encoding cannot decode are read as iso-8859-1, the encoding a
+    # whole-file decode falls back to, instead of becoming U+FFFD
+    return error.object[error.start:error.end].decode('iso-8859-1'), error.end
+
+
+codecs.register_error('latin1_fallback', _latin1_fallback)
+
+
+def _to_bytes_patterns(patterns):
+    return tuple(
+        (pattern_name, marker.encode('ascii'), re.compile(pattern.pattern.encode('ascii')))
+        for pattern_name, marker, pattern in patterns
+    )
+
+
+# Byte versions of the same patterns. Timestamps, U codes and the job/report markers are
+# all ASCII, so raw log bytes can be matched directly and only the kept fields decoded.
+BYTES_TIMESTAMP_PATTERN = re.compile(TIMESTAMP_PATTERN.pattern.encode('ascii'))
+BYTES_MESSAGE_CODE_PATTERN = re.compile(MESSAGE_CODE_PATTERN.pattern.encode('ascii'))
+BYTES_JOB_PATTERNS = _to_bytes_patterns(JOB_PATTERNS)
+BYTES_REPORT_PATTERNS = _to_bytes_patterns(REPORT_PATTERNS)
+
+LINE_PATTERNS = ("Job '", JOB_PATTERNS, "Report '", REPORT_PATTERNS)
+BYTES_LINE_PATTERNS = (b"Job '", BYTES_JOB_PATTERNS, b"Report '", BYTES_REPORT_PATTERNS)
+
+
+def parse_timestamp(value):
+    # Fixed-width YYYYMMDD/HHMMSS.fff, sliced directly instead of going through strptime
+    return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                    int(value[9:11]), int(value[11:13]), int(value[13:15]),
+                    int(value[16:19]) * 1000)
+
 
 def remove_header(log_content):
     lines = log_content.split('\n')
@@ -22,143 +119,355 @@ def remove_header(log_content):
 
 
 def extract_time_range(log_content):
-    lines = log_content.split('\n')
-    timestamp_pattern = r'(\d{8}/\d{6}\.\d{3})'
-
-    start_time = None
-    end_time = None
+    with span('extract_time_range') as current:
+        current.add(bytes=len(log_content))
 
-    # Find the first line with a timestamp
-    for line in lines:
-        match = re.search(timestamp_pattern, line)
-        if match:
-            start_time = datetime.strptime(match.group(1), '%Y%m%d/%H%M%S.%f')
-            break
+        # The first timestamp in the text is the one of the first line that has any
+        match = TIMESTAMP_PATTERN.search(log_content)
+        start_time = parse_timestamp(match.group(1)) if match else None
+        end_time = None
 
-    # Find the last line with a timestamp
-    for line in reversed(lines):
-        match = re.search(timestamp_pattern, line)
-        if match:
-            end_time = datetime.strptime(match.group(1), '%Y%m%d/%H%M%S.%f')
-            break
+        # Walk lines back from the end, without splitting the text, until one has a timestamp
+        line_end = len(log_content)
+        while match and line_end >= 0:
+            line_start = log_content.rfind('\n', 0, line_end) + 1
+            line_match = TIMESTAMP_PATTERN.search(log_content, line_start, line_end)
+            if line_match:
+                end_time = parse_timestamp(line_match.group(1))
+                break
+            line_end = line_start - 1
 
     if not start_time:
         print("Debug: Unable to extract start time.")
-        print("First few lines:", '\n'.join(lines[:5]))
+        print("First few lines:", '\n'.join(log_content.split('\n')[:5]))
     if not end_time:
         print("Debug: Unable to extract end time.")
-        print("Last few lines:", '\n'.join(lines[-5:]))
+        print("Last few lines:", '\n'.join(log_content.split('\n')[-5:]))
 
     return start_time, end_time
 
-def parse_sap_log(log_content):
-    jobs = defaultdict(lambda: defaultdict(str))
-    reports = defaultdict(dict)
-    events = []
-
-    patterns = {
-        'timestamp': r'(\d{8}/\d{6}\.\d{3})',
-        'message_code': r'(U\d{8})',
-        'job_is_to_be_started': r'Job \'(.+?)\' with RunID \'(\d+)\' is to be started\.',
-        'job_start': r'Job \'(.+?)\' started with RunID \'(\d+)\'\.',
-        'job_end': r'Job \'(.+?)\' with RunID \'(\d+)\' ended with return code \'(\d+)\'.',
-        'job_remove': r'Job \'(.+?)\' with RunID \'(\d+)\' has been removed from the job table.',
-        'report_start': r'Report \'(\d+)\' for file \'(.+?)\' has been started.',
-        'report_end': r'Report \'(\d+)\' ended normally.'
-    }
-
-    for line in log_content.split('\n'):
-        timestamp_match = re.search(patterns['timestamp'], line)
-        message_code_match = re.search(patterns['message_code'], line)
-
-        if timestamp_match and message_code_match:
-            timestamp = datetime.strptime(timestamp_match.group(1), '%Y%m%d/%H%M%S.%f')
-            message_code = message_code_match.group(1)
-            event = line[timestamp_match.end():].strip()
-
-            events.append((timestamp, event, message_code))
-
-            for pattern_name, pattern in patterns.items():
-                if pattern_name not in ['timestamp', 'message_code']:
-                    match = re.search(pattern, line)
-                    if match:
-                        if pattern_name == 'job_is_to_be_started':
-                            job_name, run_id = match.groups()
-                            jobs[run_id].update({
-                                'name': job_name,
-                                'scheduled_time': timestamp,
-                                'scheduled_message_code': message_code
-                            })
-                        elif pattern_name == 'job_start':
-                            job_name, run_id = match.groups()
-                            jobs[run_id].update({
-                                'name': job_name,
-                                'start_time': timestamp,
-                                'start_message_code': message_code
-                            })
-                        elif pattern_name == 'job_end':
-                            job_name, run_id, return_code = match.groups()
-                            jobs[run_id].update({
-                                'name': job_name,
-                                'return_code': return_code,
-                                'end_message_code': message_code
-                            })
-                        elif pattern_name == 'job_remove':
-                            job_name, run_id = match.groups()
-                            jobs[run_id].update({
-                                'name': job_name,
-                                'end_time': timestamp,
-                                'remove_message_code': message_code
-                            })
-                        elif pattern_name == 'report_start':
-                            report_id, file_name = match.groups()
-                            reports[report_id] = {
-                                'file_name': file_name,
-                                'start_time': timestamp,
-                                'start_message_code': message_code
-                            }
-                        elif pattern_name == 'report_end':
-                            report_id = match.group(1)
-                            if report_id in reports:
-                                reports[report_id].update({
-                                    'end_time': timestamp,
-                                    'end_message_code': message_code
-                                })
-                        break
-
-    return jobs, reports, events
 
+def match_line_pattern(line, line_patterns=LINE_PATTERNS):
+    """Return (pattern name, match) for the first job/report pattern matching the line."""
+    job_prefix, job_patterns, report_prefix, report_patterns = line_patterns
+    if job_prefix in line:
+        for pattern_name, marker, pattern in job_patterns:
+            if marker in line:
+                match = pattern.search(line)
+                if match:
+                    return pattern_name, match
+    if report_prefix in line:
+        for pattern_name, marker, pattern in report_patterns:
+            if marker in line:
+                match = pattern.search(line)
+                if match:
+                    return pattern_name, match
+    return None, None
 
-def save_to_csv(data, filename, headers, mode='w'):
-    filepath = os.path.join(PROJECT_ROOT, 'csv', filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    file_exists = os.path.isfile(filepath)
 
-    with open(filepath, mode, newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        if not file_exists or mode == 'w':
-            writer.writeheader()
-        for key, value in data.items():
-            row = {'id': key}
-            row.update(value)
-            writer.writerow(row)
+class _Record:
+    """Fixed-field record with just enough of the dict interface for the writers.
 
+    Fields that were never set are None and are left out of keys(), the same way a
+    missing key was left out of the per-RunID dicts this replaces.
+    """
 
-def save_events_to_csv(events, filename, mode='w'):
-    filepath = os.path.join(PROJECT_ROOT, 'csv', filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    file_exists = os.path.isfile(filepath)
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            setattr(self, field, fields.get(field))
+
+    def keys(self):
+        return [field for field in self.__slots__ if getattr(self, field) is not None]
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.keys()]
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def __contains__(self, field):
+        return getattr(self, field, None) is not None
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def update(self, other):
+        for field, value in other.items():
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.items() == other.items()
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __setstate__(self, state):
+        for field, value in zip(self.__slots__, state):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class JobRecord(_Record):
+    __slots__ = ('name', 'scheduled_time', 'start_time', 'end_time', 'return_code',
+                 'scheduled_message_code', 'start_message_code', 'end_message_code', 'remove_message_code')
+
+
+class ReportRecord(_Record):
+    __slots__ = ('file_name', 'start_time', 'end_time', 'start_message_code', 'end_message_code')
+
+
+class ParseState:
+    """Per-RunID job and report state kept in memory while a log is streamed."""
+
+    def __init__(self, sketches=None):
+        # RunID -> JobRecord and report id -> ReportRecord; names and codes are interned
+        self.jobs = {}
+        # aggregates.JobSketches the parser feeds as jobs start and end, if any
+        self.sketches = sketches
+        self.reports = {}
+        # 'Report ended' lines whose start was not seen yet. The serial parser ignores
+        # them, but the start may live in an earlier chunk when a file is split.
+        self.unmatched_report_ends = {}
+        self.line_count = 0
+        self.event_count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def time_range(self):
+        """Return the first and last timestamps seen, same as extract_time_range."""
+        start_time = parse_timestamp(self.first_timestamp) if self.first_timestamp else None
+        end_time = parse_timestamp(self.last_timestamp) if self.last_timestamp else None
+        return start_time, end_time
+
+    def merge(self, other):
+        """Fold in the state of the chunk that directly follows this one in the same file.
+
+        The result is the same as if both chunks had been parsed serially: job fields
+        are last-write-wins per RunID, a report start replaces the report, and a report
+        end only applies to a report that has already been started. Sketches are not
+        merged, since a run split across the chunks was fed by neither.
+        """
+        for run_id, job in other.jobs.items():
+            if run_id in self.jobs:
+                self.jobs[run_id].update(job)
+            else:
+                self.jobs[run_id] = job
+
+        for report_id, report_end in other.unmatched_report_ends.items():
+            if report_id in self.reports:
+                self.reports[report_id].update(report_end)
+            else:
+                self.unmatched_report_ends[report_id] = report_end
+        for report_id, report in other.reports.items():
+            self.reports[report_id] = report
+
+        self.line_count += other.line_count
+        self.event_count += other.event_count
+        if self.first_timestamp is None:
+            self.first_timestamp = other.first_timestamp
+        if other.last_timestamp is not None:
+            self.last_timestamp = other.last_timestamp
+        return self
+
+
+def _identity(value, *args):
+    # Stand-in for bytes.decode when the parser is fed str lines
+    return value
+
+
+def iter_parse_sap_log(lines, state, encoding=None):
+    """Parse lines lazily, updating state in place and yielding event tuples.
+
+    Lines are str by default. When an encoding is given they are raw bytes, matched
+    with the byte patterns, and only the fields that are kept get decoded.
+    """
+    jobs = state.jobs
+    reports = state.reports
+    sketches = state.sketches
+
+    if encoding is None:
+        timestamp_search = TIMESTAMP_PATTERN.search
+        message_code_search = MESSAGE_CODE_PATTERN.search
+        line_patterns = LINE_PATTERNS
+        decode = _identity
+    else:
+        timestamp_search = BYTES_TIMESTAMP_PATTERN.search
+        message_code_search = BYTES_MESSAGE_CODE_PATTERN.search
+        line_patterns = BYTES_LINE_PATTERNS
+        decode = bytes.decode
+
+    # U codes repeat heavily, so each distinct code is decoded once
+    message_codes = {}
+
+    for line in lines:
+        state.line_count += 1
+        timestamp_match = timestamp_search(line)
+        if not timestamp_match:
+            continue
+        raw_timestamp = timestamp_match.group(1)
+        if state.first_timestamp is None:
+            state.first_timestamp = raw_timestamp
+        state.last_timestamp = raw_timestamp
+
+        message_code_match = message_code_search(line)
+        if not message_code_match:
+            continue
+
+        timestamp = parse_timestamp(raw_timestamp)
+
+        raw_message_code = message_code_match.group(1)
+        message_code = message_codes.get(raw_message_code)
+        if message_code is None:
+            message_code = message_codes[raw_message_code] = intern(decode(raw_message_code, 'ascii'))
+        event = decode(line[timestamp_match.end():], encoding, 'latin1_fallback').strip()
+
+        pattern_name, match = match_line_pattern(line, line_patterns)
+        if pattern_name is not None:
+            groups = match.groups()
+            if encoding is not None:
+                # Ids and return codes are ASCII digits, so one decode works for every group
+                groups = [group.decode(encoding, 'latin1_fallback') for group in groups]
+
+        if pattern_name is None:
+            pass
+        elif pattern_name[0] == 'j':
+            job_name, run_id = groups[0], groups[1]
+            job = jobs.get(run_id)
+            if job is None:
+                job = jobs[run_id] = JobRecord()
+            job.name = intern(job_name)
+            if pattern_name == 'job_is_to_be_started':
+                job.scheduled_time = timestamp
+                job.scheduled_message_code = message_code
+            elif pattern_name == 'job_start':
+                first_start = sketches is not None and job.start_time is None
+                job.start_time = timestamp
+                job.start_message_code = message_code
+                if first_start:
+                    sketches.job_started(job)
+            elif pattern_name == 'job_end':
+                job.return_code = intern(groups[2])
+                job.end_message_code = message_code
+            else:
+                first_end = sketches is not None and job.end_time is None
+                job.end_time = timestamp
+                job.remove_message_code = message_code
+                if first_end:
+                    sketches.job_ended(job)
+        elif pattern_name == 'report_start':
+            report_id, file_name = groups
+            reports[report_id] = ReportRecord(
+                file_name=file_name,
+                start_time=timestamp,
+                start_message_code=message_code
+            )
+        elif pattern_name == 'report_end':
+            report_id = groups[0]
+            report = reports.get(report_id)
+            if report is None:
+                report = state.unmatched_report_ends[report_id] = ReportRecord()
+            report.end_time = timestamp
+            report.end_message_code = message_code
+
+        # State is updated before yielding so it is complete even if the consumer stops early
+        state.event_count += 1
+        yield timestamp, event, message_code
+
+
+def split_event_template(event, message_code=None):
+    """Split event text into a str.format template and the quoted values it was filled with.
+
+    Literal braces are escaped and the message code, which has its own column, becomes a
+    {code} field, so render_event(template, params, message_code) gives back the text.
+    """
+    parts = QUOTED_VALUE_PATTERN.split(event)
+    literals = [part.replace('{', '{{').replace('}', '}}') for part in parts[::2]]
+    if message_code and message_code in literals[0]:
+        literals[0] = literals[0].replace(message_code, '{code}', 1)
+    return "'{}'".join(literals), parts[1::2]
 
-    with open(filepath, mode, newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists or mode == 'w':
-            writer.writerow(['Timestamp', 'Event', 'Message Code'])
-        writer.writerows(events)
 
+def render_event(template, params, message_code=''):
+    """Rehydrate the event text from its template and PARAMS_SEPARATOR-joined parameters."""
+    return template.format(*params.split(PARAMS_SEPARATOR), code=message_code)
 
-def monitor_resources():
-    process = psutil.Process()
-    return process.cpu_percent(), process.memory_info().rss / (1024 * 1024)  # CPU % and RAM in MB
+
+class EventTemplates:
+    """Interns event templates under ids derived from the template text.
+
+    The ids are stable, so events encoded by different processes or in different runs
+    can be appended to the same output and share one templates table.
+    """
+
+    def __init__(self, templates=()):
+        # template -> id, seeded with (id, template) rows that are already persisted
+        self.ids = {template: template_id for template_id, template in templates}
+        self.new_templates = []
+
+    def template_id(self, template):
+        template_id = self.ids.get(template)
+        if template_id is None:
+            template_id = self.ids[template] = hashlib.blake2b(
+                template.encode('utf-8'), digest_size=6).hexdigest()
+            self.new_templates.append((template_id, template))
+        return template_id
+
+    def encode_events(self, events):
+        """Turn (timestamp, event, message code) tuples into
+        (timestamp, template id, params, message code) tuples, lazily."""
+        template_id = self.template_id
+        for timestamp, event, message_code in events:
+            template, params = split_event_template(event, message_code)
+            yield timestamp, template_id(template), PARAMS_SEPARATOR.join(params), message_code
+
+    def pop_new_templates(self):
+        """(id, template) rows interned since the last call, for the caller to persist."""
+        new_templates, self.new_templates = self.new_templates, []
+        return new_templates
+
+
+def parse_sap_log(log_content, templates=None):
+    """Parse a whole log held in memory.
+
+    With an EventTemplates, events are kept as (timestamp, template id, params, message
+    code) instead of carrying a full copy of the event text each.
+    """
+    with span('parse_sap_log') as current:
+        state = ParseState()
+        events = iter_parse_sap_log(log_content.split('\n'), state)
+        if templates is not None:
+            events = templates.encode_events(events)
+        events = list(events)
+        current.add(lines=state.line_count, bytes=len(log_content))
+    return state.jobs, state.reports, events
+
+
+def record_rows(records, headers):
+    """Rows in header order from parser output: a dict of id -> JobRecord/ReportRecord.
+
+    Fields a record lacks are written blank, as csv.DictWriter did.
+    """
+    for record_id, record in records.items():
+        yield (record_id, *(record.get(column) for column in headers[1:]))
+
+
+# One-off writes; the processors keep an OutputWriter open for the whole run instead
+def save_to_csv(data, filename, headers, mode='w'):
+    with span('save_to_csv', file=filename), OutputWriter() as writer:
+        writer.write_rows(os.path.join(PROJECT_ROOT, 'csv', filename), record_rows(data, headers), headers, mode)
+
+
+def save_events_to_csv(events, filename, mode='w', batch_size=EVENT_BATCH_SIZE, headers=EVENT_HEADERS):
+    # events may be any iterable, including the iter_parse_sap_log generator; rows are
+    # pulled and written in bounded batches so the full event list never exists at once.
+    # With a lazy parser generator this span also covers the parsing it drives
+    with span('save_events_to_csv', file=filename), OutputWriter(flush_rows=batch_size) as writer:
+        writer.write_rows(os.path.join(PROJECT_ROOT, 'csv', filename), events, headers, mode)
 
 
 def save_benchmarks(benchmarks, filename):
@@ -168,21 +477,306 @@ def save_benchmarks(benchmarks, filename):
         writer = csv.writer(csvfile)
         writer.writerow(
             ['File', 'Processing Time (seconds)', 'Peak CPU Usage (%)', 'Peak RAM Usage (MB)', 'Avg CPU Usage (%)',
-             'Avg RAM Usage (MB)'])
+             'Avg RAM Usage (MB)', 'Read (MB)', 'Written (MB)', 'Context Switches'])
         writer.writerows(benchmarks)
 
 
+def compression_suffix(log_file_path):
+    """The compression suffix of a log path ('.gz', '.bz2', '.xz' or '.zst'), or None."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if log_file_path.endswith(suffix):
+            return suffix
+    return None
+
+
+def plain_log_name(log_file_path):
+    """The log's name without its compression suffix."""
+    suffix = compression_suffix(log_file_path)
+    return log_file_path[:-len(suffix)] if suffix else log_file_path
+
+
+def is_log_file(log_file_path):
+    return plain_log_name(log_file_path).endswith(LOG_SUFFIX)
+
+
+def zstd_available():
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def find_log_files(logs_path):
+    """Sorted names of the plain and compressed logs in a folder.
+
+    A compressed log is skipped when its decompressed copy is in the folder too, and
+    .zst logs are skipped (with a message) when zstandard is not installed.
+    """
+    filenames = {filename for filename in os.listdir(logs_path) if is_log_file(filename)}
+    for filename in sorted(filenames):
+        if filename == plain_log_name(filename):
+            continue
+        if plain_log_name(filename) in filenames:
+            print(f"Skipping {filename}: {plain_log_name(filename)} is in the folder too")
+            filenames.discard(filename)
+        elif compression_suffix(filename) == '.zst' and not zstd_available():
+            print(f"Skipping {filename}: reading .zst logs needs the zstandard package")
+            filenames.discard(filename)
+    return sorted(filenames)
+
+
+def open_log(log_file_path):
+    """Open a log for reading bytes, decompressing it as it is read if it is compressed."""
+    suffix = compression_suffix(log_file_path)
+    if suffix == '.gz':
+        return gzip.open(log_file_path, 'rb')
+    if suffix == '.bz2':
+        return bz2.open(log_file_path, 'rb')
+    if suffix == '.xz':
+        return lzma.open(log_file_path, 'rb')
+    if suffix == '.zst':
+        import zstandard
+
+        reader = zstandard.ZstdDecompressor().stream_reader(open(log_file_path, 'rb'), read_across_frames=True,
+                                                             closefd=True)
+        return io.BufferedReader(reader, DECOMPRESS_BLOCK_SIZE)
+    return open(log_file_path, 'rb')
+
+
+def skip_bytes(file, count):
+    """Read past the first count bytes of a (decompressing) file that cannot seek."""
+    while count > 0:
+        block = file.read(min(count, DECOMPRESS_BLOCK_SIZE))
+        if not block:
+            break
+        count -= len(block)
+
+
+def _first_timestamp(file, block_size):
+    # Consecutive blocks overlap by less than a timestamp, so one split between them is still found
+    overlap = b''
+    for block in iter(lambda: file.read(block_size), b''):
+        block = overlap + block
+        match = BYTES_TIMESTAMP_PATTERN.search(block)
+        if match:
+            return match.group(1)
+        overlap = block[-(TIMESTAMP_LENGTH - 1):]
+    return None
+
+
+def _last_line_timestamp(data):
+    """First timestamp on the last line of data that has one, as the parser would see it."""
+    for line in reversed(data.split(b'\n')):
+        match = BYTES_TIMESTAMP_PATTERN.search(line)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _last_timestamp(file, file_size, block_size):
+    # Blocks are read backwards from the end; a block's first line may start in the block
+    # before it, so it is carried over and searched once it is complete
+    end = file_size
+    partial = b''
+    while end > 0:
+        start = max(0, end - block_size)
+        file.seek(start)
+        block = file.read(end - start) + partial
+        cut = block.find(b'\n') + 1 if start else 0
+        if start and not cut:
+            partial = block
+        else:
+            timestamp = _last_line_timestamp(block[cut:])
+            if timestamp is not None:
+                return timestamp
+            partial = block[:cut]
+        end = start
+    return None
+
+
+def _last_timestamp_streamed(file, block_size):
+    last = None
+    partial = b''
+    for block in iter(lambda: file.read(block_size), b''):
+        block = partial + block
+        cut = block.rfind(b'\n') + 1
+        last = _last_line_timestamp(block[:cut]) or last
+        partial = block[cut:]
+    return _last_line_timestamp(partial) or last
+
+
+@traced()
+def log_time_range(log_file_path, block_size=TIME_RANGE_BLOCK_SIZE):
+    """First and last timestamps of a log file, read from its two ends.
+
+    Blocks are read forward from the start and backwards from the end until each has a
+    timestamp, so a log costs two small reads whatever its size. Compressed logs cannot
+    be read backwards and are decompressed through to the end instead, without parsing.
+    The result is the same as the parse's (ParseState.time_range).
+    """
+    compressed = compression_suffix(log_file_path) is not None
+    with open_log(log_file_path) as file:
+        first = _first_timestamp(file, block_size)
+        if first is not None and not compressed:
+            last = _last_timestamp(file, os.path.getsize(log_file_path), block_size)
+    if first is None:
+        return None, None
+    if compressed:
+        with open_log(log_file_path) as file:
+            last = _last_timestamp_streamed(file, block_size)
+    return parse_timestamp(first.decode('ascii')), parse_timestamp(last.decode('ascii'))
+
+
 def read_log_file(log_file_path):
-    encodings = ['utf-8', 'iso-8859-1', 'windows-1252', 'ascii']
-    for encoding in encodings:
+    encoding = detect_encoding(log_file_path)
+    if encoding is None:
+        print(f"Error: Unable to decode file {log_file_path} with any of the attempted encodings.")
+        return None
+
+    with span('read_log_file') as current:
+        with open_log(log_file_path) as file:
+            data = file.read()
+        current.add(bytes=len(data))
+    with span('decode', encoding=encoding) as current:
+        current.add(bytes=len(data))
+        try:
+            content = data.decode(encoding)
+        except UnicodeDecodeError:
+            # The sample looked like utf-8 but a later byte is not; decode the bytes already
+            # in memory as latin-1 instead of reading the file again
+            content = data.decode('iso-8859-1')
+        if '\r' in content:
+            # Same newline translation text mode would have applied
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+@traced()
+def detect_encoding(log_file_path, sample_size=ENCODING_SAMPLE_SIZE):
+    """Detect a log file's encoding from bounded samples of its start and end.
+
+    Compressed logs are sampled at the start only; reaching their end would mean
+    decompressing the whole file.
+    """
+    file_size = os.path.getsize(log_file_path)
+    with open_log(log_file_path) as file:
+        head = file.read(sample_size)
+        tail = b''
+        if file_size > sample_size and compression_suffix(log_file_path) is None:
+            file.seek(max(sample_size, file_size - sample_size))
+            tail = file.read()
+            # Start the tail sample on a line boundary so it never begins mid-character;
+            # without one, skip the UTF-8 continuation bytes (at most 3) it may start with
+            newline = tail.find(b'\n')
+            if newline >= 0:
+                tail = tail[newline + 1:]
+            else:
+                start = 0
+                while start < 3 and start < len(tail) and 0x80 <= tail[start] <= 0xBF:
+                    start += 1
+                tail = tail[start:]
+
+    for encoding in LOG_ENCODINGS:
         try:
-            with open(log_file_path, 'r', encoding=encoding) as file:
-                return file.read()  # Remove the remove_header call
+            # The head sample may end mid-character, so it is decoded without final=True
+            codecs.getincrementaldecoder(encoding)().decode(head)
+            tail.decode(encoding)
+            return encoding
         except UnicodeDecodeError:
             continue
-    print(f"Error: Unable to decode file {log_file_path} with any of the attempted encodings.")
     return None
 
+
+def iter_log_lines(log_file_path, start=0, end=None):
+    """Yield the raw byte lines of a memory-mapped log file, without line endings.
+
+    start and end restrict reading to a byte range; start must be at a line boundary
+    and the range ends with the line that contains byte end - 1. Compressed logs are
+    decompressed as a stream instead, and their ranges count decompressed bytes.
+    """
+    if compression_suffix(log_file_path) is not None:
+        yield from _iter_compressed_log_lines(log_file_path, start, end)
+        return
+    with open(log_file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(start)
+            if end is None:
+                for line in iter(mapped.readline, b''):
+                    yield line.rstrip(b'\r\n')
+            else:
+                while mapped.tell() < end:
+                    yield mapped.readline().rstrip(b'\r\n')
+
+
+def _iter_compressed_log_lines(log_file_path, start, end):
+    with open_log(log_file_path) as file:
+        skip_bytes(file, start)
+        if end is None:
+            for line in file:
+                yield line.rstrip(b'\r\n')
+            return
+        position = start
+        for line in file:
+            if position >= end:
+                break
+            position += len(line)
+            yield line.rstrip(b'\r\n')
+
+
+def split_log_ranges(log_file_path, chunk_count):
+    """Split a log file into at most chunk_count byte ranges that start on line boundaries.
+
+    Plain logs only: a compressed stream cannot be entered in the middle.
+    """
+    file_size = os.path.getsize(log_file_path)
+    boundaries = [0]
+    with open(log_file_path, 'rb') as file:
+        for index in range(1, chunk_count):
+            target = max(file_size * index // chunk_count, boundaries[-1])
+            file.seek(target)
+            file.readline()  # finish the line the target offset falls in
+            boundary = file.tell()
+            if boundary >= file_size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def stream_log(log_file_path, events_name, mode='w', state=None, encoding=None,
+               byte_range=(0, None), save_events=save_events_to_csv):
+    """Stream a log file through the parser, writing events straight to a sink.
+
+    save_events is called as save_events(events, events_name, mode=mode) with the
+    lazy event iterator; it defaults to the CSV writer, and output backends pass
+    their own. Only the per-RunID job and report state is kept in memory; it is
+    returned in a ParseState so the caller can save jobs and reports afterwards.
+    byte_range limits parsing to one chunk of the file (see split_log_ranges).
+    """
+    encoding = encoding or detect_encoding(log_file_path)
+    if encoding is None:
+        print(f"Error: Unable to decode file {log_file_path} with any of the attempted encodings.")
+        return None
+
+    # Lines stay as bytes; the parser decodes only the fields it keeps. A byte past the
+    # detection samples that the encoding rejects is read as iso-8859-1 (latin1_fallback),
+    # like read_log_file's fallback, so it cannot abort the parse.
+    state = state or ParseState()
+    # Parsing is driven by the event writer, so this span covers both
+    with span('stream_log', file=os.path.basename(log_file_path)) as current:
+        line_count = state.line_count
+        events = iter_parse_sap_log(iter_log_lines(log_file_path, *byte_range), state, encoding)
+        save_events(events, events_name, mode=mode)
+        start, end = byte_range
+        current.add(lines=state.line_count - line_count,
+                    bytes=(os.path.getsize(log_file_path) if end is None else end) - start)
+    return state
+
+
 def create_or_clear_csv(filename):
     filepath = os.path.join(PROJECT_ROOT, 'csv', filename)
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from src import utils
+from src.output_backends import CsvOutput, ParquetOutput
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+# Small logs with their expected parse in <name>.expected.json, by encoding and line ending
+FIXTURE_LOGS = {'utf-8': 'utf8_lf', 'windows-1252': 'cp1252_crlf'}
+DAILY_FORMATS = (('utf-8', '\n'), ('windows-1252', '\r\n'), ('utf-8', '\n'))
+
+
+@pytest.fixture
+def project_root(tmp_path, monkeypatch):
+    """Point the output, benchmark and graph folders at a temporary project root."""
+    monkeypatch.setattr(utils, 'PROJECT_ROOT', str(tmp_path))
+    monkeypatch.setattr(CsvOutput, 'root', str(tmp_path / 'csv'))
+    monkeypatch.setattr(ParquetOutput, 'root', str(tmp_path / 'parquet'))
+    return tmp_path
+
+
+@pytest.fixture(params=list(FIXTURE_LOGS))
+def fixture_log(request):
+    return os.path.join(FIXTURES, f'{FIXTURE_LOGS[request.param]}.LOG.txt')
+
+
+@pytest.fixture
+def logs_folder(tmp_path):
+    """Three daily logs cut from the UTF-8 fixture log, in both encodings and line endings.
+
+    Runs still open where a log is cut end in the next one, like runs crossing midnight.
+    """
+    with open(os.path.join(FIXTURES, 'utf8_lf.LOG.txt'), encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    folder = tmp_path / 'logs'
+    folder.mkdir()
+    size = -(-len(lines) // len(DAILY_FORMATS))
+    for day, (encoding, newline) in enumerate(DAILY_FORMATS):
+        text = ''.join(line + newline for line in lines[day * size:(day + 1) * size])
+        (folder / f'2024010{day + 1}.LOG.txt').write_bytes(text.encode(encoding))
+    return str(folder)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.aggregates import concurrency_sweep
+from src.jobs_analyzer import JobsAnalyzer
+
+NAT = np.datetime64('NaT', 'ns')
+
+
+def brute_force_counts(starts, ends):
+    """Running runs after each start and end, counting every run at every event."""
+    events = sorted((time, position) for position, time in enumerate(np.column_stack([starts, ends]).ravel())
+                    if not np.isnat(time))
+    counts = []
+    for event in events:
+        count = 0
+        for run, (start, end) in enumerate(zip(starts, ends)):
+            if not np.isnat(start) and (start, 2 * run) <= event:
+                count += 1
+                if not np.isnat(end) and end >= start and (end, 2 * run + 1) <= event:
+                    count -= 1
+        counts.append(count)
+    return [position for _, position in events], counts
+
+
+def times(*values):
+    return np.array([NAT if value is None else np.datetime64(f'2024-01-01T{value}', 'ns') for value in values])
+
+
+def test_sweep_matches_brute_force_on_edge_cases():
+    # Same job name twice, overlapping; one that never ends; one that ends where the next
+    # starts; an end without a start; and an end logged before its start
+    starts = times('08:00', '08:30', '09:00', '10:00', '10:30', None, '12:00')
+    ends = times('09:00', '09:30', None, '10:30', '11:00', '11:30', '11:45')
+    positions, counts, _ = concurrency_sweep(starts, ends)
+    expected_positions, expected_counts = brute_force_counts(starts, ends)
+    assert positions.tolist() == expected_positions
+    assert counts.tolist() == expected_counts
+    assert counts.tolist() == [1, 2, 1, 2, 1, 2, 1, 2, 1, 1, 1, 2]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sweep_matches_brute_force_on_random_runs(seed):
+    rng = np.random.default_rng(seed)
+    base = np.datetime64('2024-01-01T00:00', 'ns')
+    # Minute resolution, so runs often start and end at the same moment
+    starts = base + rng.integers(0, 120, 200).astype('timedelta64[m]')
+    ends = starts + rng.integers(-5, 60, 200).astype('timedelta64[m]')
+    starts[rng.random(200) < 0.1] = NAT
+    ends[rng.random(200) < 0.1] = NAT
+    positions, counts, _ = concurrency_sweep(starts, ends)
+    expected_positions, expected_counts = brute_force_counts(starts, ends)
+    assert positions.tolist() == expected_positions
+    assert counts.tolist() == expected_counts
+
+
+def test_analyzer_counts_overlapping_runs_of_one_job(tmp_path):
+    analyzer = JobsAnalyzer(project_root=str(tmp_path))
+    analyzer.jobs_df = pd.DataFrame({
+        'id': ['1', '2', '3'],
+        'name': ['JOBS.DAILY.1', 'JOBS.DAILY.1', 'JOBS.HOURLY.1'],
+        'start_time': pd.to_datetime(['2024-01-01 08:00', '2024-01-01 08:30', '2024-01-01 08:45']),
+        'end_time': pd.to_datetime(['2024-01-01 09:00', '2024-01-01 09:30', None]),
+    })
+    concurrent_df = analyzer.get_concurrent_jobs_data()
+    assert concurrent_df['concurrent_jobs'].tolist() == [1, 2, 3, 2, 1]
+    assert analyzer.active_job_labels().tolist() == [
+        'JOBS.DAILY.1', 'JOBS.DAILY.1, JOBS.DAILY.1', 'JOBS.DAILY.1, JOBS.DAILY.1, JOBS.HOURLY.1',
+        'JOBS.DAILY.1, JOBS.HOURLY.1', 'JOBS.HOURLY.1']
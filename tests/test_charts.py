@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.charts import downsample_minmax
+
+
+def buckets_of(x, buckets):
+    """Indices per pixel column, bucketing x by equal widths as plotted."""
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        x = x.astype(np.int64)
+    x_range = float(x[-1] - x[0])
+    groups = {}
+    for index, value in enumerate(x):
+        groups.setdefault(min(int((value - x[0]) / x_range * buckets), buckets - 1), []).append(index)
+    return groups.values()
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('as_datetimes', [False, True])
+def test_downsample_keeps_each_buckets_extremes_and_endpoints(seed, as_datetimes):
+    rng = np.random.default_rng(seed)
+    # Dense and sparse stretches, so some buckets hold one point or none
+    x = np.sort(np.concatenate([rng.integers(0, 1000, 5000), rng.integers(5000, 100000, 300)]))
+    y = rng.integers(0, 50, len(x))
+    if as_datetimes:
+        x = np.datetime64('2024-01-01', 'ms') + x.astype('timedelta64[s]')
+    kept = downsample_minmax(x, y, 100)
+
+    assert np.all(np.diff(kept) > 0)
+    assert kept[0] == 0 and kept[-1] == len(y) - 1
+    assert len(kept) <= 4 * 100
+    kept = set(kept.tolist())
+    for indices in buckets_of(x, 100):
+        values = y[indices]
+        assert indices[0] in kept and indices[-1] in kept
+        assert min(y[index] for index in kept.intersection(indices)) == values.min()
+        assert max(y[index] for index in kept.intersection(indices)) == values.max()
+
+
+def test_short_series_is_kept_whole():
+    assert downsample_minmax(np.arange(40), np.arange(40), 10).tolist() == list(range(40))
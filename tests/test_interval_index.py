@@ -0,0 +1,59 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.interval_index import IntervalIndex
+from src.utils import JobRecord
+
+START = datetime(2024, 1, 1)
+
+
+def random_jobs(count, seed=0):
+    """Runs with tied starts, open runs, zero-length runs and ends before their start."""
+    generator = random.Random(seed)
+    jobs = {}
+    for run in range(count):
+        start_time = START + timedelta(minutes=generator.randrange(0, 600, 5))
+        end_time = start_time + timedelta(minutes=generator.randrange(-10, 120))
+        if generator.random() < 0.1:
+            end_time = None
+        jobs[f'{run:05d}'] = JobRecord(name=f'JOB_{run % 7}', start_time=start_time, end_time=end_time)
+    jobs['99999'] = JobRecord(name='NO_START', end_time=START)
+    return jobs
+
+
+def brute_force(jobs, start, end):
+    """Runs running at some moment in [start, end]: started by end and not ended by start."""
+    return sorted(run_id for run_id, job in jobs.items()
+                  if job.start_time is not None and job.start_time <= end
+                  and (job.end_time is None or job.end_time < job.start_time or job.end_time > start))
+
+
+def test_queries_match_brute_force():
+    jobs = random_jobs(2000)
+    index = IntervalIndex.from_jobs(jobs)
+    generator = random.Random(1)
+    for _ in range(200):
+        start = START + timedelta(minutes=generator.randrange(-30, 700))
+        end = start + timedelta(minutes=generator.choice([0, 0, 1, 15, 240]))
+        ids, _, _, _ = index.overlapping(start, end)
+        assert sorted(ids) == brute_force(jobs, start, end)
+    ids, _, _, _ = index.running_at(START + timedelta(minutes=300))
+    assert sorted(ids) == brute_force(jobs, START + timedelta(minutes=300), START + timedelta(minutes=300))
+
+
+def test_index_from_jobs_matches_index_from_frame(tmp_path):
+    jobs = random_jobs(500, seed=2)
+    jobs_df = pd.DataFrame({
+        'id': list(jobs),
+        'name': [job.name for job in jobs.values()],
+        'start_time': pd.to_datetime([job.start_time for job in jobs.values()]),
+        'end_time': pd.to_datetime([job.end_time for job in jobs.values()]),
+    })
+    from_jobs = IntervalIndex.from_jobs(jobs)
+    from_jobs.save(str(tmp_path / 'job_intervals.npz'))
+    for index in (IntervalIndex.from_frame(jobs_df), IntervalIndex.load(str(tmp_path / 'job_intervals.npz'))):
+        for field in ('ids', 'names', 'starts', 'ends'):
+            assert np.array_equal(getattr(index, field), getattr(from_jobs, field))
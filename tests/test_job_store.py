@@ -0,0 +1,93 @@
+import functools
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src import multiple_day_log_processor
+from src.job_store import JobStore
+from src.multiple_day_log_processor import process_logs_to_csv
+from src.output_backends import get_output_backend
+
+
+@pytest.fixture
+def store_path(project_root, monkeypatch):
+    path = str(project_root / 'db' / 'jobs.sqlite')
+    monkeypatch.setattr(multiple_day_log_processor, 'JobStore', functools.partial(JobStore, path))
+    return path
+
+
+def store_jobs(store_path):
+    with sqlite3.connect(store_path) as connection:
+        return pd.read_sql_query("SELECT * FROM jobs", connection)
+
+
+def combined_jobs():
+    output = get_output_backend('csv')
+    return pd.read_csv(output.path('combined_jobs'), dtype={'id': str})
+
+
+def run(logs_folder, **options):
+    options = {'use_cache': True, 'use_job_store': True, **options}
+    process_logs_to_csv(logs_folder, **options)
+
+
+def last_times(rows, column):
+    """Last time in the column per RunID, as the store writes it."""
+    times = rows.dropna(subset=[column]).drop_duplicates('id', keep='last').set_index('id')[column]
+    return times.map(lambda value: datetime.fromisoformat(value).isoformat(sep=' ', timespec='milliseconds'))
+
+
+def test_one_row_per_run_id_across_daily_logs(logs_folder, store_path):
+    run(logs_folder)
+    rows = combined_jobs()
+    jobs = store_jobs(store_path).set_index('id')
+    assert sorted(jobs.index) == sorted(rows['id'].unique())
+
+    started, ended = last_times(rows, 'start_time'), last_times(rows, 'end_time')
+    assert jobs.loc[started.index, 'start_time'].equals(started)
+    assert jobs.loc[ended.index, 'end_time'].equals(ended)
+    # Runs cut by the end of a log have their start in one log's rows and their end in the next one's
+    whole = rows.dropna(subset=['start_time', 'end_time'])['id']
+    assert len(started.index.intersection(ended.index).difference(whole)) > 0
+
+
+def test_rerunning_does_not_duplicate_rows(logs_folder, store_path):
+    run(logs_folder)
+    first = store_jobs(store_path)
+    run(logs_folder)
+    run(logs_folder, use_cache=False)
+    assert store_jobs(store_path).sort_values('id').reset_index(drop=True).equals(
+        first.sort_values('id').reset_index(drop=True))
+
+
+def test_select_jobs_filters_match_pandas(logs_folder, store_path):
+    run(logs_folder)
+    # The store keeps the last non-empty value of each column per RunID
+    expected = combined_jobs().groupby('id').last()
+    for column in ('start_time', 'end_time'):
+        expected[column] = pd.to_datetime(expected[column], format='ISO8601')
+    name = expected.loc[expected['return_code'] == 0, 'name'].value_counts().index[0]
+    start, end = (time.to_pydatetime() for time in expected['start_time'].quantile([0.25, 0.75]))
+    filters = [
+        ({'name': name}, expected['name'] == name),
+        ({'name_like': name[:3] + '%'}, expected['name'].str.startswith(name[:3])),
+        ({'start': start, 'end': end}, (expected['start_time'] >= start) & (expected['start_time'] < end)),
+        ({'return_code': 0}, expected['return_code'] == 0),
+        ({'name': name, 'return_code': 0}, (expected['name'] == name) & (expected['return_code'] == 0)),
+    ]
+    with JobStore(store_path) as store:
+        for options, mask in filters:
+            sql, params = store.select_jobs(columns=['id'], **options)
+            selected = sorted(run_id for run_id, in store.connection.execute(sql, params))
+            assert selected == sorted(expected.index[mask])
+            assert selected
+
+
+def test_store_keeps_jobs_of_evicted_cache_entries(logs_folder, store_path, monkeypatch):
+    monkeypatch.setattr(multiple_day_log_processor, 'ParseCache',
+                        functools.partial(multiple_day_log_processor.ParseCache, max_bytes=1))
+    for _ in range(2):
+        run(logs_folder)
+        assert sorted(store_jobs(store_path)['id']) == sorted(combined_jobs()['id'].unique())
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from watchdog.events import FileDeletedEvent
+
+from src import live_log_processor
+from src.live_log_processor import Debouncer, LogFileHandler, WorkQueue
+from src.utils import JOB_HEADERS, REPORT_HEADERS, stream_log
+
+SOURCE_LOG = os.path.join(os.path.dirname(__file__), 'fixtures', 'utf8_lf.LOG.txt')
+
+
+@pytest.fixture
+def handler(project_root, monkeypatch):
+    monkeypatch.setattr(live_log_processor, 'PROJECT_ROOT', str(project_root))
+    return LogFileHandler(quiet_period=0, max_delay=0)
+
+
+def parsed_rows(output, log_path):
+    """Job and report rows of a serial parse of the whole log, as the live outputs would hold them."""
+    state = stream_log(log_path, 'expected_events', save_events=output.save_events)
+    output.save_records(state.jobs, 'expected_jobs', JOB_HEADERS)
+    output.save_records(state.reports, 'expected_reports', REPORT_HEADERS)
+    return sorted(output.read_rows('expected_jobs')), sorted(output.read_rows('expected_reports'))
+
+
+def live_rows(output):
+    jobs = output.read_rows('live_combined_jobs')
+    reports = output.read_rows('live_combined_reports')
+    # Runs written while still open are replaced, never duplicated
+    assert len({row[0] for row in jobs}) == len(jobs)
+    return sorted(jobs), sorted(reports)
+
+
+def test_increments_and_open_runs_match_a_full_parse(handler, tmp_path):
+    source = SOURCE_LOG
+    with open(source, 'rb') as file:
+        data = file.read()
+    # Cut mid-line, so the first increment stops at the last complete line
+    middle = len(data) // 2
+
+    log_path = str(tmp_path / 'live' / '20240101.LOG.txt')
+    os.makedirs(os.path.dirname(log_path))
+    with open(log_path, 'wb') as file:
+        file.write(data[:middle])
+    handler.process_file(log_path)
+    with open(log_path, 'ab') as file:
+        file.write(data[middle:])
+    handler.process_file(log_path)
+    # Runs that never end are written on close with an empty end time
+    handler.close()
+
+    assert live_rows(handler.output) == parsed_rows(handler.output, source)
+
+
+def test_rotation_keeps_open_runs_once(handler, tmp_path):
+    source = SOURCE_LOG
+    with open(source, 'rb') as file:
+        lines = file.read().splitlines(keepends=True)
+
+    log_path = str(tmp_path / 'live' / '20240101.LOG.txt')
+    os.makedirs(os.path.dirname(log_path))
+    with open(log_path, 'wb') as file:
+        file.writelines(lines[:200])
+    handler.process_file(log_path)
+    # Rotated: a new file under the same name holds the rest of the log
+    with open(log_path + '.new', 'wb') as file:
+        file.writelines(lines[200:])
+    os.replace(log_path + '.new', log_path)
+    handler.process_file(log_path)
+    handler.close()
+
+    # Runs open at the rotation carry over, so they end up as in a parse of the whole log
+    assert live_rows(handler.output) == parsed_rows(handler.output, source)
+
+
+def test_delete_with_a_full_queue_does_not_block_the_observer(project_root, monkeypatch, tmp_path):
+    monkeypatch.setattr(live_log_processor, 'PROJECT_ROOT', str(project_root))
+    handler = LogFileHandler(workers=1, max_queued=1, overflow='block', quiet_period=0, max_delay=0)
+    unblock = threading.Event()
+    processed = []
+
+    def process(path):
+        unblock.wait()
+        processed.append(path)
+
+    handler.work_queue.process = process
+    # One file held by the worker, one filling the queue
+    for name in ('20240101.LOG.txt', '20240102.LOG.txt'):
+        handler.work_queue.submit(str(tmp_path / name))
+    while handler.work_queue.metrics()['running'] == 0:
+        time.sleep(0.01)
+
+    deleted = str(tmp_path / '20240103.LOG.txt')
+    observer = threading.Thread(target=handler.on_deleted, args=(FileDeletedEvent(deleted),), daemon=True)
+    observer.start()
+    observer.join(1)
+    blocked = observer.is_alive()
+    unblock.set()
+    handler.close()
+    assert not blocked
+    assert deleted in processed
+
+
+class GatedProcess:
+    """Fake WorkQueue process that records paths and holds each call until the gate opens."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.processed = []
+
+    def __call__(self, path):
+        self.gate.wait()
+        self.processed.append(path)
+
+
+def wait_until_running(work_queue, count=1):
+    while work_queue.metrics()['running'] < count:
+        time.sleep(0.01)
+
+
+def test_work_queue_coalesces_queued_and_running_paths():
+    process = GatedProcess()
+    work_queue = WorkQueue(process, workers=1)
+    work_queue.submit('a')
+    wait_until_running(work_queue)
+    # 'a' is running: both submits mark it to run once more. 'b' is queued only once
+    for path in ('a', 'a', 'b', 'b'):
+        work_queue.submit(path)
+    process.gate.set()
+    work_queue.join()
+    work_queue.close()
+
+    assert process.processed == ['a', 'a', 'b']
+    metrics = work_queue.metrics()
+    assert (metrics['submitted'], metrics['coalesced'], metrics['processed']) == (5, 3, 3)
+
+
+def test_work_queue_drops_work_when_full():
+    process = GatedProcess()
+    work_queue = WorkQueue(process, workers=1, max_queued=1, overflow='drop')
+    work_queue.submit('a')
+    wait_until_running(work_queue)
+    work_queue.submit('b')
+    # The queue holds 'b', so 'c' is dropped instead of blocking the caller
+    work_queue.submit('c')
+    assert work_queue.metrics()['dropped'] == 1
+    process.gate.set()
+    work_queue.join()
+    # A dropped path is taken again on its next submit
+    work_queue.submit('c')
+    work_queue.join()
+    work_queue.close()
+    assert process.processed == ['a', 'b', 'c']
+
+
+def test_work_queue_rejects_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        WorkQueue(GatedProcess(), overflow='spill')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock for the debouncer, moved forward by the test."""
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(live_log_processor, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def debouncer(clock):
+    # The background thread never polls; the test drives _ready_paths itself
+    debouncer = Debouncer(release=lambda path: None, quiet_period=1.0, max_delay=10.0, poll_interval=3600)
+    yield debouncer
+    debouncer._stopped.set()
+    debouncer._thread.join()
+
+
+def ready_at(debouncer, clock, now):
+    clock.now = now
+    return debouncer._ready_paths()
+
+
+def append(path, text='line\n'):
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(text)
+
+
+def test_debouncer_waits_for_a_quiet_period(debouncer, clock, tmp_path):
+    path = str(tmp_path / '20240101.LOG.txt')
+    append(path)
+    for _ in range(3):
+        debouncer.touch(path)
+    assert ready_at(debouncer, clock, 0.0) == []
+    assert ready_at(debouncer, clock, 0.9) == []
+    # A change restarts the quiet period
+    append(path)
+    assert ready_at(debouncer, clock, 1.5) == []
+    assert ready_at(debouncer, clock, 2.4) == []
+    assert ready_at(debouncer, clock, 2.5) == [path]
+    assert debouncer.metrics() == {'events': 3, 'merged_events': 2, 'released': 1, 'unchanged': 0,
+                                   'deleted': 0, 'pending': 0}
+
+    # Touched again without a change: skipped once quiet
+    debouncer.touch(path)
+    assert ready_at(debouncer, clock, 5.0) == []
+    assert ready_at(debouncer, clock, 6.0) == []
+    assert debouncer.metrics()['unchanged'] == 1
+
+
+def test_debouncer_releases_on_marker_or_max_delay(debouncer, clock, tmp_path):
+    marked, growing = str(tmp_path / '20240101.LOG.txt'), str(tmp_path / '20240102.LOG.txt')
+    append(marked)
+    debouncer.touch(marked, complete=True)
+    assert ready_at(debouncer, clock, 0.0) == [marked]
+
+    append(growing)
+    debouncer.touch(growing)
+    for now in range(10):
+        append(growing)
+        assert ready_at(debouncer, clock, float(now)) == []
+    append(growing)
+    assert ready_at(debouncer, clock, 10.0) == [growing]
+
+
+def test_debouncer_forget(debouncer, clock, tmp_path):
+    path = str(tmp_path / '20240101.LOG.txt')
+    append(path)
+    debouncer.touch(path)
+    debouncer.forget(path)
+    assert ready_at(debouncer, clock, 5.0) == []
+    assert debouncer.metrics()['pending'] == 0
+
+    debouncer.touch(path)
+    assert ready_at(debouncer, clock, 5.0) == []
+    assert ready_at(debouncer, clock, 6.0) == [path]
+    # Forgotten after its release, the same unchanged file counts as new again
+    debouncer.forget(path)
+    debouncer.touch(path)
+    assert ready_at(debouncer, clock, 7.0) == []
+    assert ready_at(debouncer, clock, 8.0) == [path]
+
+
+def test_debouncer_thread_releases_a_burst_once(tmp_path):
+    path = str(tmp_path / '20240101.LOG.txt')
+    append(path)
+    released = []
+    debouncer = Debouncer(released.append, quiet_period=0.05, max_delay=10.0, poll_interval=0.01)
+    for _ in range(10):
+        debouncer.touch(path)
+    deadline = time.monotonic() + 5
+    while not released and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    debouncer.close()
+    assert released == [path]
@@ -0,0 +1,101 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.aggregates import AGGREGATES_FOLDER, AggregateStore
+from src.jobs_analyzer import JobsAnalyzer
+from src.multiple_day_log_processor import COMBINED_OUTPUTS, process_logs_to_csv
+from src.output_backends import get_output_backend, templates_dataset
+
+
+def combined_outputs(output_format='csv'):
+    """Rows of every combined dataset, and the folded aggregates, as written by the last run."""
+    output = get_output_backend(output_format)
+    rows = {dataset: output.read_rows(dataset)
+            for dataset in (*COMBINED_OUTPUTS, templates_dataset('combined_events'))}
+    aggregates = AggregateStore(os.path.join(output.root, AGGREGATES_FOLDER)).combined()
+    return rows, aggregates.to_json()
+
+
+def test_parallel_run_matches_serial_run(project_root, logs_folder):
+    process_logs_to_csv(logs_folder, workers=1)
+    serial = combined_outputs()
+    process_logs_to_csv(logs_folder, workers=2)
+
+    assert combined_outputs() == serial
+    assert serial[0]['combined_jobs']
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet'])
+def test_cached_rebuild_matches_full_reparse(project_root, logs_folder, capsys, output_format):
+    process_logs_to_csv(logs_folder, output_format=output_format, use_cache=True)
+    # One log changes; the rerun reparses only that one and rebuilds from the cache
+    shutil.copyfile(os.path.join(os.path.dirname(__file__), 'fixtures', 'cp1252_crlf.LOG.txt'),
+                    os.path.join(logs_folder, sorted(os.listdir(logs_folder))[1]))
+    process_logs_to_csv(logs_folder, output_format=output_format, use_cache=True)
+    assert "Reusing cached parses of 2 unchanged files, parsing 1" in capsys.readouterr().out
+    rebuilt = combined_outputs(output_format)
+
+    process_logs_to_csv(logs_folder, output_format=output_format)
+    assert combined_outputs(output_format) == rebuilt
+
+
+def test_analyzer_uses_the_saved_index_and_matching_aggregates(project_root, logs_folder):
+    process_logs_to_csv(logs_folder)
+    analyzer = JobsAnalyzer(project_root=str(project_root))
+    assert analyzer.load_aggregates()
+    saved = analyzer.interval_index()
+
+    analyzer.load_data()
+    built = analyzer.interval_index()
+    assert built is not saved
+    for field in ('ids', 'names', 'starts', 'ends'):
+        assert np.array_equal(getattr(saved, field), getattr(built, field))
+
+    # Outputs changed behind the aggregates' back are read from the raw rows instead
+    os.utime(analyzer._dataset_path('combined_jobs'))
+    assert not JobsAnalyzer(project_root=str(project_root)).load_aggregates()
+
+
+def aggregate_and_raw_results(project_root):
+    """Results written from the stored aggregates, and from the raw rows, by file name."""
+    analyzer = JobsAnalyzer(project_root=str(project_root))
+    assert analyzer.load_aggregates()
+    analyzer.save_aggregate_results()
+    shutil.move(project_root / 'results', project_root / 'aggregate_results')
+
+    analyzer = JobsAnalyzer(project_root=str(project_root))
+    analyzer.load_data()
+    analyzer.analyze_jobs()
+    analyzer.analyze_patterns()
+    analyzer.analyze_system_load()
+    return project_root / 'aggregate_results', project_root / 'results'
+
+
+def test_aggregate_results_match_raw_results(project_root, logs_folder):
+    process_logs_to_csv(logs_folder)
+    aggregate, raw = aggregate_and_raw_results(project_root)
+    # Percentiles come from sketches on the aggregates path, so only the exact results compare
+    for name in ('hourly_patterns.csv', 'daily_patterns.csv', 'error_patterns.csv', 'top_jobs.csv',
+                 'longest_jobs.csv', 'system_metrics.csv'):
+        assert (aggregate / name).read_text() == (raw / name).read_text(), name
+
+
+def test_aggregate_results_of_a_single_instant_job(project_root, tmp_path):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    (logs / '20240101.LOG.txt').write_text(
+        "20240101/080000.000 - U00003400 Job 'JOBS.DAILY.1' with RunID '100001' is to be started.\n"
+        "20240101/080000.000 - U00003401 Job 'JOBS.DAILY.1' started with RunID '100001'.\n"
+        "20240101/080000.000 - U00003402 Job 'JOBS.DAILY.1' with RunID '100001' ended with return code '0'.\n"
+        "20240101/080000.000 - U00003403 Job 'JOBS.DAILY.1' with RunID '100001' has been removed from the job table.\n",
+        encoding='utf-8')
+    process_logs_to_csv(str(logs))
+    aggregate, raw = aggregate_and_raw_results(project_root)
+    metrics = pd.read_csv(aggregate / 'system_metrics.csv').set_index('Metric')['Value']
+    assert metrics['total_execution_time'] == 0
+    assert pd.isna(metrics['jobs_per_hour'])
+    assert (aggregate / 'system_metrics.csv').read_text() == (raw / 'system_metrics.csv').read_text()
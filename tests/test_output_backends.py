@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from src.output_backends import get_output_backend, templates_dataset
+from src.utils import render_event, split_event_template, stream_log
+
+
+@pytest.mark.parametrize('event, message_code', [
+    ("Job 'BACKUP_{DAILY}' (ID 0042) started with code U0001 'x' ''", 'U0001'),
+    ("Report ended {} '{0}' with 'two' 'params'", 'U0002'),
+    ("No quotes or code here", None),
+])
+def test_event_template_round_trip(event, message_code):
+    template, params = split_event_template(event, message_code)
+    assert render_event(template, "\x1f".join(params), message_code or '') == event
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet'])
+def test_templated_events_render_as_text_events(project_root, output_format):
+    log_paths = [os.path.join(os.path.dirname(__file__), 'fixtures', name)
+                 for name in ('utf8_lf.LOG.txt', 'cp1252_crlf.LOG.txt')]
+
+    text_output = get_output_backend(output_format, 'text')
+    templated_output = get_output_backend(output_format, 'template')
+    # The second log is appended, so its events reuse the templates already stored
+    for mode, log_path in zip(('w', 'a'), log_paths):
+        stream_log(log_path, 'events', mode=mode, save_events=text_output.save_events)
+        stream_log(log_path, 'templated_events', mode=mode, save_events=templated_output.save_events)
+    text_output.close()
+    templated_output.close()
+
+    template_rows = templated_output.read_rows(templates_dataset('templated_events'))
+    templates = dict(template_rows)
+    assert len(templates) == len(template_rows)
+    rendered = [(timestamp, render_event(templates[template_id], params, message_code or ''), message_code)
+                for timestamp, template_id, params, message_code in templated_output.read_rows('templated_events')]
+    assert rendered == text_output.read_rows('events')
+    assert len(templates) < len(rendered)
@@ -0,0 +1,67 @@
+import csv
+import os
+
+import pytest
+
+from src.output_writer import JOURNAL_SUFFIX, TEMP_SUFFIX, OutputWriter, recover
+
+HEADERS = ['id', 'value']
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.reader(file))
+
+
+def crash(writer):
+    """Leave the writer as a killed process would: rows on disk, nothing committed."""
+    if writer._thread is not None:
+        writer._queue.put((None, None, None))
+        writer._thread.join()
+    with writer.lock:
+        for sink in writer.sinks.values():
+            sink.flush()
+            sink.close_file()
+
+
+@pytest.fixture
+def committed(tmp_path):
+    path = str(tmp_path / 'jobs.csv')
+    with OutputWriter() as writer:
+        writer.write_rows(path, [('1', 'a'), ('2', 'b')], HEADERS, mode='w')
+    return path
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_interrupted_append_is_cut_off(committed, background):
+    writer = OutputWriter(flush_rows=1, background=background)
+    writer.write_rows(committed, [('3', 'c'), ('4', 'd')], HEADERS, mode='a')
+    crash(writer)
+    assert len(read_csv(committed)) == 5
+    assert os.path.isfile(committed + JOURNAL_SUFFIX)
+
+    # The next writer of the file recovers it before writing
+    with OutputWriter() as writer:
+        writer.write_rows(committed, [('5', 'e')], HEADERS, mode='a')
+    assert read_csv(committed) == [HEADERS, ['1', 'a'], ['2', 'b'], ['5', 'e']]
+    assert not os.path.exists(committed + JOURNAL_SUFFIX)
+
+
+def test_interrupted_rewrite_leaves_the_committed_file(committed):
+    writer = OutputWriter(flush_rows=1)
+    writer.write_rows(committed, [('9', 'z')], HEADERS, mode='w')
+    crash(writer)
+    assert os.path.isfile(committed + TEMP_SUFFIX)
+    assert read_csv(committed) == [HEADERS, ['1', 'a'], ['2', 'b']]
+
+    recover(committed)
+    assert read_csv(committed) == [HEADERS, ['1', 'a'], ['2', 'b']]
+    assert not os.path.exists(committed + TEMP_SUFFIX)
+
+
+def test_rows_become_visible_on_commit(committed):
+    with OutputWriter() as writer:
+        writer.write_rows(committed, [('3', 'c')], HEADERS, mode='a')
+        assert len(read_csv(committed)) == 3
+        writer.commit(committed)
+        assert read_csv(committed)[-1] == ['3', 'c']
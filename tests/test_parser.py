@@ -0,0 +1,32 @@
+import json
+
+from src.utils import parse_sap_log, read_log_file, stream_log
+
+
+def expected_output(log_path):
+    """Jobs, reports and events of the fixture as parsed by the original regex-per-pattern parser."""
+    with open(log_path.replace('.LOG.txt', '.expected.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def as_json(jobs, reports, events):
+    def fields(record):
+        return {field: value.isoformat(sep=' ') if hasattr(value, 'isoformat') else value
+                for field, value in record.items() if value is not None}
+
+    return {
+        'jobs': {run_id: fields(job) for run_id, job in jobs.items()},
+        'reports': {report_id: fields(report) for report_id, report in reports.items()},
+        'events': [[timestamp.isoformat(sep=' '), event, message_code] for timestamp, event, message_code in events],
+    }
+
+
+def test_parse_sap_log_matches_the_original_parser(fixture_log):
+    jobs, reports, events = parse_sap_log(read_log_file(fixture_log))
+    assert as_json(jobs, reports, events) == expected_output(fixture_log)
+
+
+def test_stream_log_matches_the_original_parser(fixture_log):
+    events = []
+    state = stream_log(fixture_log, None, save_events=lambda batch, *args, **kwargs: events.extend(batch))
+    assert as_json(state.jobs, state.reports, events) == expected_output(fixture_log)
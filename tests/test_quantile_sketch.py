@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.quantile_sketch import DEFAULT_K, KllSketch
+
+FRACTIONS = [0.01, 0.1, 0.5, 0.9, 0.95, 0.99]
+# Rank error allowed for the default k; the sketch's own bound is about 1.7 / k
+MAX_RANK_ERROR = 2 / DEFAULT_K
+
+
+def rank_errors(sketch, values):
+    values = np.sort(values)
+    return [abs(np.searchsorted(values, estimate, side='right') / len(values) - fraction)
+            for estimate, fraction in zip(sketch.quantiles(FRACTIONS), FRACTIONS)]
+
+
+def test_small_sketch_is_exact():
+    values = [random.Random(0).expovariate(0.5) for _ in range(150)]
+    sketch = KllSketch()
+    for value in values:
+        sketch.update(value)
+    assert sketch.quantiles(FRACTIONS) == pytest.approx(list(np.quantile(values, FRACTIONS)))
+    assert (sketch.count, sketch.min, sketch.max) == (len(values), min(values), max(values))
+
+
+@pytest.mark.parametrize('parts', [1, 7])
+def test_rank_error_is_bounded(parts):
+    generator = random.Random(parts)
+    # Long-tailed, like job durations
+    values = [generator.lognormvariate(0, 1.5) for _ in range(100000)]
+    sketches = []
+    for part in np.array_split(values, parts):
+        sketch = KllSketch()
+        for value in part:
+            sketch.update(float(value))
+        sketches.append(sketch)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(KllSketch.from_dict(sketch.to_dict()))
+
+    assert merged.count == len(values)
+    assert max(rank_errors(merged, values)) <= MAX_RANK_ERROR
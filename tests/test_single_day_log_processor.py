@@ -0,0 +1,16 @@
+from src.output_backends import get_output_backend
+from src.single_day_log_processcor import parse_log_parallel
+from src.utils import stream_log
+
+
+def test_chunked_parse_matches_serial_parse(project_root, fixture_log):
+    output = get_output_backend('csv', 'text')
+
+    serial = stream_log(fixture_log, 'serial_events', save_events=output.save_events)
+    chunked = parse_log_parallel(fixture_log, 'chunked_events', workers=3, output=output, min_chunk_size=4096)
+
+    assert chunked.line_count == serial.line_count
+    assert chunked.event_count == serial.event_count
+    assert chunked.jobs == serial.jobs
+    assert chunked.reports == serial.reports
+    assert output.read_rows('chunked_events') == output.read_rows('serial_events')
@@ -0,0 +1,102 @@
+import bz2
+import csv
+import gzip
+import lzma
+import shutil
+
+import pytest
+
+from src.log_generator import generate_daily_logs
+from src.time_index import TimeIndex
+from src.utils import (JOB_HEADERS, extract_time_range, find_log_files, log_time_range, read_log_file,
+                       save_to_csv, stream_log)
+
+COMPRESSORS = {'.gz': gzip.compress, '.bz2': bz2.compress, '.xz': lzma.compress}
+
+
+@pytest.fixture
+def log_path(fixture_log, tmp_path):
+    """A copy of a fixture log, in either encoding, for compressed copies to sit next to."""
+    path = tmp_path / '20240101.LOG.txt'
+    shutil.copyfile(fixture_log, path)
+    return str(path)
+
+
+def parse(log_path):
+    events = []
+    state = stream_log(log_path, None, save_events=lambda rows, *args, **kwargs: events.extend(rows))
+    return state, events
+
+
+@pytest.mark.parametrize('suffix', ['.gz', '.bz2', '.xz', '.zst'])
+def test_compressed_log_parses_like_plain_log(log_path, suffix):
+    with open(log_path, 'rb') as file:
+        data = file.read()
+    if suffix == '.zst':
+        compress = pytest.importorskip('zstandard').ZstdCompressor().compress
+    else:
+        compress = COMPRESSORS[suffix]
+    with open(log_path + suffix, 'wb') as file:
+        file.write(compress(data))
+
+    plain_state, plain_events = parse(log_path)
+    state, events = parse(log_path + suffix)
+    assert events == plain_events
+    assert state.jobs == plain_state.jobs
+    assert state.reports == plain_state.reports
+    assert state.time_range() == plain_state.time_range()
+
+
+def test_compressed_copy_of_a_plain_log_is_skipped(log_path, tmp_path):
+    with open(log_path, 'rb') as file:
+        data = file.read()
+    with open(log_path + '.gz', 'wb') as file:
+        file.write(gzip.compress(data))
+    with open(tmp_path / '20240102.LOG.txt.gz', 'wb') as file:
+        file.write(gzip.compress(data))
+    assert find_log_files(str(tmp_path)) == ['20240101.LOG.txt', '20240102.LOG.txt.gz']
+
+
+@pytest.mark.parametrize('block_size', [64, 4096, 64 * 1024])
+@pytest.mark.parametrize('suffix', ['', '.gz'])
+def test_log_time_range_matches_extract_time_range(log_path, block_size, suffix):
+    # Lines without a timestamp at both ends, longer than the smaller blocks
+    with open(log_path, 'rb') as file:
+        data = b'no timestamp here\n' * 300 + file.read() + b'trailing line without one\n' * 300
+    with open(log_path + suffix, 'wb') as file:
+        file.write(gzip.compress(data) if suffix else data)
+
+    expected = extract_time_range(read_log_file(log_path + suffix))
+    assert expected[0] is not None
+    assert log_time_range(log_path + suffix, block_size) == expected
+
+
+def test_log_without_timestamps_has_no_time_range(tmp_path):
+    path = tmp_path / 'empty.LOG.txt'
+    path.write_bytes(b'no timestamps\nat all\n')
+    assert log_time_range(str(path)) == extract_time_range(read_log_file(str(path))) == (None, None)
+
+
+def test_time_index_selects_logs_by_window(tmp_path):
+    generate_daily_logs(str(tmp_path), days=3, mean_gap_ms=120000)
+    filenames = find_log_files(str(tmp_path))
+    ranges = {filename: log_time_range(str(tmp_path / filename)) for filename in filenames}
+    start_time, end_time = ranges[filenames[1]]
+
+    time_index = TimeIndex(str(tmp_path))
+    time_index.update(filenames)
+    selected = time_index.in_window(filenames, start_time, end_time)
+    assert selected == [filename for filename, (first, last) in ranges.items()
+                        if last >= start_time and first <= end_time] == [filenames[1]]
+    time_index.save()
+    assert TimeIndex(str(tmp_path)).in_window(filenames, start_time, end_time) == selected
+
+
+def test_save_to_csv_writes_missing_fields_blank(project_root):
+    jobs = {'1': {'name': 'JOB_A', 'start_time': '2024-01-01 00:00:01.000'}, '2': {'return_code': 4}}
+    save_to_csv(jobs, 'jobs.csv', JOB_HEADERS)
+    with open(project_root / 'csv' / 'jobs.csv', newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    assert [row['id'] for row in rows] == ['1', '2']
+    assert rows[0]['name'] == 'JOB_A' and rows[0]['end_time'] == '' and rows[0]['return_code'] == ''
+    assert rows[1]['name'] == '' and rows[1]['return_code'] == '4'